@@ -26,6 +26,9 @@ class Bar(object):
         This is a base class and should not be used directly.
     """
 
+    # So that subclasses using __slots__ don't get a __dict__.
+    __slots__ = ()
+
     def getDateTime(self):
         """Returns the :class:`datetime.datetime`."""
         raise NotImplementedError()
@@ -18,10 +18,13 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import numpy as np
+
 from pyalgotrade import dataseries
 from pyalgotrade.dataseries import bards
 from pyalgotrade import feed
 from pyalgotrade import warninghelpers
+from pyalgotrade.utils import dt
 
 
 class Frequency:
@@ -67,6 +70,7 @@ class BaseBarFeed(feed.BaseFeed):
         self.__lastBars = {}
         self.__frequency = frequency
         self.__prevDateTime = None
+        self.__useColumnarDataSeries = False
 
     # Return True if bars provided have adjusted close values.
     def barsHaveAdjClose(self):
@@ -82,7 +86,20 @@ class BaseBarFeed(feed.BaseFeed):
         raise NotImplementedError()
 
     def createDataSeries(self, key, maxLen):
-        return bards.BarDataSeries(maxLen)
+        if self.__useColumnarDataSeries:
+            ret = bards.ColumnarBarDataSeries(maxLen)
+        else:
+            ret = bards.BarDataSeries(maxLen)
+        return ret
+
+    def setUseColumnarDataSeries(self, useColumnarDataSeries):
+        """Sets whether to use :class:`pyalgotrade.dataseries.bards.ColumnarBarDataSeries` instances to hold bars.
+        This affects instruments registered afterwards, so it should be called before adding bars.
+
+        :param useColumnarDataSeries: True to use columnar BarDataSeries.
+        :type useColumnarDataSeries: boolean.
+        """
+        self.__useColumnarDataSeries = useColumnarDataSeries
 
     def getNextValues(self):
         dateTime = None
@@ -175,6 +192,9 @@ class OptimizerBarFeed(BaseBarFeed):
     def peekDateTime(self):
         self.__bars[self.__nextBar].getDateTime()
 
+    def getDispatchSchedule(self):
+        return np.array([dt.datetime_to_microseconds(bars.getDateTime()) for bars in self.__bars[self.__nextBar:]], dtype=np.int64)
+
     def getNextBars(self):
         ret = None
         if self.__nextBar < len(self.__bars):
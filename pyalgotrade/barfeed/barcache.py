@@ -0,0 +1,194 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import os
+import mmap
+import datetime
+import hashlib
+import tempfile
+
+import numpy as np
+import pytz
+
+from pyalgotrade.barfeed import columnar
+
+# The cache file holds a header, followed by the metadata and the columns.
+# Header fields (int64):
+# 0: Magic number.
+# 1: Number of bars.
+# 2: 1 if the adjusted close column is present, 0 otherwise.
+# 3: Size of the metadata, in bytes.
+# The metadata is plain text: the repr of the cache key and the timezone name (empty if there is no timezone),
+# separated by a new line. Cache files may be written by anyone that can write next to the CSV files, so the metadata
+# is only compared, never evaluated. The metadata is padded to a multiple of 8 bytes, and it is followed by the
+# datetimes (int64) and the open, high, low, close, volume and adjusted close (float64) columns.
+MAGIC = 0x5041544243480002
+HEADER_LEN = 4
+HEADER_COUNT = 1
+HEADER_ADJ_CLOSE = 2
+HEADER_METADATA_SIZE = 3
+ITEM_SIZE = 8
+CACHE_FILE_EXTENSION = ".barcache"
+
+
+def get_timezone_name(timezone):
+    # Only pytz timezones can be restored from their names.
+    if timezone is None:
+        return None
+    return getattr(timezone, "zone", None)
+
+
+def get_parser_key(rowParser):
+    """Returns a string that identifies how a row parser parses CSV files, or None if the parser can't be cached."""
+    parameters = rowParser.getCacheParameters()
+    if parameters is None:
+        return None
+
+    ret = ["%s.%s" % (rowParser.__class__.__module__, rowParser.__class__.__name__)]
+    for parameter in parameters:
+        if isinstance(parameter, datetime.tzinfo):
+            parameter = get_timezone_name(parameter)
+            if parameter is None:
+                return None
+        ret.append(repr(parameter))
+    return ",".join(ret)
+
+
+def get_cache_key(path, parserKey):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime, stat.st_size, parserKey)
+
+
+def get_cache_path(path, parserKey, cacheDir=None):
+    """Returns the path to the cache file for a CSV file and a row parser key.
+
+    :param path: The path to the CSV file.
+    :type path: string.
+    :param parserKey: The row parser key, as returned by :func:`get_parser_key`.
+    :type parserKey: string.
+    :param cacheDir: The directory where cache files are kept. If None, the cache file is kept next to the CSV file.
+    :type cacheDir: string.
+    """
+    digest = hashlib.md5("%s\n%s" % (os.path.abspath(path), parserKey)).hexdigest()[:16]
+    fileName = "%s.%s%s" % (os.path.basename(path), digest, CACHE_FILE_EXTENSION)
+    if cacheDir is None:
+        cacheDir = os.path.dirname(os.path.abspath(path))
+    return os.path.join(cacheDir, fileName)
+
+
+def pad(size):
+    return (size + ITEM_SIZE - 1) // ITEM_SIZE * ITEM_SIZE
+
+
+def write(cachePath, cacheKey, barColumns):
+    """Writes bars into a cache file. The file is replaced atomically, so concurrent readers either see the old file or
+    the new one.
+
+    :param cachePath: The path to the cache file.
+    :type cachePath: string.
+    :param cacheKey: The key to validate the cache file with when it gets read.
+    :type cacheKey: tuple.
+    :param barColumns: The bars to write.
+    :type barColumns: :class:`pyalgotrade.barfeed.columnar.BarColumns`.
+    """
+    timezone = barColumns.getTimeZone()
+    timezoneName = get_timezone_name(timezone)
+    if timezone is not None and timezoneName is None:
+        raise Exception("Only pytz timezones are supported")
+
+    metadata = "%s\n%s" % (repr(cacheKey), timezoneName or "")
+    adjClose = barColumns.getAdjClose()
+    header = np.zeros(HEADER_LEN, dtype=np.int64)
+    header[0] = MAGIC
+    header[HEADER_COUNT] = len(barColumns)
+    header[HEADER_ADJ_CLOSE] = int(adjClose is not None)
+    header[HEADER_METADATA_SIZE] = len(metadata)
+
+    columns = [barColumns.getDateTimes(), barColumns.getOpen(), barColumns.getHigh(), barColumns.getLow(), barColumns.getClose(), barColumns.getVolume()]
+    if adjClose is not None:
+        columns.append(adjClose)
+
+    fd, tmpPath = tempfile.mkstemp(suffix=CACHE_FILE_EXTENSION, dir=os.path.dirname(os.path.abspath(cachePath)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.tostring())
+            f.write(metadata.ljust(pad(len(metadata)), "\0"))
+            for values in columns:
+                f.write(values.tostring())
+        # os.rename doesn't replace existing files on Windows.
+        if os.name == "nt" and os.path.exists(cachePath):
+            os.remove(cachePath)
+        os.rename(tmpPath, cachePath)
+    except:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def read(cachePath, cacheKey):
+    """Reads bars from a cache file. The columns are memory-mapped, so they're loaded lazily by the OS.
+    Returns a :class:`pyalgotrade.barfeed.columnar.BarColumns`, or None if the file doesn't exist, is not valid, or
+    was written with a different key.
+
+    :param cachePath: The path to the cache file.
+    :type cachePath: string.
+    :param cacheKey: The key that the file should have been written with.
+    :type cacheKey: tuple.
+    """
+    if not os.path.exists(cachePath):
+        return None
+
+    with open(cachePath, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_LEN * ITEM_SIZE:
+            return None
+        # The mapping stays alive as long as the arrays built on top of it.
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header = np.ndarray(shape=(HEADER_LEN,), dtype=np.int64, buffer=buf)
+    if header[0] != MAGIC:
+        return None
+    count = int(header[HEADER_COUNT])
+    columnCount = 7 if header[HEADER_ADJ_CLOSE] else 6
+    metadataSize = int(header[HEADER_METADATA_SIZE])
+    offset = HEADER_LEN * ITEM_SIZE + pad(metadataSize)
+    if count < 0 or metadataSize < 0 or size != offset + columnCount * count * ITEM_SIZE:
+        return None
+
+    metadata = buf[HEADER_LEN * ITEM_SIZE:HEADER_LEN * ITEM_SIZE + metadataSize].split("\n")
+    if len(metadata) != 2 or metadata[0] != repr(cacheKey):
+        return None
+
+    timezone = None
+    if metadata[1] != "":
+        try:
+            timezone = pytz.timezone(metadata[1])
+        except Exception:
+            return None
+
+    columns = []
+    for i in xrange(columnCount):
+        dtype = np.int64 if i == 0 else np.float64
+        columns.append(np.ndarray(shape=(count,), dtype=dtype, buffer=buf, offset=offset))
+        offset += count * ITEM_SIZE
+    if columnCount == 6:
+        columns.append(None)
+    return columnar.BarColumns(*columns, tzinfo=timezone)
+
@@ -0,0 +1,497 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import numpy as np
+import pytz
+
+from pyalgotrade import bar
+from pyalgotrade.utils import dt
+
+MICROSECONDS_PER_SECOND = 1000000
+MICROSECONDS_PER_MINUTE = 60 * MICROSECONDS_PER_SECOND
+MICROSECONDS_PER_HOUR = 60 * MICROSECONDS_PER_MINUTE
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+# UTC offsets are assumed not to change within periods of this length.
+OFFSET_RESOLUTION = 15 * MICROSECONDS_PER_MINUTE
+
+# Widths for the supported fields in fixed format datetimes.
+FIELD_WIDTHS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+def days_from_civil(year, month, day):
+    # Returns the number of days since 1970-01-01 for arrays of dates in the proleptic Gregorian calendar.
+    year = year - (month <= 2)
+    era = year // 400
+    yearOfEra = year - era * 400
+    dayOfYear = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    dayOfEra = yearOfEra * 365 + yearOfEra // 4 - yearOfEra // 100 + dayOfYear
+    return era * 146097 + dayOfEra - 719468
+
+
+def time_to_microseconds(time):
+    """Converts a datetime.time to the number of microseconds since midnight."""
+    return ((time.hour * 60 + time.minute) * 60 + time.second) * MICROSECONDS_PER_SECOND + time.microsecond
+
+
+def parse_datetimes(strings, format):
+    """Parses an array of fixed format datetime strings.
+    Returns an int64 array with the number of microseconds since the epoch, treating datetimes as UTC.
+
+    :param strings: The strings to parse.
+    :type strings: NumPy string array or a sequence of strings.
+    :param format: A strptime like format, that only uses %Y, %m, %d, %H, %M and %S, and where every field has
+        a fixed width, for example "%Y-%m-%d %H:%M:%S".
+    :type format: string.
+    """
+    # Calculate the position for each field and for the rest of the characters.
+    fields = {}
+    literals = []
+    length = 0
+    i = 0
+    while i < len(format):
+        if format[i] == "%":
+            field = format[i+1]
+            fields[field] = (length, length + FIELD_WIDTHS[field])
+            length += FIELD_WIDTHS[field]
+            i += 2
+        else:
+            literals.append((length, ord(format[i])))
+            length += 1
+            i += 1
+
+    strings = np.asarray(strings, dtype=np.string_)
+    if len(strings) == 0:
+        return np.empty(0, dtype=np.int64)
+    if strings.dtype.itemsize != length or np.any(np.char.str_len(strings) != length):
+        raise Exception("Datetimes don't match the format %s" % (format))
+
+    chars = strings.view(np.uint8).reshape(len(strings), length)
+    for pos, char in literals:
+        if np.any(chars[:, pos] != char):
+            raise Exception("Datetimes don't match the format %s" % (format))
+
+    def getField(field, default):
+        if field not in fields:
+            return np.repeat(np.int64(default), len(strings))
+        begin, end = fields[field]
+        digits = chars[:, begin:end].astype(np.int64) - ord("0")
+        if np.any((digits < 0) | (digits > 9)):
+            raise Exception("Datetimes don't match the format %s" % (format))
+        ret = np.zeros(len(strings), dtype=np.int64)
+        for i in xrange(end - begin):
+            ret = ret * 10 + digits[:, i]
+        return ret
+
+    year = getField("Y", 1970)
+    month = getField("m", 1)
+    day = getField("d", 1)
+    hour = getField("H", 0)
+    minute = getField("M", 0)
+    second = getField("S", 0)
+
+    daysInMonth = DAYS_IN_MONTH[np.clip(month, 0, 12)] + ((month == 2) & (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0)))
+    invalid = (year < 1) | (month < 1) | (month > 12) | (day < 1) | (day > daysInMonth) | (hour > 23) | (minute > 59) | (second > 59)
+    if np.any(invalid):
+        raise Exception("Invalid datetime %s" % (strings[np.flatnonzero(invalid)[0]]))
+
+    return days_from_civil(year, month, day) * MICROSECONDS_PER_DAY + ((hour * 60 + minute) * 60 + second) * MICROSECONDS_PER_SECOND
+
+
+def parse_floats(strings):
+    """Parses a sequence of strings into a float64 array."""
+    ret = np.fromstring(" ".join(strings), dtype=np.float64, sep=" ")
+    if len(ret) != len(strings):
+        # Some values couldn't be parsed. Let NumPy raise the appropriate error.
+        ret = np.array(strings, dtype=np.float64)
+    return ret
+
+
+def calculate_offsets(microseconds, getOffset):
+    # Returns the offsets calculated by getOffset for each datetime. getOffset is called twice for each day, and if
+    # the offset changes within the day, once per OFFSET_RESOLUTION period for that day.
+    def getOffsets(periods, periodLength):
+        return np.array([dt.timedelta_to_microseconds(getOffset(dt.microseconds_to_datetime(period * periodLength))) for period in periods.tolist()], dtype=np.int64)
+
+    days, inverse = np.unique(microseconds // MICROSECONDS_PER_DAY, return_inverse=True)
+    dayStartOffsets = getOffsets(days, MICROSECONDS_PER_DAY)
+    dayEndOffsets = getOffsets(days * MICROSECONDS_PER_DAY + MICROSECONDS_PER_DAY - OFFSET_RESOLUTION, 1)
+    ret = dayStartOffsets[inverse]
+
+    changing = (dayStartOffsets != dayEndOffsets)[inverse]
+    if np.any(changing):
+        periods, periodInverse = np.unique(microseconds[changing] // OFFSET_RESOLUTION, return_inverse=True)
+        ret[changing] = getOffsets(periods, OFFSET_RESOLUTION)[periodInverse]
+    return ret
+
+
+def localize(microseconds, timezone):
+    """Converts naive datetimes to UTC, like :func:`pyalgotrade.utils.dt.localize` does with naive datetimes.
+
+    :param microseconds: Naive datetimes as the number of microseconds since the epoch.
+    :type microseconds: NumPy int64 array.
+    :param timezone: The timezone for the datetimes.
+    :type timezone: A pytz timezone.
+    """
+    return microseconds - calculate_offsets(microseconds, lambda dateTime: timezone.localize(dateTime).utcoffset())
+
+
+def utc_offsets(microseconds, timezone):
+    """Returns the UTC offsets, in microseconds, that a timezone has at given UTC datetimes.
+
+    :param microseconds: UTC datetimes as the number of microseconds since the epoch.
+    :type microseconds: NumPy int64 array.
+    :param timezone: The timezone.
+    :type timezone: A pytz timezone.
+    """
+    return calculate_offsets(microseconds, lambda dateTime: dt.as_utc(dateTime).astimezone(timezone).utcoffset())
+
+
+class BarColumns:
+    """Bars for a single instrument, held in NumPy arrays with one element per bar.
+    The same checks that :class:`pyalgotrade.bar.BasicBar` does on each bar are done on all the bars at once.
+
+    :param dateTimes: The number of microseconds since the epoch for each datetime. If tzinfo is None these are naive
+        datetimes, otherwise these are in UTC.
+    :type dateTimes: NumPy int64 array.
+    :param open_: The opening prices.
+    :type open_: NumPy float64 array.
+    :param high: The highest prices.
+    :type high: NumPy float64 array.
+    :param low: The lowest prices.
+    :type low: NumPy float64 array.
+    :param close: The closing prices.
+    :type close: NumPy float64 array.
+    :param volume: The volumes.
+    :type volume: NumPy float64 array.
+    :param adjClose: The adjusted closing prices, using NaN for missing values, or None if there are none.
+    :type adjClose: NumPy float64 array.
+    :param tzinfo: The timezone for the datetimes, or None if they are naive.
+    :type tzinfo: A pytz timezone.
+
+    .. note::
+        Bars are built on demand when accessed by position.
+    """
+
+    def __init__(self, dateTimes, open_, high, low, close, volume, adjClose=None, tzinfo=None):
+        self.__dateTimes = np.asarray(dateTimes, dtype=np.int64)
+        self.__open = np.asarray(open_, dtype=np.float64)
+        self.__high = np.asarray(high, dtype=np.float64)
+        self.__low = np.asarray(low, dtype=np.float64)
+        self.__close = np.asarray(close, dtype=np.float64)
+        self.__volume = np.asarray(volume, dtype=np.float64)
+        self.__adjClose = None
+        if adjClose is not None:
+            self.__adjClose = np.asarray(adjClose, dtype=np.float64)
+        self.__tzinfo = tzinfo
+        self.__sessionClose = None
+        self.__barsTillSessionClose = None
+        # The last bar built, to return the same instance when accessing the same position many times in a row.
+        self.__lastPos = None
+        self.__lastBar = None
+
+        for values in self.__getColumns()[1:]:
+            if values is not None and len(values) != len(self.__dateTimes):
+                raise Exception("All columns should have the same length")
+        self.__check(self.__high < self.__open, "high < open")
+        self.__check(self.__high < self.__low, "high < low")
+        self.__check(self.__high < self.__close, "high < close")
+        self.__check(self.__low > self.__open, "low > open")
+        self.__check(self.__low > self.__close, "low > close")
+
+    def __getColumns(self):
+        return [self.__dateTimes, self.__open, self.__high, self.__low, self.__close, self.__volume, self.__adjClose]
+
+    def __check(self, failed, message):
+        if np.any(failed):
+            raise Exception("%s on %s" % (message, self.getDateTime(np.flatnonzero(failed)[0])))
+
+    def __len__(self):
+        return len(self.__dateTimes)
+
+    def __getitem__(self, pos):
+        """Returns the :class:`pyalgotrade.bar.Bar` at a given position."""
+        if pos == self.__lastPos:
+            return self.__lastBar
+
+        ret = bar.BasicBar(
+            self.getDateTime(pos),
+            self.__open.item(pos),
+            self.__high.item(pos),
+            self.__low.item(pos),
+            self.__close.item(pos),
+            self.__volume.item(pos),
+            self.getAdjCloseAt(pos)
+        )
+        if self.__sessionClose is not None:
+            ret.setSessionClose(self.getSessionClose(pos))
+            ret.setBarsTillSessionClose(self.getBarsTillSessionClose(pos))
+        self.__lastPos = pos
+        self.__lastBar = ret
+        return ret
+
+    def getView(self, pos):
+        """Returns a :class:`BarView` for the bar at a given position."""
+        return BarView(self, pos)
+
+    def getDateTime(self, pos):
+        """Returns the :class:`datetime.datetime` at a given position."""
+        return dt.microseconds_to_datetime(self.__dateTimes.item(pos), self.__tzinfo)
+
+    def getDateTimes(self):
+        """Returns the datetimes as an int64 array with the number of microseconds since the epoch."""
+        return self.__dateTimes
+
+    def getTimeZone(self):
+        """Returns the timezone for the datetimes, or None if they are naive."""
+        return self.__tzinfo
+
+    def getLocalDateTimes(self, timezone=None):
+        """Returns the datetimes, as an int64 array with the number of microseconds since the epoch, in local time.
+
+        :param timezone: The timezone to use to get local time. If None, the timezone for the datetimes is used.
+            Naive datetimes are considered to be in this timezone.
+        :type timezone: A pytz timezone.
+        """
+        ret = self.__dateTimes
+        if self.__tzinfo is not None:
+            if timezone is None:
+                timezone = self.__tzinfo
+            ret = ret + utc_offsets(ret, timezone)
+        return ret
+
+    def getOpen(self):
+        return self.__open
+
+    def getHigh(self):
+        return self.__high
+
+    def getLow(self):
+        return self.__low
+
+    def getClose(self):
+        return self.__close
+
+    def getVolume(self):
+        return self.__volume
+
+    def getAdjClose(self):
+        return self.__adjClose
+
+    def getAdjCloseAt(self, pos):
+        """Returns the adjusted closing price at a given position, or None if it is missing."""
+        ret = None
+        if self.__adjClose is not None:
+            ret = self.__adjClose.item(pos)
+            if ret != ret:
+                ret = None
+        return ret
+
+    def __allocateSessionAttributes(self):
+        if self.__sessionClose is None:
+            self.__sessionClose = np.zeros(len(self), dtype=np.int8)
+            # -1 stands for unknown.
+            self.__barsTillSessionClose = np.repeat(np.int32(-1), len(self))
+        self.__lastPos = None
+        self.__lastBar = None
+
+    def getSessionClose(self, pos):
+        ret = False
+        if self.__sessionClose is not None:
+            ret = bool(self.__sessionClose.item(pos))
+        return ret
+
+    def setSessionClose(self, pos, sessionClose):
+        self.__allocateSessionAttributes()
+        self.__sessionClose[pos] = sessionClose
+        if sessionClose:
+            self.__barsTillSessionClose[pos] = 0
+
+    def getBarsTillSessionClose(self, pos):
+        ret = None
+        if self.__barsTillSessionClose is not None:
+            ret = self.__barsTillSessionClose.item(pos)
+            if ret < 0:
+                ret = None
+        return ret
+
+    def setBarsTillSessionClose(self, pos, barsTillSessionClose):
+        if barsTillSessionClose is None:
+            barsTillSessionClose = -1
+        elif not 0 <= barsTillSessionClose <= np.iinfo(np.int32).max:
+            raise Exception("Invalid number of bars till session close %s" % (barsTillSessionClose))
+        self.__allocateSessionAttributes()
+        self.__barsTillSessionClose[pos] = barsTillSessionClose
+
+    def select(self, indices):
+        """Returns a new :class:`BarColumns` with the bars selected by a boolean mask or by an array of positions."""
+        columns = [None if values is None else values[indices] for values in self.__getColumns()]
+        return BarColumns(*columns, tzinfo=self.__tzinfo)
+
+    def sort(self):
+        """Returns a new :class:`BarColumns` with the bars sorted by datetime. Bars with the same datetime keep their order."""
+        return self.select(np.argsort(self.__dateTimes, kind="mergesort"))
+
+    def concatenate(self, barColumns):
+        """Returns a new :class:`BarColumns` with these bars followed by the ones in barColumns.
+        Both should have the same timezone."""
+        if self.__tzinfo != barColumns.getTimeZone():
+            raise Exception("Bars should have the same timezone")
+        columns = []
+        for values, otherValues in zip(self.__getColumns(), barColumns.__getColumns()):
+            if values is None and otherValues is None:
+                columns.append(None)
+            else:
+                if values is None:
+                    values = np.repeat(np.nan, len(self))
+                if otherValues is None:
+                    otherValues = np.repeat(np.nan, len(barColumns))
+                columns.append(np.concatenate([values, otherValues]))
+        return BarColumns(*columns, tzinfo=self.__tzinfo)
+
+    def setSessionCloseAttributes(self):
+        # Same as pyalgotrade.barfeed.helpers.set_session_close_attributes, using the date in local time.
+        count = len(self)
+        days = self.getLocalDateTimes() // MICROSECONDS_PER_DAY
+        sessionClose = np.ones(count, dtype=np.bool_)
+        sessionClose[:-1] = days[:-1] != days[1:]
+        # Flag the penultimate bar for each session, and the penultimate bar in the feed.
+        penultimate = np.zeros(count, dtype=np.bool_)
+        penultimate[:-2] = sessionClose[1:-1] & ~sessionClose[:-2]
+        if count > 1:
+            penultimate[-2] = True
+        # -1 stands for unknown.
+        barsTillSessionClose = np.where(sessionClose, 0, -1).astype(np.int32)
+        barsTillSessionClose[penultimate] = 1
+
+        self.__sessionClose = sessionClose.astype(np.int8)
+        self.__barsTillSessionClose = barsTillSessionClose
+        self.__lastPos = None
+        self.__lastBar = None
+
+
+class BarView(bar.Bar):
+    """A :class:`pyalgotrade.bar.Bar` that reads its values from a position in a :class:`BarColumns`, instead of
+    holding them. Session attributes are written back into the :class:`BarColumns`.
+
+    :param barColumns: The bars.
+    :type barColumns: :class:`BarColumns`.
+    :param pos: The position of the bar.
+    :type pos: int.
+
+    .. note::
+        The datetime is built each time :meth:`getDateTime` is called.
+    """
+
+    __slots__ = ('__barColumns', '__pos')
+
+    def __init__(self, barColumns, pos):
+        self.__barColumns = barColumns
+        self.__pos = pos
+
+    def __setstate__(self, state):
+        (self.__barColumns, self.__pos) = state
+
+    def __getstate__(self):
+        return (self.__barColumns, self.__pos)
+
+    def getDateTime(self):
+        return self.__barColumns.getDateTime(self.__pos)
+
+    def getOpen(self):
+        return self.__barColumns.getOpen().item(self.__pos)
+
+    def getHigh(self):
+        return self.__barColumns.getHigh().item(self.__pos)
+
+    def getLow(self):
+        return self.__barColumns.getLow().item(self.__pos)
+
+    def getClose(self):
+        return self.__barColumns.getClose().item(self.__pos)
+
+    def getVolume(self):
+        return self.__barColumns.getVolume().item(self.__pos)
+
+    def getAdjOpen(self):
+        return self.getAdjClose() * self.getOpen() / float(self.getClose())
+
+    def getAdjHigh(self):
+        return self.getAdjClose() * self.getHigh() / float(self.getClose())
+
+    def getAdjLow(self):
+        return self.getAdjClose() * self.getLow() / float(self.getClose())
+
+    def getAdjClose(self):
+        return self.__barColumns.getAdjCloseAt(self.__pos)
+
+    def getSessionClose(self):
+        return self.__barColumns.getSessionClose(self.__pos)
+
+    def setSessionClose(self, sessionClose):
+        self.__barColumns.setSessionClose(self.__pos, sessionClose)
+
+    def getBarsTillSessionClose(self):
+        return self.__barColumns.getBarsTillSessionClose(self.__pos)
+
+    def setBarsTillSessionClose(self, barsTillSessionClose):
+        self.__barColumns.setBarsTillSessionClose(self.__pos, barsTillSessionClose)
+
+
+def from_bars(bars):
+    """Builds a :class:`BarColumns` from a sequence of :class:`pyalgotrade.bar.Bar`. Returns None if the datetimes
+    don't share a timezone that can be restored, like a mix of naive and localized datetimes.
+
+    :param bars: The bars.
+    :type bars: list.
+    """
+    tzinfo = None
+    zone = None
+    if len(bars):
+        tzinfo = bars[0].getDateTime().tzinfo
+        # Localized pytz datetimes have a different tzinfo for each UTC offset, so the zone name gets compared.
+        zone = getattr(tzinfo, "zone", None)
+        if tzinfo is not None and zone is None:
+            return None
+    for bar_ in bars:
+        barTzInfo = bar_.getDateTime().tzinfo
+        if (barTzInfo is None) != (tzinfo is None) or getattr(barTzInfo, "zone", None) != zone:
+            return None
+    if zone is not None:
+        tzinfo = pytz.timezone(zone)
+
+    adjClose = [bar_.getAdjClose() for bar_ in bars]
+    if adjClose.count(None) == len(adjClose):
+        adjClose = None
+    else:
+        adjClose = [np.nan if value is None else value for value in adjClose]
+
+    return BarColumns(
+        np.array([dt.datetime_to_microseconds(bar_.getDateTime()) for bar_ in bars], dtype=np.int64),
+        [bar_.getOpen() for bar_ in bars],
+        [bar_.getHigh() for bar_ in bars],
+        [bar_.getLow() for bar_ in bars],
+        [bar_.getClose() for bar_ in bars],
+        [bar_.getVolume() for bar_ in bars],
+        adjClose,
+        tzinfo
+    )
@@ -0,0 +1,170 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+
+from pyalgotrade import bar
+from pyalgotrade.utils import dt
+
+
+def merge_bars(bar1, bar2):
+    """Returns a :class:`pyalgotrade.bar.Bar` that combines two consecutive bars.
+    If bar2 has a buildMergedBar method, it is called with the datetime, open, high, low, close, volume and adjusted
+    close to build the bar, so that bars keep their type. Otherwise a :class:`pyalgotrade.bar.BasicBar` is built."""
+    adjClose = None
+    if bar1.getAdjClose() is not None and bar2.getAdjClose() is not None:
+        adjClose = bar2.getAdjClose()
+    values = (
+        bar2.getDateTime(),
+        bar1.getOpen(),
+        max(bar1.getHigh(), bar2.getHigh()),
+        min(bar1.getLow(), bar2.getLow()),
+        bar2.getClose(),
+        bar1.getVolume() + bar2.getVolume(),
+        adjClose
+    )
+    buildMergedBar = getattr(bar2, "buildMergedBar", None)
+    if buildMergedBar is not None:
+        return buildMergedBar(*values)
+    return bar.BasicBar(*values)
+
+
+class ConflationPolicy:
+    """Base class for conflation policies.
+    A conflation policy holds the bars that are waiting to be dispatched by a real-time feed, and decides whether new
+    bars get queued, merged with the last pending one, or replace it. This keeps the backlog bounded during bursts.
+
+    .. note::
+        * This is a base class and should not be used directly.
+        * Bars are only combined while they are waiting to be dispatched. Bars are never held back.
+    """
+
+    # Actions returned by getAction.
+    APPEND = 0
+    MERGE = 1
+    REPLACE = 2
+
+    def __init__(self):
+        # Each element is a list with the pending bar and the number of bars that were combined into it.
+        self.__pending = []
+        self.__mergedCount = 0
+        self.__droppedCount = 0
+        self.__maxQueueDepth = 0
+
+    def getAction(self, pendingBar, pendingBarCount, newBar):
+        """Override to decide what to do with a new bar, given the last pending one.
+        Returns APPEND, MERGE or REPLACE.
+
+        :param pendingBar: The last bar waiting to be dispatched.
+        :type pendingBar: :class:`pyalgotrade.bar.Bar`.
+        :param pendingBarCount: The number of bars that were combined into pendingBar.
+        :type pendingBarCount: int.
+        :param newBar: The new bar.
+        :type newBar: :class:`pyalgotrade.bar.Bar`.
+        """
+        raise NotImplementedError()
+
+    def push(self, bar_):
+        """Adds a new bar."""
+        action = ConflationPolicy.APPEND
+        if len(self.__pending):
+            pendingBar, pendingBarCount = self.__pending[-1]
+            action = self.getAction(pendingBar, pendingBarCount, bar_)
+
+        if action == ConflationPolicy.MERGE:
+            self.__pending[-1] = [merge_bars(pendingBar, bar_), pendingBarCount + 1]
+            self.__mergedCount += 1
+        elif action == ConflationPolicy.REPLACE:
+            self.__pending[-1] = [bar_, 1]
+            self.__droppedCount += pendingBarCount
+        else:
+            self.__pending.append([bar_, 1])
+            self.__maxQueueDepth = max(self.__maxQueueDepth, len(self.__pending))
+
+    def pop(self):
+        """Returns the next bar to dispatch, or None if there are no pending bars."""
+        ret = None
+        if len(self.__pending):
+            ret = self.__pending.pop(0)[0]
+        return ret
+
+    def getQueueDepth(self):
+        """Returns the number of bars waiting to be dispatched."""
+        return len(self.__pending)
+
+    def getMaxQueueDepth(self):
+        """Returns the maximum number of bars that were waiting to be dispatched at the same time."""
+        return self.__maxQueueDepth
+
+    def getMergedCount(self):
+        """Returns the number of bars that were merged into a pending bar."""
+        return self.__mergedCount
+
+    def getDroppedCount(self):
+        """Returns the number of bars that were dropped."""
+        return self.__droppedCount
+
+
+class LatestOnlyPolicy(ConflationPolicy):
+    """A :class:`ConflationPolicy` that keeps only the latest bar, dropping the ones that were not dispatched yet."""
+
+    def getAction(self, pendingBar, pendingBarCount, newBar):
+        return ConflationPolicy.REPLACE
+
+
+class TimeBucketPolicy(ConflationPolicy):
+    """A :class:`ConflationPolicy` that merges pending bars that fall in the same time bucket.
+
+    :param bucketSize: The size of the time buckets.
+    :type bucketSize: :class:`datetime.timedelta`.
+    """
+
+    def __init__(self, bucketSize=datetime.timedelta(milliseconds=100)):
+        ConflationPolicy.__init__(self)
+        self.__bucketSize = dt.timedelta_to_microseconds(bucketSize)
+        if self.__bucketSize <= 0:
+            raise Exception("Invalid bucket size")
+
+    def __getBucket(self, dateTime):
+        return dt.datetime_to_microseconds(dateTime) // self.__bucketSize
+
+    def getAction(self, pendingBar, pendingBarCount, newBar):
+        if self.__getBucket(pendingBar.getDateTime()) == self.__getBucket(newBar.getDateTime()):
+            return ConflationPolicy.MERGE
+        return ConflationPolicy.APPEND
+
+
+class BarCountPolicy(ConflationPolicy):
+    """A :class:`ConflationPolicy` that merges up to a given number of pending bars into a single one.
+
+    :param count: The maximum number of bars to merge.
+    :type count: int.
+    """
+
+    def __init__(self, count):
+        ConflationPolicy.__init__(self)
+        if count <= 0:
+            raise Exception("Invalid count")
+        self.__count = count
+
+    def getAction(self, pendingBar, pendingBarCount, newBar):
+        if pendingBarCount < self.__count:
+            return ConflationPolicy.MERGE
+        return ConflationPolicy.APPEND
@@ -21,11 +21,44 @@
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
 from pyalgotrade.barfeed import membf
+from pyalgotrade.barfeed import columnar
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import helpers
+from pyalgotrade import barfeed
 from pyalgotrade import dataseries
 from pyalgotrade import bar
 
+import csv
 import datetime
+import heapq
+import itertools
+import multiprocessing
+import shutil
+import tempfile
+import cStringIO
 import pytz
+import numpy as np
+
+# Number of rows to read at once from each CSV file in StreamingBarFeed.
+STREAMING_CHUNK_SIZE = 10000
+
+
+def parse_columns(path, rowParser):
+    with open(path, "r") as f:
+        csvColumns = csvutils.read_columns(f, fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+    return rowParser.parseColumns(csvColumns)
+
+
+# Runs in worker processes. Parses a CSV file and writes the bars into a cache file for the parent process to
+# memory-map. Returns False if the cache file couldn't be written.
+def parse_into_cache_file(args):
+    path, rowParser, cachePath, cacheKey = args
+    barColumns = parse_columns(path, rowParser)
+    try:
+        barcache.write(cachePath, cacheKey, barColumns)
+    except (IOError, OSError):
+        return False
+    return True
 
 
 # Interface for csv row parsers.
@@ -39,12 +72,35 @@ class RowParser:
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Return True if parseColumns is implemented.
+    def supportsBulkLoading(self):
+        return False
+
+    # Return a pyalgotrade.barfeed.columnar.BarColumns with all the bars, given a dictionary that maps field names to
+    # lists of strings.
+    def parseColumns(self, csvColumns):
+        raise NotImplementedError()
+
+    # Return a tuple with the parameters that change how bars get parsed, like the timezone, or None if parsed bars
+    # should not be cached. Parsed bars are cached by pyalgotrade.barfeed.barcache using these and the parser class.
+    def getCacheParameters(self):
+        return None
+
+    # Called with the pyalgotrade.barfeed.columnar.BarColumns loaded from the cache, instead of calling parseColumns.
+    def columnsLoadedFromCache(self, barColumns):
+        pass
+
 
 # Interface for bar filters.
 class BarFilter:
     def includeBar(self, bar_):
         raise NotImplementedError()
 
+    # Return a NumPy boolean array with True for the bars to include, given a pyalgotrade.barfeed.columnar.BarColumns.
+    # Override to filter all the bars at once when bulk loading.
+    def includeBars(self, barColumns):
+        return np.array([self.includeBar(barColumns[i]) for i in xrange(len(barColumns))], dtype=np.bool_)
+
 
 class DateRangeFilter(BarFilter):
     def __init__(self, fromDate=None, toDate=None):
@@ -58,6 +114,24 @@ class DateRangeFilter(BarFilter):
             return False
         return True
 
+    def __checkDateTime(self, dateTime, barColumns):
+        # includeBar fails comparing naive and aware datetimes, so fail here too instead of taking naive ones as UTC.
+        if dt.datetime_is_naive(dateTime) != (barColumns.getTimeZone() is None):
+            raise TypeError("can't compare offset-naive and offset-aware datetimes")
+
+    def includeBars(self, barColumns):
+        dateTimes = barColumns.getDateTimes()
+        ret = np.ones(len(dateTimes), dtype=np.bool_)
+        if len(dateTimes) == 0:
+            return ret
+        if self.__toDate:
+            self.__checkDateTime(self.__toDate, barColumns)
+            ret &= dateTimes <= dt.datetime_to_microseconds(self.__toDate)
+        if self.__fromDate:
+            self.__checkDateTime(self.__fromDate, barColumns)
+            ret &= dateTimes >= dt.datetime_to_microseconds(self.__fromDate)
+        return ret
+
 
 # US Equities Regular Trading Hours filter
 # Monday ~ Friday
@@ -87,6 +161,17 @@ class USEquitiesRTH(DateRangeFilter):
                 return False
         return ret
 
+    def includeBars(self, barColumns):
+        ret = DateRangeFilter.includeBars(self, barColumns)
+        # Check day of week. January 1st 1970 was a Thursday.
+        barDays = barColumns.getLocalDateTimes() // columnar.MICROSECONDS_PER_DAY
+        ret &= (barDays + 3) % 7 <= 4
+        # Check time
+        barTimes = barColumns.getLocalDateTimes(USEquitiesRTH.timezone) % columnar.MICROSECONDS_PER_DAY
+        ret &= barTimes >= columnar.time_to_microseconds(self.__fromTime)
+        ret &= barTimes <= columnar.time_to_microseconds(self.__toTime)
+        return ret
+
 
 class BarFeed(membf.BarFeed):
     """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
@@ -99,6 +184,9 @@ class BarFeed(membf.BarFeed):
         membf.BarFeed.__init__(self, frequency, maxLen)
         self.__barFilter = None
         self.__dailyTime = datetime.time(23, 59, 59)
+        self.__useBulkLoading = False
+        self.__useCache = False
+        self.__cacheDir = None
 
     def getDailyBarTime(self):
         """Returns the time to set to daily bars when that information is not present in CSV files. Defaults to 23:59:59.
@@ -120,7 +208,78 @@ class BarFeed(membf.BarFeed):
     def setBarFilter(self, barFilter):
         self.__barFilter = barFilter
 
+    def getUseBulkLoading(self):
+        return self.__useBulkLoading
+
+    def setUseBulkLoading(self, useBulkLoading):
+        """Sets whether to load whole CSV files at once into NumPy arrays, instead of parsing them row by row.
+        Bars are kept in a :class:`pyalgotrade.barfeed.columnar.BarColumns` and they are built as they get
+        dispatched. This is much faster for big files.
+
+        :param useBulkLoading: True to use bulk loading.
+        :type useBulkLoading: boolean.
+
+        .. note::
+            * Datetimes in CSV files must have a fixed format (zero padded fields) to use bulk loading.
+            * This is ignored if the row parser doesn't support bulk loading.
+            * addBarsFromCSVs always uses bulk loading.
+        """
+        self.__useBulkLoading = useBulkLoading
+
+    def getUseCache(self):
+        return self.__useCache
+
+    def setUseCache(self, useCache, cacheDir=None):
+        """Sets whether to cache parsed CSV files. The first time a CSV file is loaded, parsed bars are written to a
+        binary cache file, and they are memory-mapped from there the next time, instead of parsing the CSV file again.
+        Cache files get written again if the CSV file changes (its modification time or size), or if it gets loaded
+        with a different timezone, daily bar time, etc.
+
+        :param useCache: True to use the cache.
+        :type useCache: boolean.
+        :param cacheDir: The directory where cache files are kept. If None, cache files are kept next to CSV files.
+        :type cacheDir: string.
+
+        .. note::
+            * Cached bars are loaded in bulk, as if :meth:`setUseBulkLoading` was called.
+            * This is ignored if the row parser doesn't support bulk loading.
+            * Only pytz timezones are supported. CSV files are parsed every time if other timezones are used.
+            * Bar filters are applied after loading the bars, so they don't affect the cache.
+        """
+        self.__useCache = useCache
+        self.__cacheDir = cacheDir
+
+    def __loadColumns(self, path, rowParser):
+        parserKey = None
+        if self.__useCache:
+            parserKey = barcache.get_parser_key(rowParser)
+        if parserKey is None:
+            return parse_columns(path, rowParser)
+
+        cacheKey = barcache.get_cache_key(path, parserKey)
+        cachePath = barcache.get_cache_path(path, parserKey, self.__cacheDir)
+        ret = barcache.read(cachePath, cacheKey)
+        if ret is not None:
+            rowParser.columnsLoadedFromCache(ret)
+        else:
+            ret = parse_columns(path, rowParser)
+            timezone = ret.getTimeZone()
+            if timezone is None or barcache.get_timezone_name(timezone) is not None:
+                try:
+                    barcache.write(cachePath, cacheKey, ret)
+                except (IOError, OSError):
+                    # Bars were loaded anyway. The cache directory may be read-only.
+                    pass
+        return ret
+
     def addBarsFromCSV(self, instrument, path, rowParser):
+        if (self.__useBulkLoading or self.__useCache) and rowParser.supportsBulkLoading():
+            barColumns = self.__loadColumns(path, rowParser)
+            if self.__barFilter is not None:
+                barColumns = barColumns.select(self.__barFilter.includeBars(barColumns))
+            self.addBarsFromColumns(instrument, barColumns)
+            return
+
         # Load the csv file
         loadedBars = []
         reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
@@ -131,6 +290,77 @@ class BarFeed(membf.BarFeed):
 
         self.addBarsFromSequence(instrument, loadedBars)
 
+    def addBarsFromCSVs(self, paths, rowParser, processes=None):
+        # paths can be a dictionary or a sequence of (instrument, path) tuples, so that many files can be loaded for
+        # the same instrument.
+        # Unlike addBarsFromCSV, files are bulk loaded regardless of setUseBulkLoading if the row parser supports it,
+        # so datetimes must have a fixed format.
+        if isinstance(paths, dict):
+            sources = sorted(paths.items())
+        else:
+            sources = list(paths)
+
+        parserKey = None
+        if rowParser.supportsBulkLoading():
+            parserKey = barcache.get_parser_key(rowParser)
+        if parserKey is None:
+            # The row parser can't be used from other processes, or the bars can't be written to cache files.
+            for instrument, path in sources:
+                self.addBarsFromCSV(instrument, path, rowParser)
+            return
+
+        # Workers write the bars into cache files and they get memory-mapped here. If the cache is not in use, those
+        # files are written into a temporary directory.
+        tmpDir = None
+        cacheDir = self.__cacheDir
+        if not self.__useCache:
+            tmpDir = tempfile.mkdtemp()
+            cacheDir = tmpDir
+
+        try:
+            # One (path, cache path, cache key) tuple for every source.
+            cacheFiles = []
+            loadedColumns = [None] * len(sources)
+            for i, (instrument, path) in enumerate(sources):
+                cacheKey = barcache.get_cache_key(path, parserKey)
+                cachePath = barcache.get_cache_path(path, parserKey, cacheDir)
+                cacheFiles.append((path, cachePath, cacheKey))
+                if self.__useCache:
+                    loadedColumns[i] = barcache.read(cachePath, cacheKey)
+
+            # The same file may show up more than once, but it only needs to be parsed once.
+            pending = sorted(set(cacheFiles[i] for i in xrange(len(sources)) if loadedColumns[i] is None))
+            if len(pending):
+                pool = multiprocessing.Pool(processes)
+                try:
+                    written = pool.map(parse_into_cache_file, [(path, rowParser, cachePath, cacheKey) for path, cachePath, cacheKey in pending])
+                finally:
+                    pool.close()
+                    pool.join()
+                written = dict(zip(pending, written))
+
+                for i in xrange(len(sources)):
+                    if loadedColumns[i] is None:
+                        path, cachePath, cacheKey = cacheFiles[i]
+                        barColumns = None
+                        if written[cacheFiles[i]]:
+                            barColumns = barcache.read(cachePath, cacheKey)
+                        if barColumns is None:
+                            # The cache directory may be read-only.
+                            barColumns = parse_columns(path, rowParser)
+                        loadedColumns[i] = barColumns
+        finally:
+            # Memory-mapped files can be removed on POSIX systems. On Windows they're still open, so they're left
+            # behind in the temporary directory.
+            if tmpDir is not None:
+                shutil.rmtree(tmpDir, ignore_errors=True)
+
+        for (instrument, path), barColumns in zip(sources, loadedColumns):
+            rowParser.columnsLoadedFromCache(barColumns)
+            if self.__barFilter is not None:
+                barColumns = barColumns.select(self.__barFilter.includeBars(barColumns))
+            self.addBarsFromColumns(instrument, barColumns)
+
 
 class GenericRowParser(RowParser):
     def __init__(self, timezone):
@@ -155,6 +385,41 @@ class GenericRowParser(RowParser):
     def getDelimiter(self):
         return ","
 
+    def supportsBulkLoading(self):
+        return True
+
+    def getCacheParameters(self):
+        return (self.__timezone,)
+
+    def columnsLoadedFromCache(self, barColumns):
+        if barColumns.getAdjClose() is not None:
+            self.__haveAdjClose = True
+
+    def parseColumns(self, csvColumns):
+        dateTimes = columnar.parse_datetimes(csvColumns["Date Time"], "%Y-%m-%d %H:%M:%S")
+        # Localize datetimes if a timezone was given.
+        if self.__timezone:
+            dateTimes = columnar.localize(dateTimes, self.__timezone)
+
+        adjClose = csvColumns["Adj Close"]
+        if adjClose.count("") == len(adjClose):
+            adjClose = None
+        else:
+            # Use NaN for missing values.
+            adjClose = columnar.parse_floats([value if len(value) else "nan" for value in adjClose])
+            self.__haveAdjClose = True
+
+        return columnar.BarColumns(
+            dateTimes,
+            columnar.parse_floats(csvColumns["Open"]),
+            columnar.parse_floats(csvColumns["High"]),
+            columnar.parse_floats(csvColumns["Low"]),
+            columnar.parse_floats(csvColumns["Close"]),
+            columnar.parse_floats(csvColumns["Volume"]),
+            adjClose,
+            self.__timezone
+        )
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDate(csvRowDict["Date Time"])
         close = float(csvRowDict["Close"])
@@ -225,3 +490,289 @@ class GenericBarFeed(BarFeed):
             self.__haveAdjClose = True
         elif self.__haveAdjClose:
             raise Exception("Previous bars had adjusted close and these ones doesn't have.")
+
+    def addBarsFromCSVs(self, paths, timezone=None, processes=None):
+        """Loads bars for many instruments from CSV formatted files. Files are parsed on a pool of worker
+        processes, and parsed bars are handed back through memory-mapped files.
+        All the instruments get registered in the bar feed.
+
+        :param paths: A dictionary that maps instrument identifiers to paths to CSV files, or a sequence of
+            (instrument, path) tuples. Use the latter to load many files for the same instrument.
+        :type paths: dict or list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes to use. If None, the number of CPUs is used.
+        :type processes: int.
+
+        .. note::
+            * Files are always bulk loaded, regardless of :meth:`setUseBulkLoading`, so datetimes in CSV files must have
+              a fixed format (zero padded fields). The exception is when files are parsed one by one in this
+              process, which happens if the timezone is not a pytz timezone.
+            * Worker processes are started using :mod:`multiprocessing`. On Windows they import the main module, so the
+              script that calls this must be protected with an ``if __name__ == "__main__":`` guard.
+            * If the cache is not in use, bars are handed back through files in a temporary directory. On Windows
+              memory-mapped files can't be removed while in use, so those files are left behind.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+        rowParser = GenericRowParser(timezone)
+        BarFeed.addBarsFromCSVs(self, paths, rowParser, processes)
+
+        if rowParser.barsHaveAdjClose():
+            self.__haveAdjClose = True
+        elif self.__haveAdjClose:
+            raise Exception("Previous bars had adjusted close and these ones doesn't have.")
+
+
+# Reads bars from a CSV file in chunks.
+class CSVChunkReader:
+    def __init__(self, path, rowParser, barFilter, chunkSize):
+        self.__path = path
+        self.__rowParser = rowParser
+        self.__barFilter = barFilter
+        self.__chunkSize = chunkSize
+        self.__file = open(path, "r")
+        self.__fieldNames = rowParser.getFieldNames()
+        if self.__fieldNames is None:
+            # It is expected for the first row to have the field names.
+            self.__fieldNames = csv.reader([self.__file.readline()], delimiter=rowParser.getDelimiter()).next()
+        self.__reader = None
+        if not rowParser.supportsBulkLoading():
+            self.__reader = csvutils.FastDictReader(self.__file, fieldnames=self.__fieldNames, delimiter=rowParser.getDelimiter())
+
+    def getPath(self):
+        return self.__path
+
+    def __readColumns(self):
+        while True:
+            lines = list(itertools.islice(self.__file, self.__chunkSize))
+            if len(lines) == 0:
+                return None
+            # Skip chunks with empty rows only.
+            if len([line for line in lines if len(line.strip())]):
+                break
+
+        csvColumns = csvutils.read_columns(cStringIO.StringIO("".join(lines)), fieldnames=self.__fieldNames, delimiter=self.__rowParser.getDelimiter())
+        ret = self.__rowParser.parseColumns(csvColumns)
+        if self.__barFilter is not None:
+            ret = ret.select(self.__barFilter.includeBars(ret))
+        return ret
+
+    def __readBars(self):
+        ret = []
+        rowCount = 0
+        for row in itertools.islice(self.__reader, self.__chunkSize):
+            rowCount += 1
+            bar_ = self.__rowParser.parseBar(row)
+            if bar_ is not None and (self.__barFilter is None or self.__barFilter.includeBar(bar_)):
+                ret.append(bar_)
+        if rowCount == 0:
+            return None
+        return ret
+
+    # Returns a sequence of bars (a list or a pyalgotrade.barfeed.columnar.BarColumns), or None once there are no
+    # more rows. The sequence may be empty if all the bars in the chunk were filtered out.
+    def readChunk(self):
+        if self.__file.closed:
+            return None
+        if self.__reader is None:
+            ret = self.__readColumns()
+        else:
+            ret = self.__readBars()
+        if ret is None:
+            self.close()
+        return ret
+
+    def close(self):
+        self.__file.close()
+
+
+# Returns the bars for a single instrument, from one or more CSV files, one at a time.
+# Session close attributes are set using the next two bars, like pyalgotrade.barfeed.helpers.set_session_close_attributes
+# does.
+class BarStream:
+    def __init__(self, instrument, chunkSize):
+        self.__instrument = instrument
+        self.__chunkSize = chunkSize
+        # Each element is a tuple with the path, the row parser and the bar filter.
+        self.__sources = []
+        self.__reader = None
+        self.__chunk = []
+        self.__chunkIdx = 0
+        # The next bars, up to three.
+        self.__nextBars = []
+        self.__lastDateTime = None
+
+    def addSource(self, path, rowParser, barFilter):
+        self.__sources.append((path, rowParser, barFilter))
+
+    def __readBar(self):
+        while self.__chunkIdx >= len(self.__chunk):
+            if self.__reader is not None:
+                self.__chunk = self.__reader.readChunk()
+                if self.__chunk is None:
+                    self.__reader = None
+                    self.__chunk = []
+            elif len(self.__sources):
+                path, rowParser, barFilter = self.__sources.pop(0)
+                self.__reader = CSVChunkReader(path, rowParser, barFilter, self.__chunkSize)
+            else:
+                return None
+            self.__chunkIdx = 0
+
+        ret = self.__chunk[self.__chunkIdx]
+        self.__chunkIdx += 1
+        if self.__lastDateTime is not None and ret.getDateTime() < self.__lastDateTime:
+            raise Exception("Bars for %s are not sorted by datetime. %s is older than %s" % (self.__instrument, ret.getDateTime(), self.__lastDateTime))
+        self.__lastDateTime = ret.getDateTime()
+        return ret
+
+    def __fill(self):
+        while len(self.__nextBars) < 3:
+            bar_ = self.__readBar()
+            if bar_ is None:
+                break
+            self.__nextBars.append(bar_)
+
+    def peek(self):
+        if len(self.__nextBars) == 0:
+            self.__fill()
+        if len(self.__nextBars) == 0:
+            return None
+        return self.__nextBars[0]
+
+    def pop(self):
+        self.__fill()
+        ret = self.__nextBars.pop(0)
+        nextBar = None
+        nextNextBar = None
+        if len(self.__nextBars) > 0:
+            nextBar = self.__nextBars[0]
+        if len(self.__nextBars) > 1:
+            nextNextBar = self.__nextBars[1]
+
+        if helpers.session_close(ret, nextBar):
+            ret.setSessionClose(True)
+        # Flag the penultimate bar for each session, and the penultimate bar in the feed.
+        if nextBar is not None:
+            if nextNextBar is None or (helpers.session_close(nextBar, nextNextBar) and not helpers.session_close(ret, nextBar)):
+                ret.setBarsTillSessionClose(1)
+        return ret
+
+    def close(self):
+        if self.__reader is not None:
+            self.__reader.close()
+            self.__reader = None
+        self.__sources = []
+        self.__chunk = []
+        self.__nextBars = []
+
+
+class StreamingBarFeed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BarFeed` that reads bars from CSV files as they get dispatched, instead of
+    loading them all in memory. Files are read in chunks, and instruments are merged by datetime.
+
+    :param frequency: The frequency of the bars.
+    :param chunkSize: The number of rows to read at once from each file.
+    :type chunkSize: int.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        * Rows in each file must be sorted by datetime, oldest first. If many files are added for the same instrument,
+          they must be added in order too. Yahoo! Finance CSV files are sorted newest first so they can't be streamed.
+        * Row parsers that support bulk loading parse each chunk into NumPy arrays.
+    """
+
+    def __init__(self, frequency, chunkSize=STREAMING_CHUNK_SIZE, maxLen=dataseries.DEFAULT_MAX_LEN):
+        barfeed.BaseBarFeed.__init__(self, frequency, maxLen)
+        if not chunkSize > 0:
+            raise Exception("Invalid chunk size")
+        self.__chunkSize = chunkSize
+        self.__barFilter = None
+        self.__streams = {}
+        # Each element is a tuple with the next datetime and the instrument.
+        self.__heap = None
+
+    def isRealTime(self):
+        return False
+
+    def setBarFilter(self, barFilter):
+        self.__barFilter = barFilter
+
+    def addBarsFromCSV(self, instrument, path, rowParser):
+        """Adds a CSV file to read bars from, for a given instrument. The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param rowParser: The row parser. For example :class:`pyalgotrade.barfeed.ninjatraderfeed.RowParser` or
+            :class:`GenericRowParser`.
+        """
+        if self.__heap is not None:
+            raise Exception("Can't add more bars once you started consuming bars")
+
+        stream = self.__streams.get(instrument)
+        if stream is None:
+            stream = BarStream(instrument, self.__chunkSize)
+            self.__streams[instrument] = stream
+        stream.addSource(path, rowParser, self.__barFilter)
+        self.registerInstrument(instrument)
+
+    def barsHaveAdjClose(self):
+        # This is based on the first bar for each instrument.
+        ret = False
+        for stream in self.__streams.itervalues():
+            bar_ = stream.peek()
+            if bar_ is not None:
+                if bar_.getAdjClose() is None:
+                    return False
+                ret = True
+        return ret
+
+    def start(self):
+        self.__heap = []
+        for instrument, stream in self.__streams.iteritems():
+            bar_ = stream.peek()
+            if bar_ is not None:
+                self.__heap.append((bar_.getDateTime(), instrument))
+        heapq.heapify(self.__heap)
+
+    def stop(self):
+        for stream in self.__streams.itervalues():
+            stream.close()
+        self.__heap = []
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__heap is not None and len(self.__heap) == 0
+
+    def peekDateTime(self):
+        ret = None
+        if self.__heap:
+            ret = self.__heap[0][0]
+        return ret
+
+    def getNextBars(self):
+        if not self.__heap:
+            return None
+
+        # Return all the bars with the smallest datetime.
+        smallestDateTime = self.__heap[0][0]
+        ret = {}
+        while self.__heap and self.__heap[0][0] == smallestDateTime:
+            instrument = heapq.heappop(self.__heap)[1]
+            ret[instrument] = self.__streams[instrument].pop()
+
+        # Push the instruments back once all the bars were popped, since the next bar for an instrument may have the
+        # same datetime.
+        for instrument in ret.iterkeys():
+            nextBar = self.__streams[instrument].peek()
+            if nextBar is not None:
+                heapq.heappush(self.__heap, (nextBar.getDateTime(), instrument))
+        return bar.Bars(ret)
@@ -18,14 +18,21 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import numpy as np
+
 from pyalgotrade import barfeed
 from pyalgotrade import dataseries
 from pyalgotrade.barfeed import helpers
+from pyalgotrade.barfeed import columnar
 from pyalgotrade import bar
+from pyalgotrade.utils import dt
+
+# Number of bars to load at once in loadAll.
+LOAD_ALL_BATCH_SIZE = 1024
 
 
 # A non real-time BarFeed responsible for:
-# - Holding bars in memory.
+# - Holding bars in memory, either in lists or in pyalgotrade.barfeed.columnar.BarColumns.
 # - Aligning them with respect to time.
 #
 # Subclasses should:
@@ -38,15 +45,36 @@ class BarFeed(barfeed.BaseBarFeed):
         self.__nextBarIdx = {}
         self.__started = False
         self.__barsLeft = 0
+        self.__useCompactBars = False
 
     def isRealTime(self):
         return False
 
+    def getUseCompactBars(self):
+        return self.__useCompactBars
+
+    def setUseCompactBars(self, useCompactBars):
+        """Sets whether to keep all the bars in :class:`pyalgotrade.barfeed.columnar.BarColumns`, and to dispatch
+        :class:`pyalgotrade.barfeed.columnar.BarView` instances instead of building a
+        :class:`pyalgotrade.bar.BasicBar` for each one. This takes much less memory per bar.
+
+        :param useCompactBars: True to use compact bars.
+        :type useCompactBars: boolean.
+
+        .. note::
+            * This should be set before adding bars.
+            * Bars added from sequences are kept in lists if their datetimes don't share a pytz timezone.
+        """
+        self.__useCompactBars = useCompactBars
+
     def start(self):
         self.__started = True
         # Set session close attributes to bars.
         for instrument, bars in self.__bars.iteritems():
-            helpers.set_session_close_attributes(bars)
+            if isinstance(bars, columnar.BarColumns):
+                bars.setSessionCloseAttributes()
+            else:
+                helpers.set_session_close_attributes(bars)
             self.__barsLeft = max(self.__barsLeft, len(bars))
 
     def stop(self):
@@ -59,9 +87,19 @@ class BarFeed(barfeed.BaseBarFeed):
         if self.__started:
             raise Exception("Can't add more bars once you started consuming bars")
 
+        if self.__useCompactBars:
+            barColumns = columnar.from_bars(bars)
+            if barColumns is not None and self.__canMergeColumns(instrument, barColumns):
+                self.addBarsFromColumns(instrument, barColumns)
+                return
+
         self.__bars.setdefault(instrument, [])
         self.__nextBarIdx.setdefault(instrument, 0)
 
+        # Build the bars if they were added in columns.
+        if isinstance(self.__bars[instrument], columnar.BarColumns):
+            self.__bars[instrument] = [self.__bars[instrument][i] for i in xrange(len(self.__bars[instrument]))]
+
         # Add and sort the bars
         self.__bars[instrument].extend(bars)
         barCmp = lambda x, y: cmp(x.getDateTime(), y.getDateTime())
@@ -69,6 +107,45 @@ class BarFeed(barfeed.BaseBarFeed):
 
         self.registerInstrument(instrument)
 
+    def __canMergeColumns(self, instrument, barColumns):
+        bars = self.__bars.get(instrument)
+        if bars is None:
+            return True
+        if isinstance(bars, columnar.BarColumns):
+            return bars.getTimeZone() == barColumns.getTimeZone()
+        return len(bars) == 0
+
+    def addBarsFromColumns(self, instrument, barColumns):
+        """Adds bars held in a :class:`pyalgotrade.barfeed.columnar.BarColumns`. They are kept that way, and
+        :class:`pyalgotrade.bar.Bar` instances are built as they get dispatched.
+        The instrument gets registered in the bar feed."""
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+
+        if not self.__canMergeColumns(instrument, barColumns):
+            # Bars can't be merged in columns, so build them.
+            self.addBarsFromSequence(instrument, [barColumns[i] for i in xrange(len(barColumns))])
+            return
+
+        bars = self.__bars.get(instrument)
+        if isinstance(bars, columnar.BarColumns):
+            self.__bars[instrument] = bars.concatenate(barColumns).sort()
+        else:
+            self.__bars[instrument] = barColumns.sort()
+
+        self.__nextBarIdx.setdefault(instrument, 0)
+        self.registerInstrument(instrument)
+
+    def __getBar(self, bars, pos):
+        if self.__useCompactBars and isinstance(bars, columnar.BarColumns):
+            return bars.getView(pos)
+        return bars[pos]
+
+    def __getDateTime(self, bars, pos):
+        if isinstance(bars, columnar.BarColumns):
+            return bars.getDateTime(pos)
+        return bars[pos].getDateTime()
+
     def eof(self):
         ret = True
         # Check if there is at least one more bar to return.
@@ -85,11 +162,27 @@ class BarFeed(barfeed.BaseBarFeed):
         for instrument, bars in self.__bars.iteritems():
             nextIdx = self.__nextBarIdx[instrument]
             if nextIdx < len(bars):
-                if ret is None or bars[nextIdx].getDateTime() < ret:
-                    ret = bars[nextIdx].getDateTime()
+                dateTime = self.__getDateTime(bars, nextIdx)
+                if ret is None or dateTime < ret:
+                    ret = dateTime
 
         return ret
 
+    def getDispatchSchedule(self):
+        # Bars for all instruments that share a datetime are returned together, so there is one event per datetime.
+        ret = [np.empty(0, dtype=np.int64)]
+        for instrument, bars in self.__bars.iteritems():
+            nextIdx = self.__nextBarIdx[instrument]
+            if isinstance(bars, columnar.BarColumns):
+                dateTimes = bars.getDateTimes()[nextIdx:]
+            else:
+                dateTimes = np.array([dt.datetime_to_microseconds(bar_.getDateTime()) for bar_ in bars[nextIdx:]], dtype=np.int64)
+            # Repeated datetimes for an instrument take more than one event each, so the schedule is not known.
+            if np.any(dateTimes[1:] == dateTimes[:-1]):
+                return None
+            ret.append(dateTimes)
+        return np.unique(np.concatenate(ret))
+
     def getNextBars(self):
         # All bars must have the same datetime. We will return all the ones with the smallest datetime.
         smallestDateTime = self.peekDateTime()
@@ -102,8 +195,8 @@ class BarFeed(barfeed.BaseBarFeed):
         ret = {}
         for instrument, bars in self.__bars.iteritems():
             nextIdx = self.__nextBarIdx[instrument]
-            if nextIdx < len(bars) and bars[nextIdx].getDateTime() == smallestDateTime:
-                ret[instrument] = bars[nextIdx]
+            if nextIdx < len(bars) and self.__getDateTime(bars, nextIdx) == smallestDateTime:
+                ret[instrument] = self.__getBar(bars, nextIdx)
                 self.__nextBarIdx[instrument] += 1
 
         self.__barsLeft -= 1
@@ -113,5 +206,10 @@ class BarFeed(barfeed.BaseBarFeed):
         return self.__barsLeft
 
     def loadAll(self):
-        for dateTime, bars in self:
-            pass
+        self.start()
+        try:
+            while not self.eof():
+                self.getNextValuesBatchAndUpdateDS(LOAD_ALL_BATCH_SIZE)
+        finally:
+            self.stop()
+            self.join()
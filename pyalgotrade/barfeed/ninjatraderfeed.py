@@ -20,6 +20,7 @@
 
 import pyalgotrade.barfeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import columnar
 from pyalgotrade import bar
 from pyalgotrade import dataseries
 from pyalgotrade.utils import dt
@@ -92,6 +93,40 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ";"
 
+    def supportsBulkLoading(self):
+        return True
+
+    def getCacheParameters(self):
+        return (self.__frequency, self.__dailyBarTime, self.__timezone)
+
+    def parseColumns(self, csvColumns):
+        if self.__frequency == pyalgotrade.barfeed.Frequency.MINUTE:
+            dateTimes = columnar.parse_datetimes(csvColumns["Date Time"], "%Y%m%d %H%M%S")
+        elif self.__frequency == pyalgotrade.barfeed.Frequency.DAY:
+            dateTimes = columnar.parse_datetimes(csvColumns["Date Time"], "%Y%m%d")
+            # Time on CSV files is empty. If told to set one, do it.
+            if self.__dailyBarTime is not None:
+                dateTimes = dateTimes + columnar.time_to_microseconds(self.__dailyBarTime)
+        else:
+            assert(False)
+
+        # According to NinjaTrader documentation the exported data will be in UTC.
+        timezone = pytz.utc
+        # Localize bars if a market session was set.
+        if self.__timezone:
+            timezone = self.__timezone
+
+        return columnar.BarColumns(
+            dateTimes,
+            columnar.parse_floats(csvColumns["Open"]),
+            columnar.parse_floats(csvColumns["High"]),
+            columnar.parse_floats(csvColumns["Low"]),
+            columnar.parse_floats(csvColumns["Close"]),
+            columnar.parse_floats(csvColumns["Volume"]),
+            None,
+            timezone
+        )
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDateTime(csvRowDict["Date Time"])
         close = float(csvRowDict["Close"])
@@ -150,3 +185,35 @@ class Feed(csvfeed.BarFeed):
 
         rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
         csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+
+    def addBarsFromCSVs(self, paths, timezone=None, processes=None):
+        """Loads bars for many instruments from CSV formatted files. Files are parsed on a pool of worker
+        processes, and parsed bars are handed back through memory-mapped files.
+        All the instruments get registered in the bar feed.
+
+        :param paths: A dictionary that maps instrument identifiers to paths to CSV files, or a sequence of
+            (instrument, path) tuples. Use the latter to load many files for the same instrument.
+        :type paths: dict or list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes to use. If None, the number of CPUs is used.
+        :type processes: int.
+
+        .. note::
+            * Files are always bulk loaded, regardless of :meth:`setUseBulkLoading`, so datetimes in CSV files must have
+              a fixed format (zero padded fields). The exception is when files are parsed one by one in this
+              process, which happens if the timezone is not a pytz timezone.
+            * Worker processes are started using :mod:`multiprocessing`. On Windows they import the main module, so the
+              script that calls this must be protected with an ``if __name__ == "__main__":`` guard.
+            * If the cache is not in use, bars are handed back through files in a temporary directory. On Windows
+              memory-mapped files can't be removed while in use, so those files are left behind.
+        """
+
+        if isinstance(timezone, types.IntType):
+            raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
+
+        if timezone is None:
+            timezone = self.__timezone
+
+        rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+        csvfeed.BarFeed.addBarsFromCSVs(self, paths, rowParser, processes)
@@ -20,12 +20,14 @@
 
 from pyalgotrade import barfeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import columnar
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
 from pyalgotrade import dataseries
 
 import types
 import datetime
+import numpy as np
 
 
 ######################################################################
@@ -71,6 +73,34 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ","
 
+    def supportsBulkLoading(self):
+        return True
+
+    def getCacheParameters(self):
+        return (self.__dailyBarTime, self.__timezone, self.__sanitize)
+
+    def parseColumns(self, csvColumns):
+        dateTimes = columnar.parse_datetimes(csvColumns["Date"], "%Y-%m-%d")
+        # Time on Yahoo! Finance CSV files is empty. If told to set one, do it.
+        if self.__dailyBarTime is not None:
+            dateTimes = dateTimes + columnar.time_to_microseconds(self.__dailyBarTime)
+        # Localize datetimes if a timezone was given.
+        if self.__timezone:
+            dateTimes = columnar.localize(dateTimes, self.__timezone)
+
+        close = columnar.parse_floats(csvColumns["Close"])
+        open_ = columnar.parse_floats(csvColumns["Open"])
+        high = columnar.parse_floats(csvColumns["High"])
+        low = columnar.parse_floats(csvColumns["Low"])
+        volume = columnar.parse_floats(csvColumns["Volume"])
+        adjClose = columnar.parse_floats(csvColumns["Adj Close"])
+
+        if self.__sanitize:
+            low = np.minimum(low, np.minimum(open_, close))
+            high = np.maximum(high, np.maximum(open_, close))
+
+        return columnar.BarColumns(dateTimes, open_, high, low, close, volume, adjClose, self.__timezone)
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDate(csvRowDict["Date"])
         close = float(csvRowDict["Close"])
@@ -143,3 +173,34 @@ class Feed(csvfeed.BarFeed):
             timezone = self.__timezone
         rowParser = RowParser(self.getDailyBarTime(), timezone, self.__sanitizeBars)
         csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+
+    def addBarsFromCSVs(self, paths, timezone=None, processes=None):
+        """Loads bars for many instruments from CSV formatted files. Files are parsed on a pool of worker
+        processes, and parsed bars are handed back through memory-mapped files.
+        All the instruments get registered in the bar feed.
+
+        :param paths: A dictionary that maps instrument identifiers to paths to CSV files, or a sequence of
+            (instrument, path) tuples. Use the latter to load many files for the same instrument.
+        :type paths: dict or list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes to use. If None, the number of CPUs is used.
+        :type processes: int.
+
+        .. note::
+            * Files are always bulk loaded, regardless of :meth:`setUseBulkLoading`, so datetimes in CSV files must have
+              a fixed format (zero padded fields). The exception is when files are parsed one by one in this
+              process, which happens if the timezone is not a pytz timezone.
+            * Worker processes are started using :mod:`multiprocessing`. On Windows they import the main module, so the
+              script that calls this must be protected with an ``if __name__ == "__main__":`` guard.
+            * If the cache is not in use, bars are handed back through files in a temporary directory. On Windows
+              memory-mapped files can't be removed while in use, so those files are left behind.
+        """
+
+        if isinstance(timezone, types.IntType):
+            raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
+
+        if timezone is None:
+            timezone = self.__timezone
+        rowParser = RowParser(self.getDailyBarTime(), timezone, self.__sanitizeBars)
+        csvfeed.BarFeed.addBarsFromCSVs(self, paths, rowParser, processes)
@@ -18,6 +18,8 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import numpy as np
+
 from pyalgotrade import broker
 from pyalgotrade import warninghelpers
 import pyalgotrade.logger
@@ -640,6 +642,10 @@ class Broker(broker.Broker):
     def peekDateTime(self):
         return None
 
+    def getDispatchSchedule(self):
+        # There is nothing to dispatch.
+        return np.empty(0, dtype=np.int64)
+
     def createMarketOrder(self, action, instrument, quantity, onClose=False):
         return MarketOrder(self.__getNextOrderId(), action, instrument, quantity, onClose)
 
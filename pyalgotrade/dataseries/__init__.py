@@ -18,11 +18,40 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import bisect
+import itertools
+import operator
+
+import numpy as np
+
 from pyalgotrade import observer
 from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
 
 DEFAULT_MAX_LEN = 1024
 
+# Used in timestamp columns for values with no datetime.
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+# Raises if datetimes that are not None are not in ascending order.
+def check_datetimes_order(dateTimes):
+    if None in dateTimes:
+        prevDateTime = None
+        for dateTime in dateTimes:
+            if dateTime is not None and prevDateTime is not None and prevDateTime >= dateTime:
+                raise Exception("Invalid datetime. It must be bigger than that last one")
+            prevDateTime = dateTime
+    elif any(itertools.imap(operator.ge, dateTimes[:-1], dateTimes[1:])):
+        raise Exception("Invalid datetime. It must be bigger than that last one")
+
+
+# Raises if timestamps that are not NO_TIMESTAMP are not in ascending order.
+def check_timestamps_order(timestamps):
+    valid = (timestamps[:-1] != NO_TIMESTAMP) & (timestamps[1:] != NO_TIMESTAMP)
+    if np.any((timestamps[:-1] >= timestamps[1:]) & valid):
+        raise Exception("Invalid datetime. It must be bigger than that last one")
+
 
 # It is important to inherit object to get __getitem__ to work properly.
 # Check http://code.activestate.com/lists/python-list/621258/
@@ -55,10 +84,79 @@ class DataSeries(object):
     def getValueAbsolute(self, pos):
         raise NotImplementedError()
 
+    # Returns True if there are handlers subscribed to the new value event.
+    # Subclasses that create the event lazily should override this so the event doesn't get created just to check.
+    def hasNewValueSubscribers(self):
+        return self.getNewValueEvent().hasSubscribers()
+
     def getDateTimes(self):
         """Returns a list of :class:`datetime.datetime` associated with each value."""
         raise NotImplementedError()
 
+    def asArray(self, start=None, end=None):
+        """Returns a numpy.array with the values in the [start:end] range, with None values mapped to NaN.
+        DataSeries backed by numpy arrays return a view instead of a copy, so the array should be treated as read-only.
+
+        :param start: The starting position. Negative values are supported.
+        :type start: int.
+        :param end: The ending position (not included). Negative values are supported.
+        :type end: int.
+        """
+        return np.array(self[start:end], dtype=float)
+
+    def searchDateTime(self, dateTime, side="left"):
+        """Returns the position where dateTime would have to be inserted to keep datetimes in order, using binary search.
+        If side is "left" the position of the first matching datetime is returned. If side is "right", the position
+        after the last matching one is returned.
+
+        .. note::
+            This is the only method that needs to be overridden to speed up datetime lookups in subclasses.
+        """
+        if side == "left":
+            ret = bisect.bisect_left(self.getDateTimes(), dateTime)
+        else:
+            ret = bisect.bisect_right(self.getDateTimes(), dateTime)
+        return ret
+
+    def indexOf(self, dateTime):
+        """Returns the position of the value associated with a given datetime, or None if there is no such value.
+
+        :param dateTime: The datetime to look for.
+        :type dateTime: :class:`datetime.datetime`.
+        """
+        pos = self.searchDateTime(dateTime, "left")
+        if self.searchDateTime(dateTime, "right") > pos:
+            return pos
+        return None
+
+    def getValueAt(self, dateTime):
+        """Returns the value associated with a given datetime or, if there is no such value, the last value before it.
+        If there are no values at or before dateTime, None is returned.
+
+        :param dateTime: The datetime to look for.
+        :type dateTime: :class:`datetime.datetime`.
+        """
+        pos = self.searchDateTime(dateTime, "right") - 1
+        if pos < 0:
+            return None
+        return self[pos]
+
+    def sliceByTime(self, fromDateTime=None, toDateTime=None):
+        """Returns a list with the values whose datetimes are in the [fromDateTime, toDateTime] range.
+
+        :param fromDateTime: The beginning of the range. If None, values are included from the beginning.
+        :type fromDateTime: :class:`datetime.datetime`.
+        :param toDateTime: The end of the range, inclusive. If None, values are included up to the end.
+        :type toDateTime: :class:`datetime.datetime`.
+        """
+        start = 0
+        end = len(self)
+        if fromDateTime is not None:
+            start = self.searchDateTime(fromDateTime, "left")
+        if toDateTime is not None:
+            end = self.searchDateTime(toDateTime, "right")
+        return self[start:end]
+
 
 class SequenceDataSeries(DataSeries):
     """A DataSeries that holds values in a sequence in memory.
@@ -72,7 +170,8 @@ class SequenceDataSeries(DataSeries):
         if not maxLen > 0:
             raise Exception("Invalid maximum length")
 
-        self.__newValueEvent = observer.Event()
+        self.__newValueEvent = None
+        self.__newValuesBatchEvent = None
         self.__values = collections.ListDeque(maxLen)
         self.__dateTimes = collections.ListDeque(maxLen)
         self.__maxLen = maxLen
@@ -97,8 +196,23 @@ class SequenceDataSeries(DataSeries):
     # 2: The datetime for the new value
     # 3: The new value
     def getNewValueEvent(self):
+        # Events are created on demand, so appending values to a DataSeries nobody listens to does no event work.
+        if self.__newValueEvent is None:
+            self.__newValueEvent = observer.Event()
         return self.__newValueEvent
 
+    def hasNewValueSubscribers(self):
+        return self.__newValueEvent is not None and self.__newValueEvent.hasSubscribers()
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: A sequence with the datetimes for the new values
+    # 3: A sequence with the new values
+    def getNewValuesBatchEvent(self):
+        if self.__newValuesBatchEvent is None:
+            self.__newValuesBatchEvent = observer.Event()
+        return self.__newValuesBatchEvent
+
     def getValueAbsolute(self, pos):
         ret = None
         if pos >= 0 and pos < len(self.__values):
@@ -124,7 +238,215 @@ class SequenceDataSeries(DataSeries):
         self.__dateTimes.append(dateTime)
         self.__values.append(value)
 
-        self.getNewValueEvent().emit(self, dateTime, value)
+        if self.__newValueEvent is not None:
+            self.__newValueEvent.emit(self, dateTime, value)
+
+    def extend(self, dateTimes, values):
+        """
+        Appends multiple values with their associated datetimes.
+        If there are no subscribers for the new value event, values are added in bulk and only the new values batch event
+        is emitted. Otherwise, values are added one at a time, and the new values batch event is emitted at the end.
+
+        .. note::
+            Datetimes that are not None must be greater than the previous ones.
+        """
+
+        if len(dateTimes) != len(values):
+            raise Exception("The number of datetimes and values must match")
+        if len(values) == 0:
+            return
+
+        if self.hasNewValueSubscribers():
+            for i in xrange(len(values)):
+                self.appendWithDateTime(dateTimes[i], values[i])
+        else:
+            if len(self.__dateTimes):
+                check_datetimes_order([self.__dateTimes[-1]] + list(dateTimes))
+            else:
+                check_datetimes_order(dateTimes)
+            self.__dateTimes.extend(dateTimes)
+            self.__values.extend(values)
+
+        if self.__newValuesBatchEvent is not None:
+            self.__newValuesBatchEvent.emit(self, dateTimes, values)
 
     def getDateTimes(self):
         return self.__dateTimes.data()
+
+    def searchDateTime(self, dateTime, side="left"):
+        if side == "left":
+            ret = bisect.bisect_left(self.__dateTimes, dateTime)
+        else:
+            ret = bisect.bisect_right(self.__dateTimes, dateTime)
+        return ret
+
+
+class NumericDataSeries(DataSeries):
+    """A DataSeries that holds numeric values in a preallocated numpy array.
+    Datetimes are stored as the number of microseconds since the epoch in an int64 array.
+
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+    :param dtype: The desired data-type for the array.
+    :type dtype: data-type.
+
+    .. note::
+        * None values are stored as NaN, and NaN values are returned as None. This requires a floating point dtype.
+        * All datetimes are expected to be either naive or in the same timezone.
+    """
+
+    def __init__(self, maxLen=DEFAULT_MAX_LEN, dtype=float):
+        if not maxLen > 0:
+            raise Exception("Invalid maximum length")
+
+        self.__newValueEvent = None
+        self.__newValuesBatchEvent = None
+        self.__values = collections.NumPyDeque(maxLen, dtype)
+        self.__timestamps = collections.NumPyDeque(maxLen, np.int64)
+        self.__tzinfo = None
+
+    def __len__(self):
+        return len(self.__values)
+
+    def setMaxLen(self, maxLen):
+        """Sets the maximum number of values to hold and resizes accordingly if necessary."""
+        if not maxLen > 0:
+            raise Exception("Invalid maximum length")
+
+        # NumPyDeque.resize keeps the oldest values, and we want to keep the newest ones.
+        values = self.__values.data()[-maxLen:]
+        timestamps = self.__timestamps.data()[-maxLen:]
+        self.__values = collections.NumPyDeque(maxLen, values.dtype)
+        self.__timestamps = collections.NumPyDeque(maxLen, np.int64)
+        for i in xrange(len(values)):
+            self.__values.append(values[i])
+            self.__timestamps.append(timestamps[i])
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold."""
+        return self.__values.getMaxLen()
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: The datetime for the new value
+    # 3: The new value
+    def getNewValueEvent(self):
+        # Events are created on demand, so appending values to a DataSeries nobody listens to does no event work.
+        if self.__newValueEvent is None:
+            self.__newValueEvent = observer.Event()
+        return self.__newValueEvent
+
+    def hasNewValueSubscribers(self):
+        return self.__newValueEvent is not None and self.__newValueEvent.hasSubscribers()
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: A sequence with the datetimes for the new values
+    # 3: A sequence with the new values
+    def getNewValuesBatchEvent(self):
+        if self.__newValuesBatchEvent is None:
+            self.__newValuesBatchEvent = observer.Event()
+        return self.__newValuesBatchEvent
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__values):
+            # item returns a Python scalar instead of a numpy one, just like the other DataSeries.
+            ret = self.__values.data().item(pos)
+            # NaN is the only value that is not equal to itself.
+            if ret != ret:
+                ret = None
+        return ret
+
+    def append(self, value):
+        """Appends a value."""
+        self.appendWithDateTime(None, value)
+
+    def appendWithDateTime(self, dateTime, value):
+        """
+        Appends a value with an associated datetime.
+
+        .. note::
+            If dateTime is not None, it must be greater than the last one.
+        """
+
+        if dateTime is None:
+            timestamp = NO_TIMESTAMP
+        else:
+            timestamp = dt.datetime_to_microseconds(dateTime)
+            if len(self.__timestamps) != 0 and self.__timestamps[-1] != NO_TIMESTAMP and self.__timestamps[-1] >= timestamp:
+                raise Exception("Invalid datetime. It must be bigger than that last one")
+            self.__tzinfo = dateTime.tzinfo
+
+        self.__timestamps.append(timestamp)
+        if value is None:
+            self.__values.append(np.nan)
+        else:
+            self.__values.append(value)
+
+        if self.__newValueEvent is not None:
+            self.__newValueEvent.emit(self, dateTime, value)
+
+    def extend(self, dateTimes, values):
+        """
+        Appends multiple values with their associated datetimes.
+        If there are no subscribers for the new value event, values are added in bulk and only the new values batch event
+        is emitted. Otherwise, values are added one at a time, and the new values batch event is emitted at the end.
+        Subscribers to the new values batch event can use :meth:`asArray` to get the new values as a numpy.array.
+
+        .. note::
+            Datetimes that are not None must be greater than the previous ones.
+        """
+
+        if len(dateTimes) != len(values):
+            raise Exception("The number of datetimes and values must match")
+        if len(values) == 0:
+            return
+
+        if self.hasNewValueSubscribers():
+            for i in xrange(len(values)):
+                self.appendWithDateTime(dateTimes[i], values[i])
+        else:
+            timestamps = np.array([NO_TIMESTAMP if dateTime is None else dt.datetime_to_microseconds(dateTime) for dateTime in dateTimes], dtype=np.int64)
+            if len(self.__timestamps):
+                check_timestamps_order(np.concatenate((self.__timestamps[-1:], timestamps)))
+            else:
+                check_timestamps_order(timestamps)
+            for dateTime in reversed(dateTimes):
+                if dateTime is not None:
+                    self.__tzinfo = dateTime.tzinfo
+                    break
+            self.__timestamps.extend(timestamps)
+            self.__values.extend(values)
+
+        if self.__newValuesBatchEvent is not None:
+            self.__newValuesBatchEvent.emit(self, dateTimes, values)
+
+    def getDateTimes(self):
+        return [self.__toDateTime(timestamp) for timestamp in self.__timestamps.data()]
+
+    def searchDateTime(self, dateTime, side="left"):
+        return int(np.searchsorted(self.__timestamps.data(), dt.datetime_to_microseconds(dateTime), side))
+
+    def __toDateTime(self, timestamp):
+        if timestamp == NO_TIMESTAMP:
+            return None
+        return dt.microseconds_to_datetime(timestamp, self.__tzinfo)
+
+    def asArray(self, start=None, end=None):
+        """Returns a numpy.array with the values in the [start:end] range. This is a view, not a copy, so it
+        should be treated as read-only and it is only valid until the next value is appended.
+
+        :param start: The starting position. Negative values are supported.
+        :type start: int.
+        :param end: The ending position (not included). Negative values are supported.
+        :type end: int.
+        """
+        return self.__values.data()[start:end]
+
+    def asTimestampArray(self, start=None, end=None):
+        """Returns a numpy.array with the datetimes in the [start:end] range, as microseconds since the epoch.
+        Positions with no datetime hold :const:`NO_TIMESTAMP`. Just like :meth:`asArray`, this is a view, not a copy.
+        """
+        return self.__timestamps.data()[start:end]
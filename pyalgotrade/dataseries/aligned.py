@@ -18,6 +18,8 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import bisect
+
 from pyalgotrade import dataseries
 
 
@@ -42,52 +44,56 @@ def datetime_aligned(ds1, ds2, maxLen=dataseries.DEFAULT_MAX_LEN):
 # This class is responsible for filling 2 dataseries when 2 other dataseries get new values.
 class Syncer:
     def __init__(self, sourceDS1, sourceDS2, destDS1, destDS2):
-        self.__values1 = []  # (datetime, value)
-        self.__values2 = []  # (datetime, value)
+        # Buffered datetimes and values are kept in separate lists so datetimes can be looked up using bisect.
+        self.__dateTimes1 = []
+        self.__values1 = []
+        self.__dateTimes2 = []
+        self.__values2 = []
         self.__destDS1 = destDS1
         self.__destDS2 = destDS2
         sourceDS1.getNewValueEvent().subscribe(self.__onNewValue1)
         sourceDS2.getNewValueEvent().subscribe(self.__onNewValue2)
         # Source dataseries will keep a reference to self and that will prevent from getting this destroyed.
 
-    # Scan backwards for the position of dateTime in ds.
-    def __findPosForDateTime(self, values, dateTime):
+    # Binary search for the position of dateTime in dateTimes.
+    def __findPosForDateTime(self, dateTimes, dateTime):
         ret = None
-        i = len(values) - 1
-        while i >= 0:
-            if values[i][0] == dateTime:
-                ret = i
-                break
-            elif values[i][0] < dateTime:
-                break
-            i -= 1
+        pos = bisect.bisect_left(dateTimes, dateTime)
+        if pos < len(dateTimes) and dateTimes[pos] == dateTime:
+            ret = pos
         return ret
 
     def __onNewValue1(self, dataSeries, dateTime, value):
-        pos2 = self.__findPosForDateTime(self.__values2, dateTime)
+        pos2 = self.__findPosForDateTime(self.__dateTimes2, dateTime)
         # If a value for dateTime was added to first dataseries, and a value for that same datetime is also in the second one
         # then append to both destination dataseries.
         if pos2 is not None:
-            self.__append(dateTime, value, self.__values2[pos2][1])
+            self.__append(dateTime, value, self.__values2[pos2])
             # Reset buffers.
+            self.__dateTimes1 = []
             self.__values1 = []
+            self.__dateTimes2 = self.__dateTimes2[pos2+1:]
             self.__values2 = self.__values2[pos2+1:]
         else:
             # Since source dataseries may not hold all the values we need, we need to buffer manually.
-            self.__values1.append((dateTime, value))
+            self.__dateTimes1.append(dateTime)
+            self.__values1.append(value)
 
     def __onNewValue2(self, dataSeries, dateTime, value):
-        pos1 = self.__findPosForDateTime(self.__values1, dateTime)
+        pos1 = self.__findPosForDateTime(self.__dateTimes1, dateTime)
         # If a value for dateTime was added to second dataseries, and a value for that same datetime is also in the first one
         # then append to both destination dataseries.
         if pos1 is not None:
-            self.__append(dateTime, self.__values1[pos1][1], value)
+            self.__append(dateTime, self.__values1[pos1], value)
             # Reset buffers.
+            self.__dateTimes1 = self.__dateTimes1[pos1+1:]
             self.__values1 = self.__values1[pos1+1:]
+            self.__dateTimes2 = []
             self.__values2 = []
         else:
             # Since source dataseries may not hold all the values we need, we need to buffer manually.
-            self.__values2.append((dateTime, value))
+            self.__dateTimes2.append(dateTime)
+            self.__values2.append(value)
 
     def __append(self, dateTime, value1, value2):
         self.__destDS1.appendWithDateTime(dateTime, value1)
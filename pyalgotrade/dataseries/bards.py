@@ -18,7 +18,15 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import operator
+
+import numpy as np
+
 from pyalgotrade import dataseries
+from pyalgotrade import observer
+from pyalgotrade import bar
+from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
 
 
 class BarDataSeries(dataseries.SequenceDataSeries):
@@ -31,12 +39,10 @@ class BarDataSeries(dataseries.SequenceDataSeries):
 
     def __init__(self, maxLen=dataseries.DEFAULT_MAX_LEN):
         dataseries.SequenceDataSeries.__init__(self, maxLen)
-        self.__openDS = dataseries.SequenceDataSeries(maxLen)
-        self.__closeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__highDS = dataseries.SequenceDataSeries(maxLen)
-        self.__lowDS = dataseries.SequenceDataSeries(maxLen)
-        self.__volumeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__adjCloseDS = dataseries.SequenceDataSeries(maxLen)
+        # The open, close, high, low, volume and adjusted close DataSeries are built on demand, so bars only get pushed
+        # into the ones that are actually being used.
+        self.__childDS = {}
+        self.__childGetters = []
 
     def append(self, value):
         self.appendWithDateTime(value.getDateTime(), value)
@@ -45,33 +51,307 @@ class BarDataSeries(dataseries.SequenceDataSeries):
         assert(dateTime is not None)
         assert(value is not None)
         dataseries.SequenceDataSeries.appendWithDateTime(self, dateTime, value)
-        self.__openDS.appendWithDateTime(dateTime, value.getOpen())
-        self.__closeDS.appendWithDateTime(dateTime, value.getClose())
-        self.__highDS.appendWithDateTime(dateTime, value.getHigh())
-        self.__lowDS.appendWithDateTime(dateTime, value.getLow())
-        self.__volumeDS.appendWithDateTime(dateTime, value.getVolume())
-        self.__adjCloseDS.appendWithDateTime(dateTime, value.getAdjClose())
+        for getter, ds in self.__childGetters:
+            ds.appendWithDateTime(dateTime, getter(value))
+
+    def extend(self, dateTimes, values):
+        # If there are subscribers, bars get appended one at a time with appendWithDateTime, and that updates the child
+        # DataSeries along with each bar.
+        subscribers = self.hasNewValueSubscribers()
+        dataseries.SequenceDataSeries.extend(self, dateTimes, values)
+        if not subscribers:
+            for getter, ds in self.__childGetters:
+                ds.extend(dateTimes, [getter(value) for value in values])
+
+    def setMaxLen(self, maxLen):
+        dataseries.SequenceDataSeries.setMaxLen(self, maxLen)
+        for getter, ds in self.__childGetters:
+            ds.setMaxLen(maxLen)
+
+    def __getChildDataSeries(self, getterName):
+        ret = self.__childDS.get(getterName)
+        if ret is None:
+            getter = operator.methodcaller(getterName)
+            ret = dataseries.SequenceDataSeries(self.getMaxLen())
+            # Backfill using the bars we already have.
+            dateTimes = self.getDateTimes()
+            for i in xrange(len(dateTimes)):
+                ret.appendWithDateTime(dateTimes[i], getter(self[i]))
+            self.__childDS[getterName] = ret
+            self.__childGetters.append((getter, ret))
+        return ret
 
     def getOpenDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the open prices."""
-        return self.__openDS
+        return self.__getChildDataSeries("getOpen")
 
     def getCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close prices."""
-        return self.__closeDS
+        return self.__getChildDataSeries("getClose")
 
     def getHighDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the high prices."""
-        return self.__highDS
+        return self.__getChildDataSeries("getHigh")
 
     def getLowDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the low prices."""
-        return self.__lowDS
+        return self.__getChildDataSeries("getLow")
 
     def getVolumeDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the volume."""
-        return self.__volumeDS
+        return self.__getChildDataSeries("getVolume")
 
     def getAdjCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the adjusted close prices."""
-        return self.__adjCloseDS
+        return self.__getChildDataSeries("getAdjClose")
+
+
+class ColumnarBarDataSeries(dataseries.DataSeries):
+    """A DataSeries of :class:`pyalgotrade.bar.Bar` instances that stores bar values in parallel numpy arrays,
+    instead of holding the :class:`pyalgotrade.bar.Bar` instances.
+    Bars are built on demand when accessed, and the DataSeries returned by getOpenDataSeries, getCloseDataSeries, etc.
+    are views over the arrays, so no values are copied when bars are appended.
+
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        * Bars are rebuilt each time they are accessed, so changes made to them are not kept.
+        * All bars are expected to have the same timezone.
+    """
+
+    OPEN = 0
+    HIGH = 1
+    LOW = 2
+    CLOSE = 3
+    VOLUME = 4
+    ADJ_CLOSE = 5
+
+    def __init__(self, maxLen=dataseries.DEFAULT_MAX_LEN):
+        if not maxLen > 0:
+            raise Exception("Invalid maximum length")
+
+        self.__newValueEvent = None
+        self.__newValuesBatchEvent = None
+        self.__tzinfo = None
+        self.__allocate(maxLen)
+        self.__columnDS = [BarColumnDataSeries(self, column) for column in xrange(len(self.__columns))]
+
+    def __allocate(self, maxLen):
+        self.__timestamps = collections.NumPyDeque(maxLen, np.int64)
+        self.__columns = [collections.NumPyDeque(maxLen, float) for column in xrange(6)]
+        self.__sessionClose = collections.NumPyDeque(maxLen, bool)
+        self.__barsTillSessionClose = collections.NumPyDeque(maxLen, float)
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def setMaxLen(self, maxLen):
+        """Sets the maximum number of values to hold and resizes accordingly if necessary."""
+        if not maxLen > 0:
+            raise Exception("Invalid maximum length")
+
+        # NumPyDeque.resize keeps the oldest values, and we want to keep the newest ones.
+        old = [self.__timestamps, self.__sessionClose, self.__barsTillSessionClose] + self.__columns
+        self.__allocate(maxLen)
+        new = [self.__timestamps, self.__sessionClose, self.__barsTillSessionClose] + self.__columns
+        for i in xrange(len(old)):
+            for value in old[i].data()[-maxLen:]:
+                new[i].append(value)
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold."""
+        return self.__timestamps.getMaxLen()
+
+    def getNewValueEvent(self):
+        if self.__newValueEvent is None:
+            self.__newValueEvent = observer.Event()
+        return self.__newValueEvent
+
+    def hasNewValueSubscribers(self):
+        return self.__newValueEvent is not None and self.__newValueEvent.hasSubscribers()
+
+    def getNewValuesBatchEvent(self):
+        if self.__newValuesBatchEvent is None:
+            self.__newValuesBatchEvent = observer.Event()
+        return self.__newValuesBatchEvent
+
+    def getValueAbsolute(self, pos):
+        if pos < 0 or pos >= len(self.__timestamps):
+            return None
+
+        values = [float(column[pos]) for column in self.__columns]
+        adjClose = values[ColumnarBarDataSeries.ADJ_CLOSE]
+        if adjClose != adjClose:
+            adjClose = None
+        ret = bar.BasicBar(
+            dt.microseconds_to_datetime(self.__timestamps[pos], self.__tzinfo),
+            values[ColumnarBarDataSeries.OPEN],
+            values[ColumnarBarDataSeries.HIGH],
+            values[ColumnarBarDataSeries.LOW],
+            values[ColumnarBarDataSeries.CLOSE],
+            values[ColumnarBarDataSeries.VOLUME],
+            adjClose
+        )
+        ret.setSessionClose(bool(self.__sessionClose[pos]))
+        barsTillSessionClose = self.__barsTillSessionClose[pos]
+        if barsTillSessionClose == barsTillSessionClose:
+            ret.setBarsTillSessionClose(int(barsTillSessionClose))
+        return ret
+
+    def append(self, value):
+        self.appendWithDateTime(value.getDateTime(), value)
+
+    def appendWithDateTime(self, dateTime, value):
+        assert(dateTime is not None)
+        assert(value is not None)
+
+        timestamp = dt.datetime_to_microseconds(dateTime)
+        if len(self.__timestamps) != 0 and self.__timestamps[-1] >= timestamp:
+            raise Exception("Invalid datetime. It must be bigger than that last one")
+        self.__tzinfo = dateTime.tzinfo
+
+        values = (value.getOpen(), value.getHigh(), value.getLow(), value.getClose(), value.getVolume(), value.getAdjClose())
+        self.__timestamps.append(timestamp)
+        for i in xrange(len(values)):
+            if values[i] is None:
+                self.__columns[i].append(np.nan)
+            else:
+                self.__columns[i].append(values[i])
+        self.__sessionClose.append(value.getSessionClose())
+        barsTillSessionClose = value.getBarsTillSessionClose()
+        if barsTillSessionClose is None:
+            self.__barsTillSessionClose.append(np.nan)
+        else:
+            self.__barsTillSessionClose.append(barsTillSessionClose)
+
+        if self.__newValueEvent is not None:
+            self.__newValueEvent.emit(self, dateTime, value)
+        for i in xrange(len(values)):
+            columnDS = self.__columnDS[i]
+            if columnDS.hasNewValueSubscribers():
+                columnDS.getNewValueEvent().emit(columnDS, dateTime, values[i])
+
+    def extend(self, dateTimes, values):
+        """
+        Appends multiple bars with their associated datetimes.
+        If there are no subscribers for the new value events, bars are added in bulk and only the new values batch event
+        is emitted. Otherwise, bars are added one at a time, and the new values batch event is emitted at the end.
+        """
+
+        if len(dateTimes) != len(values):
+            raise Exception("The number of datetimes and values must match")
+        if len(values) == 0:
+            return
+
+        subscribers = self.hasNewValueSubscribers()
+        for columnDS in self.__columnDS:
+            subscribers = subscribers or columnDS.hasNewValueSubscribers()
+
+        if subscribers:
+            for i in xrange(len(values)):
+                self.appendWithDateTime(dateTimes[i], values[i])
+        else:
+            timestamps = np.array([dt.datetime_to_microseconds(dateTime) for dateTime in dateTimes], dtype=np.int64)
+            dataseries.check_timestamps_order(np.concatenate((self.__timestamps.data()[-1:], timestamps)))
+            self.__tzinfo = dateTimes[-1].tzinfo
+
+            # None values get converted to NaN.
+            rows = np.array([(value.getOpen(), value.getHigh(), value.getLow(), value.getClose(), value.getVolume(), value.getAdjClose()) for value in values], dtype=float)
+            self.__timestamps.extend(timestamps)
+            for i in xrange(len(self.__columns)):
+                self.__columns[i].extend(rows[:, i])
+            self.__sessionClose.extend([value.getSessionClose() for value in values])
+            self.__barsTillSessionClose.extend([value.getBarsTillSessionClose() for value in values])
+
+        if self.__newValuesBatchEvent is not None:
+            self.__newValuesBatchEvent.emit(self, dateTimes, values)
+
+    def getDateTimes(self):
+        return [dt.microseconds_to_datetime(timestamp, self.__tzinfo) for timestamp in self.__timestamps.data()]
+
+    def searchDateTime(self, dateTime, side="left"):
+        return int(np.searchsorted(self.__timestamps.data(), dt.datetime_to_microseconds(dateTime), side))
+
+    def asTimestampArray(self, start=None, end=None):
+        """Returns a numpy.array with the datetimes in the [start:end] range, as microseconds since the epoch.
+        This is a view, not a copy, so it should be treated as read-only and it is only valid until the next bar is appended.
+        """
+        return self.__timestamps.data()[start:end]
+
+    def asColumnArray(self, column, start=None, end=None):
+        """Returns a numpy.array with the values for a given column in the [start:end] range.
+        Just like :meth:`asTimestampArray`, this is a view, not a copy.
+
+        :param column: The column. Valid values are OPEN, HIGH, LOW, CLOSE, VOLUME and ADJ_CLOSE.
+        :type column: int.
+        """
+        return self.__columns[column].data()[start:end]
+
+    def getOpenDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the open prices."""
+        return self.__columnDS[ColumnarBarDataSeries.OPEN]
+
+    def getCloseDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close prices."""
+        return self.__columnDS[ColumnarBarDataSeries.CLOSE]
+
+    def getHighDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the high prices."""
+        return self.__columnDS[ColumnarBarDataSeries.HIGH]
+
+    def getLowDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the low prices."""
+        return self.__columnDS[ColumnarBarDataSeries.LOW]
+
+    def getVolumeDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the volume."""
+        return self.__columnDS[ColumnarBarDataSeries.VOLUME]
+
+    def getAdjCloseDataSeries(self):
+        """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the adjusted close prices."""
+        return self.__columnDS[ColumnarBarDataSeries.ADJ_CLOSE]
+
+
+# A read-only DataSeries over one of the columns in a ColumnarBarDataSeries.
+class BarColumnDataSeries(dataseries.DataSeries):
+    def __init__(self, barDataSeries, column):
+        self.__barDataSeries = barDataSeries
+        self.__column = column
+        self.__newValueEvent = None
+
+    def __len__(self):
+        return len(self.__barDataSeries)
+
+    def getMaxLen(self):
+        return self.__barDataSeries.getMaxLen()
+
+    def getNewValueEvent(self):
+        if self.__newValueEvent is None:
+            self.__newValueEvent = observer.Event()
+        return self.__newValueEvent
+
+    def hasNewValueSubscribers(self):
+        return self.__newValueEvent is not None and self.__newValueEvent.hasSubscribers()
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__barDataSeries):
+            # Return Python floats, like the rest of the DataSeries, instead of numpy.float64 values.
+            ret = float(self.__barDataSeries.asColumnArray(self.__column)[pos])
+            if ret != ret:
+                ret = None
+        return ret
+
+    def getDateTimes(self):
+        return self.__barDataSeries.getDateTimes()
+
+    def searchDateTime(self, dateTime, side="left"):
+        return self.__barDataSeries.searchDateTime(dateTime, side)
+
+    def asArray(self, start=None, end=None):
+        return self.__barDataSeries.asColumnArray(self.__column, start, end)
+
+    def asTimestampArray(self, start=None, end=None):
+        return self.__barDataSeries.asTimestampArray(start, end)
@@ -0,0 +1,196 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import mmap
+import time
+
+import numpy as np
+
+from pyalgotrade import dataseries
+from pyalgotrade.utils import dt
+
+# The shared file holds a header followed by two ring buffers, one for timestamps and one for values.
+# Header fields (int64):
+# 0: Magic number.
+# 1: maxLen.
+# 2: Version. Odd while the writer is updating the buffers, even otherwise.
+# 3: Number of values ever written.
+MAGIC = 0x5041545344530001
+HEADER_LEN = 4
+HEADER_MAX_LEN = 1
+HEADER_VERSION = 2
+HEADER_COUNT = 3
+
+# Readers yield the CPU while the writer is updating the buffers, and start sleeping if it takes too long.
+# After READ_ATTEMPTS attempts the writer is assumed dead.
+READ_SPIN_ATTEMPTS = 100
+READ_BACKOFF = 0.001
+READ_ATTEMPTS = 5000
+
+
+class SharedBuffer:
+    def __init__(self, path, maxLen=None):
+        itemSize = np.dtype(np.int64).itemsize
+        if maxLen is None:
+            # Open an existing buffer.
+            self.__file = open(path, "rb")
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = np.ndarray(shape=(HEADER_LEN,), dtype=np.int64, buffer=self.__mmap)
+            if header[0] != MAGIC:
+                raise Exception("%s is not a shared DataSeries file" % (path))
+            maxLen = int(header[HEADER_MAX_LEN])
+        else:
+            # Create a new buffer.
+            if not maxLen > 0:
+                raise Exception("Invalid maximum length")
+            self.__file = open(path, "w+b")
+            self.__file.truncate(itemSize * (HEADER_LEN + 2 * maxLen))
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0)
+            header = np.ndarray(shape=(HEADER_LEN,), dtype=np.int64, buffer=self.__mmap)
+            header[HEADER_MAX_LEN] = maxLen
+            header[0] = MAGIC
+
+        self.__maxLen = maxLen
+        self.__header = header
+        self.__timestamps = np.ndarray(shape=(maxLen,), dtype=np.int64, buffer=self.__mmap, offset=itemSize * HEADER_LEN)
+        self.__values = np.ndarray(shape=(maxLen,), dtype=np.float64, buffer=self.__mmap, offset=itemSize * (HEADER_LEN + maxLen))
+
+    def getMaxLen(self):
+        return self.__maxLen
+
+    def getCount(self):
+        return int(self.__header[HEADER_COUNT])
+
+    # Only one process should write.
+    def write(self, timestamps, values):
+        count = len(values)
+        timestamps = timestamps[-self.__maxLen:]
+        values = values[-self.__maxLen:]
+        slots = (self.getCount() + count - len(values) + np.arange(len(values))) % self.__maxLen
+
+        self.__header[HEADER_VERSION] += 1
+        self.__timestamps[slots] = timestamps
+        self.__values[slots] = values
+        self.__header[HEADER_COUNT] += count
+        self.__header[HEADER_VERSION] += 1
+
+    # Returns (count, timestamps, values) with the values written after the first fromCount values.
+    # Only the last maxLen values are available.
+    def read(self, fromCount):
+        for attempt in xrange(READ_ATTEMPTS):
+            version = self.__header[HEADER_VERSION]
+            # If the writer is updating the buffers, wait for it to finish.
+            if version % 2 == 0:
+                count = self.getCount()
+                fromCount = max(fromCount, count - self.__maxLen)
+                slots = np.arange(fromCount, count) % self.__maxLen
+                timestamps = self.__timestamps[slots]
+                values = self.__values[slots]
+                # If the writer updated the buffers while we were reading, try again.
+                if self.__header[HEADER_VERSION] == version:
+                    return (count, timestamps, values)
+
+            if attempt < READ_SPIN_ATTEMPTS:
+                time.sleep(0)
+            else:
+                time.sleep(READ_BACKOFF)
+        raise Exception("Timed out waiting for the writer to update the shared file. It may have died while writing")
+
+    def close(self):
+        self.__header = None
+        self.__timestamps = None
+        self.__values = None
+        self.__mmap.close()
+        self.__file.close()
+
+
+class SharedDataSeries(dataseries.NumericDataSeries):
+    """A :class:`pyalgotrade.dataseries.NumericDataSeries` that also publishes its values to a memory-mapped file,
+    so :class:`SharedDataSeriesReader` instances in other processes can read them.
+
+    :param path: The path to the file to create. Readers should use the same path.
+    :type path: string.
+    :param maxLen: The maximum number of values to hold, both locally and in the shared file.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        * There should be only one writer for a given path.
+        * Values are stored as float64 and datetimes as microseconds since the epoch, so timezone information is not shared.
+    """
+
+    def __init__(self, path, maxLen=dataseries.DEFAULT_MAX_LEN):
+        dataseries.NumericDataSeries.__init__(self, maxLen)
+        self.__buffer = SharedBuffer(path, maxLen)
+
+    def setMaxLen(self, maxLen):
+        raise Exception("The maximum length of a shared DataSeries can't be changed")
+
+    def appendWithDateTime(self, dateTime, value):
+        dataseries.NumericDataSeries.appendWithDateTime(self, dateTime, value)
+        self.__buffer.write(self.asTimestampArray(-1), self.asArray(-1))
+
+    def extend(self, dateTimes, values):
+        # If there are subscribers, values will be appended, and published, one at a time.
+        published = self.hasNewValueSubscribers()
+        dataseries.NumericDataSeries.extend(self, dateTimes, values)
+        count = min(len(values), self.getMaxLen())
+        if not published and count:
+            self.__buffer.write(self.asTimestampArray(-count), self.asArray(-count))
+
+    def close(self):
+        """Closes the shared file."""
+        self.__buffer.close()
+
+
+class SharedDataSeriesReader(dataseries.NumericDataSeries):
+    """A :class:`pyalgotrade.dataseries.NumericDataSeries` that reads the values published by a :class:`SharedDataSeries`,
+    possibly from another process. New values are picked up, and new value events emitted, when :meth:`poll` is called.
+
+    :param path: The path to the file created by the :class:`SharedDataSeries`.
+    :type path: string.
+    :param tzinfo: The timezone to localize datetimes to. If None, datetimes will be naive and in UTC.
+    :type tzinfo: A pytz timezone.
+
+    .. note::
+        If the reader falls behind by more than maxLen values, the oldest ones are lost.
+    """
+
+    def __init__(self, path, tzinfo=None):
+        self.__buffer = SharedBuffer(path)
+        dataseries.NumericDataSeries.__init__(self, self.__buffer.getMaxLen())
+        self.__tzinfo = tzinfo
+        self.__count = 0
+
+    def poll(self):
+        """Picks up the values published since the last call, and returns how many there were.
+        Raises an exception if the writer doesn't finish an update in about 5 seconds, since it probably died while writing."""
+        count, timestamps, values = self.__buffer.read(self.__count)
+        self.__count = count
+        if len(values):
+            dateTimes = [None if timestamp == dataseries.NO_TIMESTAMP else dt.microseconds_to_datetime(timestamp, self.__tzinfo) for timestamp in timestamps]
+            # NaN is the only value that is not equal to itself.
+            values = [None if value != value else float(value) for value in values]
+            self.extend(dateTimes, values)
+        return len(values)
+
+    def close(self):
+        """Closes the shared file."""
+        self.__buffer.close()
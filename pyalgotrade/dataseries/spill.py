@@ -0,0 +1,173 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import numpy as np
+
+from pyalgotrade import dataseries
+from pyalgotrade import observer
+from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
+
+
+# A read-only sequence of datetimes built on demand from a timestamp array.
+class DateTimeSequence(object):
+    def __init__(self, timestamps, tzinfo):
+        self.__timestamps = timestamps
+        self.__tzinfo = tzinfo
+
+    def __toDateTime(self, timestamp):
+        if timestamp == dataseries.NO_TIMESTAMP:
+            return None
+        return dt.microseconds_to_datetime(timestamp, self.__tzinfo)
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.__toDateTime(timestamp) for timestamp in self.__timestamps[key]]
+        return self.__toDateTime(self.__timestamps[key])
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class SpillDataSeries(dataseries.DataSeries):
+    """An unbounded DataSeries of numeric values that holds the most recent values in memory and spills older ones
+    to a memory-mapped file, so the whole history is available without holding it in memory.
+
+    :param hotLen: The number of values to hold in memory. Values are spilled to disk in segments of this size.
+    :type hotLen: int.
+    :param dtype: The desired data-type for the values.
+    :type dtype: data-type.
+    :param path: The path prefix for the files used to hold the values and datetimes. If None, temporary files are used.
+    :type path: string.
+
+    .. note::
+        * None values are stored as NaN, and NaN values are returned as None. This requires a floating point dtype.
+        * All datetimes are expected to be either naive or in the same timezone.
+        * Call :meth:`close` once done with the DataSeries to release the files.
+    """
+
+    def __init__(self, hotLen=dataseries.DEFAULT_MAX_LEN, dtype=float, path=None):
+        valuesPath = None
+        timestampsPath = None
+        if path is not None:
+            valuesPath = path + ".values"
+            timestampsPath = path + ".timestamps"
+
+        self.__newValueEvent = None
+        self.__values = collections.SpillArray(hotLen, dtype, valuesPath)
+        self.__timestamps = collections.SpillArray(hotLen, np.int64, timestampsPath)
+        self.__lastTimestamp = dataseries.NO_TIMESTAMP
+        self.__tzinfo = None
+
+    def __len__(self):
+        return len(self.__values)
+
+    def getMaxLen(self):
+        """Returns None since there is no maximum number of values to hold."""
+        return None
+
+    def getSpilledCount(self):
+        """Returns the number of values that were spilled to disk."""
+        return self.__values.getSpilledCount()
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: The datetime for the new value
+    # 3: The new value
+    def getNewValueEvent(self):
+        if self.__newValueEvent is None:
+            self.__newValueEvent = observer.Event()
+        return self.__newValueEvent
+
+    def hasNewValueSubscribers(self):
+        return self.__newValueEvent is not None and self.__newValueEvent.hasSubscribers()
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__values):
+            ret = self.__values[pos]
+            # NaN is the only value that is not equal to itself.
+            if ret != ret:
+                ret = None
+        return ret
+
+    def append(self, value):
+        """Appends a value."""
+        self.appendWithDateTime(None, value)
+
+    def appendWithDateTime(self, dateTime, value):
+        """
+        Appends a value with an associated datetime.
+
+        .. note::
+            If dateTime is not None, it must be greater than the last one.
+        """
+
+        if dateTime is None:
+            timestamp = dataseries.NO_TIMESTAMP
+        else:
+            timestamp = dt.datetime_to_microseconds(dateTime)
+            if self.__lastTimestamp != dataseries.NO_TIMESTAMP and self.__lastTimestamp >= timestamp:
+                raise Exception("Invalid datetime. It must be bigger than that last one")
+            self.__tzinfo = dateTime.tzinfo
+            # Values with no datetime are skipped, so datetimes stay sorted for binary searches.
+            self.__lastTimestamp = timestamp
+
+        self.__timestamps.append(timestamp)
+        if value is None:
+            self.__values.append(np.nan)
+        else:
+            self.__values.append(value)
+
+        if self.__newValueEvent is not None:
+            self.__newValueEvent.emit(self, dateTime, value)
+
+    def getDateTimes(self):
+        """Returns a sequence of :class:`datetime.datetime` associated with each value.
+        Datetimes are built on demand as they are accessed."""
+        return DateTimeSequence(self.__timestamps, self.__tzinfo)
+
+    def searchDateTime(self, dateTime, side="left"):
+        return self.__timestamps.searchsorted(dt.datetime_to_microseconds(dateTime), side)
+
+    def asArray(self, start=None, end=None):
+        """Returns a numpy.array with the values in the [start:end] range.
+        If all the values are in memory this is a view, not a copy, so it should be treated as read-only.
+        """
+        return self.__values.slice(start, end)
+
+    def asTimestampArray(self, start=None, end=None):
+        """Returns a numpy.array with the datetimes in the [start:end] range, as microseconds since the epoch."""
+        return self.__timestamps.slice(start, end)
+
+    def close(self):
+        """Closes the files used to hold spilled values."""
+        self.__values.close()
+        self.__timestamps.close()
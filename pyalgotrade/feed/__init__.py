@@ -80,6 +80,35 @@ class BaseFeed(observer.Subject):
                 ds.appendWithDateTime(dateTime, value)
         return (dateTime, values)
 
+    def getNextValuesBatchAndUpdateDS(self, count):
+        """Like getNextValuesAndUpdateDS, but gets up to count values and appends them to each
+        :class:`pyalgotrade.dataseries.DataSeries` in bulk. Returns a list of (datetime, values) tuples.
+
+        .. note::
+            This is meant to load history or warm up indicators using non real-time feeds.
+        """
+        ret = []
+        dateTimesByKey = {}
+        valuesByKey = {}
+        while len(ret) < count and not self.eof():
+            dateTime, values = self.getNextValues()
+            if dateTime is None:
+                break
+            ret.append((dateTime, values))
+            for key, value in values.items():
+                dateTimesByKey.setdefault(key, []).append(dateTime)
+                valuesByKey.setdefault(key, []).append(value)
+
+        for key, values in valuesByKey.iteritems():
+            # Get or create the datseries for each key.
+            try:
+                ds = self.__ds[key]
+            except KeyError:
+                ds = self.createDataSeries(key, self.__maxLen)
+                self.__ds[key] = ds
+            ds.extend(dateTimesByKey[key], values)
+        return ret
+
     def __iter__(self):
         return feed_iterator(self)
 
@@ -18,8 +18,11 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import numpy as np
+
 from pyalgotrade import feed
 from pyalgotrade import dataseries
+from pyalgotrade.utils import dt
 
 
 class MemFeed(feed.BaseFeed):
@@ -49,6 +52,9 @@ class MemFeed(feed.BaseFeed):
             ret = self.__values[self.__nextIdx][0]
         return ret
 
+    def getDispatchSchedule(self):
+        return np.array([dt.datetime_to_microseconds(value[0]) for value in self.__values[self.__nextIdx:]], dtype=np.int64)
+
     def isRealTime(self):
         return False
 
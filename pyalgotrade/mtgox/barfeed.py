@@ -95,6 +95,49 @@ class TradeBar(bar.Bar):
     def setBarsTillSessionClose(self, barsTillSessionClose):
         self.__barsTillSessionClose = barsTillSessionClose
 
+    # Used by pyalgotrade.barfeed.conflation.merge_bars to keep the trade type when trades get merged.
+    def buildMergedBar(self, dateTime, open_, high, low, close, volume, adjClose):
+        return MergedTradeBar(dateTime, open_, high, low, close, volume, self.getTradeType())
+
+
+# Many trades merged by a pyalgotrade.barfeed.conflation.ConflationPolicy. The trade type is the one from the last trade.
+class MergedTradeBar(TradeBar):
+    __slots__ = ('__open', '__high', '__low')
+
+    def __init__(self, dateTime, open_, high, low, close, volume, tradeType):
+        TradeBar.__init__(self, dateTime, close, volume, tradeType)
+        self.__open = open_
+        self.__high = high
+        self.__low = low
+
+    def __setstate__(self, state):
+        TradeBar.__setstate__(self, state[0])
+        (self.__open, self.__high, self.__low) = state[1]
+
+    def __getstate__(self):
+        return (TradeBar.__getstate__(self), (self.__open, self.__high, self.__low))
+
+    def getOpen(self):
+        return self.__open
+
+    def getHigh(self):
+        return self.__high
+
+    def getLow(self):
+        return self.__low
+
+    def getAdjOpen(self):
+        return self.__open
+
+    def getAdjHigh(self):
+        return self.__high
+
+    def getAdjLow(self):
+        return self.__low
+
+    def getTypicalPrice(self):
+        return (self.getHigh() + self.getLow() + self.getClose()) / 3.0
+
 
 class RowParser(csvfeed.RowParser):
     def __init__(self, timezone=None):
@@ -166,15 +209,19 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
     :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
     :type maxLen: int.
+    :param conflationPolicy: If set, trades are not dispatched immediately. They wait until the feed gets dispatched,
+        and the policy decides how trades that arrive in the meantime get combined.
+    :type conflationPolicy: :class:`pyalgotrade.barfeed.conflation.ConflationPolicy`.
 
     .. note::
         Note that a :class:`pyalgotrade.bar.Bar` instance will be created for every trade, so
-        open, high, low and close values will all be the same.
+        open, high, low and close values will all be the same, unless trades get merged by the conflation policy.
     """
 
-    def __init__(self, client, maxLen=dataseries.DEFAULT_MAX_LEN):
+    def __init__(self, client, maxLen=dataseries.DEFAULT_MAX_LEN, conflationPolicy=None):
         barfeed.BaseBarFeed.__init__(self, barfeed.Frequency.TRADE, maxLen)
         self.__barDicts = []
+        self.__conflationPolicy = conflationPolicy
         self.__currency = client.getCurrency()
         self.registerInstrument("BTC")
         client.getTradeEvent().subscribe(self.__onTrade)
@@ -187,6 +234,17 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
     def isRealTime(self):
         return True
 
+    def getConflationPolicy(self):
+        """Returns the :class:`pyalgotrade.barfeed.conflation.ConflationPolicy` in use, or None.
+        The policy exposes the queue depth and the number of merged and dropped trades."""
+        return self.__conflationPolicy
+
+    def getQueueDepth(self):
+        """Returns the number of bars waiting to be dispatched."""
+        if self.__conflationPolicy is not None:
+            return self.__conflationPolicy.getQueueDepth()
+        return len(self.__barDicts)
+
     def __onTrade(self, trade):
         if trade.getCurrency() == self.__currency:
             # Build a bar for each trade.
@@ -194,17 +252,22 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
             # there are many trades in the same second and that produces errors in:
             # - barfeed.BarFeed.getNextBars and in
             # - dataseries.SequenceDataSeries.appendWithDateTime
-            barDict = {
-                "BTC": TradeBar(trade.getDateTimeWithMicroseconds(), trade.getPrice(), trade.getAmount(), trade.getType())
-                }
-            self.__barDicts.append(barDict)
-
-            # Dispatch immediately
-            self.dispatch()
+            tradeBar = TradeBar(trade.getDateTimeWithMicroseconds(), trade.getPrice(), trade.getAmount(), trade.getType())
+            if self.__conflationPolicy is not None:
+                # The bar will be dispatched when the dispatcher gets to us, after the client.
+                self.__conflationPolicy.push(tradeBar)
+            else:
+                self.__barDicts.append({"BTC": tradeBar})
+                # Dispatch immediately
+                self.dispatch()
 
     def getNextBars(self):
         ret = None
-        if len(self.__barDicts):
+        if self.__conflationPolicy is not None:
+            nextBar = self.__conflationPolicy.pop()
+            if nextBar is not None:
+                ret = bar.Bars({"BTC": nextBar})
+        elif len(self.__barDicts):
             ret = bar.Bars(self.__barDicts.pop(0))
         return ret
 
@@ -213,7 +276,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         return None
 
     def eof(self):
-        return len(self.__barDicts) == 0
+        return self.getQueueDepth() == 0
 
     def start(self):
         pass
@@ -87,6 +87,14 @@ class WSClient(wsclient.WebSocketClient):
         self.__queue.put((WSClient.ON_USER_ORDER, userOrder))
 
 
+# Only tickers get coalesced, since each one replaces the previous one. Coalescing trades would lose their volume.
+def coalesce_key(event):
+    eventType = event[0]
+    if eventType == WSClient.ON_TICKER:
+        return eventType
+    return None
+
+
 class Client(observer.Subject):
     """This class is responsible for all trading interaction with MtGox.
 
@@ -98,6 +106,17 @@ class Client(observer.Subject):
     :type apiSecret: string.
     :param ignoreMultiCurrency: Ignore multi currency trades.
     :type ignoreMultiCurrency: boolean.
+    :param maxQueueSize: The maximum number of events waiting to be dispatched. 0 means no limit.
+    :type maxQueueSize: int.
+    :param queueOverflowPolicy: What to do when the queue is full. Valid values are:
+
+     * observer.NotifyingQueue.BLOCK to block until there is room.
+     * observer.NotifyingQueue.DROP_OLDEST to drop the oldest event.
+     * observer.NotifyingQueue.DROP_NEWEST to drop the new event.
+     * observer.NotifyingQueue.COALESCE to replace the newest ticker with the new one.
+       If there is no ticker to replace, the oldest event is dropped.
+
+    :type queueOverflowPolicy: int.
 
     .. note::
         For apiKey and apiSecret check the **Application and API access** section in mtgox.com.
@@ -105,7 +124,7 @@ class Client(observer.Subject):
     QUEUE_TIMEOUT = 0.01
 
     # currency is the account's currency.
-    def __init__(self, currency, apiKey, apiSecret, ignoreMultiCurrency=False):
+    def __init__(self, currency, apiKey, apiSecret, ignoreMultiCurrency=False, maxQueueSize=0, queueOverflowPolicy=observer.NotifyingQueue.BLOCK):
         if currency not in ["USD", "AUD", "CAD", "CHF", "CNY", "DKK", "EUR", "GBP", "HKD", "JPY", "NZD", "PLN", "RUB", "SEK", "SGD", "THB", "NOK", "CZK"]:
             raise Exception("Invalid currency")
 
@@ -115,7 +134,8 @@ class Client(observer.Subject):
         self.__ignoreMultiCurrency = ignoreMultiCurrency
 
         self.__thread = None
-        self.__queue = Queue.Queue()
+        self.__queue = observer.NotifyingQueue(maxQueueSize, queueOverflowPolicy, coalesce_key)
+        self.__wakeUp = None
         self.__initializationFailed = None
         self.__stopped = False
         self.__tickerEvent = observer.Event()
@@ -134,6 +154,18 @@ class Client(observer.Subject):
     def getCurrency(self):
         return self.__currency
 
+    def getQueueHighWaterMark(self):
+        """Returns the maximum number of events that were waiting to be dispatched at the same time."""
+        return self.__queue.getHighWaterMark()
+
+    def getQueueDroppedCount(self):
+        """Returns the number of events that were dropped because the queue was full."""
+        return self.__queue.getDroppedCount()
+
+    def getEventTimestamp(self):
+        """Returns the time, in seconds since the epoch, when the event being dispatched was received."""
+        return self.__queue.getLastTimestamp()
+
     def setEnableReconnection(self, enable):
         self.__enableReconnection = enable
 
@@ -231,11 +263,17 @@ class Client(observer.Subject):
     def eof(self):
         return self.__stopped
 
-    def dispatchImpl(self, eventFilter):
+    # Returns True if an event was taken from the queue.
+    def dispatchImpl(self, eventFilter, block=True):
+        ret = False
         try:
-            eventType, eventData = self.__queue.get(True, Client.QUEUE_TIMEOUT)
+            if block:
+                eventType, eventData = self.__queue.get(True, Client.QUEUE_TIMEOUT)
+            else:
+                eventType, eventData = self.__queue.get(False)
+            ret = True
             if eventFilter is not None and eventType not in eventFilter:
-                return
+                return ret
 
             if eventType == WSClient.ON_TICKER:
                 self.__tickerEvent.emit(eventData)
@@ -257,9 +295,20 @@ class Client(observer.Subject):
                 logger.error("Invalid event received to dispatch: %s - %s" % (eventType, eventData))
         except Queue.Empty:
             pass
+        return ret
 
     def dispatch(self):
-        self.dispatchImpl(None)
+        if self.__wakeUp is None:
+            self.dispatchImpl(None)
+        else:
+            # The dispatcher gets woken up when new events arrive, so dispatch the pending ones without blocking.
+            while self.dispatchImpl(None, False):
+                pass
+
+    def registerWakeUp(self, wakeUp):
+        self.__wakeUp = wakeUp
+        self.__queue.setWakeUp(wakeUp)
+        return True
 
     def peekDateTime(self):
         # Return None since this is a realtime subject.
@@ -0,0 +1,67 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+from pyalgotrade import replay
+
+
+def record_client(client, recorder):
+    """Records the ticker, trade and user order events from a :class:`pyalgotrade.mtgox.client.Client`.
+
+    :param client: The client to record.
+    :type client: :class:`pyalgotrade.mtgox.client.Client`.
+    :param recorder: The recorder to use.
+    :type recorder: :class:`pyalgotrade.replay.Recorder`.
+    """
+    recorder.record(client.getTickerEvent(), "ticker", client)
+    recorder.record(client.getTradeEvent(), "trade", client)
+    recorder.record(client.getUserOrderEvent(), "userOrder", client)
+
+
+class ReplayClient(replay.ReplaySubject):
+    """Replays the events recorded from a :class:`pyalgotrade.mtgox.client.Client` using :func:`record_client`.
+    It can be used instead of the client to build a :class:`pyalgotrade.mtgox.barfeed.LiveTradeFeed`.
+
+    :param path: The path to the log.
+    :type path: string.
+    :param currency: The account's currency.
+    :type currency: string.
+    :param speed: None to replay events as fast as possible, or a speed factor to replay them at the recorded pace.
+    :type speed: float.
+    """
+
+    def __init__(self, path, currency, speed=None):
+        replay.ReplaySubject.__init__(self, path, speed)
+        self.__currency = currency
+
+    def getCurrency(self):
+        return self.__currency
+
+    def getTickerEvent(self):
+        return self.getEvent("ticker")
+
+    def getTradeEvent(self):
+        return self.getEvent("trade")
+
+    def getUserOrderEvent(self):
+        return self.getEvent("userOrder")
+
+    def getDispatchPriority(self):
+        # Same as the client.
+        return 100
@@ -18,46 +18,164 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+import collections
+import time
+import os
+import errno
+import select
+import Queue
+
+import numpy as np
+
+from pyalgotrade.utils import dt
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows.
+    fcntl = None
+
+
+def _emitNone(*parameters):
+    pass
+
+
+def get_callable_name(callable_):
+    # Bound methods get named after the class of the instance they're bound to.
+    instance = getattr(callable_, "im_self", None)
+    if instance is not None:
+        return "%s.%s" % (instance.__class__.__name__, callable_.__name__)
+    return getattr(callable_, "__name__", callable_.__class__.__name__)
+
+
+class CallStats:
+    """Call count and wall time spent in calls to a given subject dispatch or event handler.
+    Times are in seconds, and include the time spent in nested calls."""
+
+    def __init__(self, name):
+        self.__name = name
+        self.__count = 0
+        self.__totalTime = 0
+        self.__maxTime = 0
+
+    def addCall(self, elapsed):
+        self.__count += 1
+        self.__totalTime += elapsed
+        if elapsed > self.__maxTime:
+            self.__maxTime = elapsed
+
+    def getName(self):
+        return self.__name
+
+    def getCount(self):
+        """Returns the number of calls."""
+        return self.__count
+
+    def getTotalTime(self):
+        """Returns the cumulative time for all the calls."""
+        return self.__totalTime
+
+    def getMaxTime(self):
+        """Returns the time for the slowest call."""
+        return self.__maxTime
+
+    def getAverageTime(self):
+        """Returns the average time per call."""
+        ret = 0
+        if self.__count:
+            ret = self.__totalTime / float(self.__count)
+        return ret
+
+
+class Instrumentation:
+    """Collects :class:`CallStats` for dispatched subjects and event handlers.
+    Use :meth:`Dispatcher.setInstrumentation` and :meth:`Event.setInstrumentation` to enable it.
+    """
+
+    def __init__(self):
+        self.__stats = {}
+
+    def getCallStats(self, name):
+        ret = self.__stats.get(name)
+        if ret is None:
+            ret = CallStats(name)
+            self.__stats[name] = ret
+        return ret
+
+    def wrap(self, name, callable_):
+        # Returns a function that calls callable_ and records the time spent.
+        callStats = self.getCallStats(name)
+
+        def timedCall(*parameters):
+            begin = time.time()
+            try:
+                return callable_(*parameters)
+            finally:
+                callStats.addCall(time.time() - begin)
+        return timedCall
+
+    def getStats(self):
+        """Returns a dictionary that maps names to :class:`CallStats`."""
+        return self.__stats
+
+    def getReport(self):
+        """Returns a list of :class:`CallStats` sorted by total time, slowest first."""
+        return sorted(self.__stats.values(), key=lambda callStats: callStats.getTotalTime(), reverse=True)
+
+
+def _buildEmit(handlers):
+    # Build the function used to emit the event for an immutable tuple of handlers.
+    # Most events have no handlers at all, or just one, so those cases don't loop.
+    if len(handlers) == 0:
+        return _emitNone
+    elif len(handlers) == 1:
+        return handlers[0]
+    else:
+        def emitAll(*parameters):
+            for handler in handlers:
+                handler(*parameters)
+        return emitAll
+
 
 class Event:
     def __init__(self):
-        self.__handlers = []
-        self.__toSubscribe = []
-        self.__toUnsubscribe = []
-        self.__emitting = False
-
-    def __applyChanges(self):
-        if len(self.__toSubscribe):
-            for handler in self.__toSubscribe:
-                if handler not in self.__handlers:
-                    self.__handlers.append(handler)
-            self.__toSubscribe = []
-
-        if len(self.__toUnsubscribe):
-            for handler in self.__toUnsubscribe:
-                self.__handlers.remove(handler)
-            self.__toUnsubscribe = []
+        self.__handlers = ()
+        self.__instrumentation = None
+        self.__name = None
+        self.emit = _emitNone
+
+    def __setHandlers(self, handlers):
+        # Emissions in progress keep using the previous tuple, so changes made while emitting take effect on the
+        # next emission.
+        self.__handlers = handlers
+        if self.__instrumentation is not None:
+            handlers = tuple([self.__instrumentation.wrap("%s: %s" % (self.__name, get_callable_name(handler)), handler) for handler in handlers])
+        self.emit = _buildEmit(handlers)
+
+    def setInstrumentation(self, instrumentation, name):
+        # Record the time spent in each handler, using name to identify the event.
+        # Set instrumentation to None to disable it. There is no overhead when disabled.
+        self.__instrumentation = instrumentation
+        self.__name = name
+        self.__setHandlers(self.__handlers)
 
     def subscribe(self, handler):
-        if self.__emitting:
-            self.__toSubscribe.append(handler)
-        elif handler not in self.__handlers:
-            self.__handlers.append(handler)
+        if handler not in self.__handlers:
+            self.__setHandlers(self.__handlers + (handler,))
 
     def unsubscribe(self, handler):
-        if self.__emitting:
-            self.__toUnsubscribe.append(handler)
-        else:
-            self.__handlers.remove(handler)
+        handlers = list(self.__handlers)
+        handlers.remove(handler)
+        self.__setHandlers(tuple(handlers))
+
+    def hasSubscribers(self):
+        return len(self.__handlers) > 0
 
+    # This is replaced on every instance with a function built for the current handlers.
     def emit(self, *parameters):
-        try:
-            self.__emitting = True
-            for handler in self.__handlers:
-                handler(*parameters)
-        finally:
-            self.__emitting = False
-            self.__applyChanges()
+        for handler in self.__handlers:
+            handler(*parameters)
 
 
 class Subject:
@@ -90,15 +208,385 @@ class Subject:
         # The return value should never change.
         return None
 
+    def registerWakeUp(self, wakeUp):
+        # Realtime subjects that receive events from other threads can keep wakeUp and return True to let the
+        # dispatcher sleep until there is something to dispatch, instead of polling.
+        # Subjects that return True must call wakeUp.notify() every time a new event is available, or when eof
+        # changes, and dispatch should not block waiting for events.
+        # registerWakeUp(None) is called once the dispatcher is done.
+        return False
+
+    def getDispatchSchedule(self):
+        # Non-realtime subjects that know in advance the datetimes for all their remaining events can return them as a
+        # NumPy int64 array, with one element per dispatch call, using the number of microseconds since the epoch
+        # (see pyalgotrade.utils.dt.datetime_to_microseconds). This lets the dispatcher precompute the dispatch order.
+        # Subjects that don't need to be dispatched can return an empty array.
+        # This is called after start. Return None if the schedule is not known in advance.
+        return None
+
+
+# This class is used to wake up the dispatcher, from any thread, using a pipe.
+# Waiting on the pipe with select doesn't add latency, unlike waiting with a timeout on a threading.Condition.
+# The pipe is not created until open is called, and notifications before that are ignored.
+class WakeUp:
+    def __init__(self):
+        self.__readFd = None
+        self.__writeFd = None
+
+    @staticmethod
+    def isSupported():
+        return fcntl is not None
+
+    def open(self):
+        if self.__readFd is not None:
+            return
+        readFd, writeFd = os.pipe()
+        for fd in [readFd, writeFd]:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.__readFd = readFd
+        self.__writeFd = writeFd
+
+    def notify(self):
+        if self.__writeFd is None:
+            return
+        try:
+            os.write(self.__writeFd, "x")
+        except OSError, e:
+            # If the pipe is full there is already a pending notification.
+            if e.errno != errno.EAGAIN:
+                raise
+
+    # Waits until notify is called, or the timeout (in seconds) expires.
+    # Returns True if notify was called.
+    def wait(self, timeout):
+        try:
+            ready = select.select([self.__readFd], [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+            ready = []
+
+        ret = len(ready) > 0
+        # Consume all pending notifications.
+        try:
+            while len(os.read(self.__readFd, 1024)):
+                pass
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+        return ret
+
+    def close(self):
+        if self.__readFd is None:
+            return
+        writeFd = self.__writeFd
+        self.__writeFd = None
+        os.close(writeFd)
+        os.close(self.__readFd)
+        self.__readFd = None
+
+
+# A Queue.Queue that notifies a WakeUp every time an item is put, and that can be bounded.
+# When a bounded queue is full, the overflow policy decides what happens:
+# * BLOCK: put blocks until there is room.
+# * DROP_OLDEST: The oldest item is dropped to make room for the new one.
+# * DROP_NEWEST: The new item is dropped.
+# * COALESCE: The new item replaces the newest queued item with the same key, as returned by coalesceKey.
+#   If there is no such item, or the new item has no key (coalesceKey returns None), the oldest item is dropped.
+# Items are timestamped when they are put, so consumers can tell when the item they got arrived.
+class NotifyingQueue(Queue.Queue):
+    # Overflow policies.
+    BLOCK = 1
+    DROP_OLDEST = 2
+    DROP_NEWEST = 3
+    COALESCE = 4
+
+    def __init__(self, maxSize=0, overflowPolicy=BLOCK, coalesceKey=None):
+        if overflowPolicy not in [NotifyingQueue.BLOCK, NotifyingQueue.DROP_OLDEST, NotifyingQueue.DROP_NEWEST, NotifyingQueue.COALESCE]:
+            raise Exception("Invalid overflow policy")
+        if overflowPolicy == NotifyingQueue.COALESCE and coalesceKey is None:
+            raise Exception("coalesceKey is required to coalesce items")
+
+        # Queue.Queue takes care of blocking producers.
+        if overflowPolicy == NotifyingQueue.BLOCK:
+            Queue.Queue.__init__(self, maxSize)
+        else:
+            Queue.Queue.__init__(self)
+        self.__maxSize = maxSize
+        self.__overflowPolicy = overflowPolicy
+        self.__coalesceKey = coalesceKey
+        self.__wakeUp = None
+        self.__highWaterMark = 0
+        self.__droppedCount = 0
+        self.__coalescedCount = 0
+        # The time when each queued item was put, in the same order as the items.
+        self.__timestamps = collections.deque()
+        self.__lastTimestamp = None
+
+    def setWakeUp(self, wakeUp):
+        self.__wakeUp = wakeUp
+
+    def getHighWaterMark(self):
+        # Returns the maximum number of items that were queued at the same time.
+        return self.__highWaterMark
+
+    def getDroppedCount(self):
+        # Returns the number of items that were dropped, including the ones that were replaced when coalescing.
+        return self.__droppedCount
+
+    def getCoalescedCount(self):
+        # Returns the number of items that were replaced when coalescing.
+        return self.__coalescedCount
+
+    def getLastTimestamp(self):
+        # Returns the time, in seconds since the epoch, when the last item taken from the queue was put.
+        return self.__lastTimestamp
+
+    # Dropped items never get to task_done, so they're taken out of unfinished_tasks here. Queue.put accounts for the
+    # new item anyway.
+    def __itemDropped(self):
+        self.__droppedCount += 1
+        self.unfinished_tasks -= 1
+
+    def __coalesce(self, item, timestamp):
+        key = self.__coalesceKey(item)
+        if key is not None:
+            for i in xrange(len(self.queue) - 1, -1, -1):
+                if self.__coalesceKey(self.queue[i]) == key:
+                    self.queue[i] = item
+                    self.__timestamps[i] = timestamp
+                    self.__itemDropped()
+                    self.__coalescedCount += 1
+                    return True
+        return False
+
+    # This gets called with the mutex held.
+    def _put(self, item):
+        timestamp = time.time()
+        full = self.__maxSize > 0 and len(self.queue) >= self.__maxSize
+        if not full or self.__overflowPolicy == NotifyingQueue.BLOCK:
+            self.queue.append(item)
+            self.__timestamps.append(timestamp)
+        elif self.__overflowPolicy == NotifyingQueue.DROP_NEWEST:
+            self.__itemDropped()
+            return
+        elif self.__overflowPolicy == NotifyingQueue.DROP_OLDEST or not self.__coalesce(item, timestamp):
+            self.queue.popleft()
+            self.__timestamps.popleft()
+            self.queue.append(item)
+            self.__timestamps.append(timestamp)
+            self.__itemDropped()
+
+        self.__highWaterMark = max(self.__highWaterMark, len(self.queue))
+        if self.__wakeUp is not None:
+            self.__wakeUp.notify()
+
+    # This gets called with the mutex held.
+    def _get(self):
+        self.__lastTimestamp = self.__timestamps.popleft()
+        return self.queue.popleft()
+
+
+# Keeps non-realtime subjects in a priority queue sorted by the datetime of their next event, so that on every
+# tick only the subjects that were dispatched need to be checked again.
+# Realtime subjects, and subjects with no more events, are checked on every tick.
+class DispatchQueue:
+    def __init__(self, subjects):
+        self.__heap = []
+        self.__unscheduled = []
+        # The position in the subjects list is used to break ties and to keep the dispatch order.
+        for pos, subject in enumerate(subjects):
+            self.__schedule(pos, subject)
+
+    def __schedule(self, pos, subject):
+        nextDateTime = None
+        if not subject.eof():
+            nextDateTime = subject.peekDateTime()
+        if nextDateTime is None:
+            self.__unscheduled.append((pos, subject))
+        else:
+            heapq.heappush(self.__heap, (nextDateTime, pos, subject))
+
+    def dispatch(self):
+        ret = False
+        toDispatch = []
+
+        unscheduled = self.__unscheduled
+        self.__unscheduled = []
+        for pos, subject in unscheduled:
+            if subject.eof():
+                self.__unscheduled.append((pos, subject))
+            else:
+                ret = True
+                nextDateTime = subject.peekDateTime()
+                if nextDateTime is None:
+                    toDispatch.append((pos, subject, False))
+                else:
+                    heapq.heappush(self.__heap, (nextDateTime, pos, subject))
+
+        # Pop all the subjects with the lowest datetime.
+        if len(self.__heap):
+            ret = True
+            smallestDateTime = self.__heap[0][0]
+            while len(self.__heap) and self.__heap[0][0] == smallestDateTime:
+                nextDateTime, pos, subject = heapq.heappop(self.__heap)
+                toDispatch.append((pos, subject, True))
+
+        toDispatch.sort()
+        for pos, subject, scheduled in toDispatch:
+            subject.dispatch()
+        for pos, subject, scheduled in toDispatch:
+            if scheduled:
+                self.__schedule(pos, subject)
+            else:
+                self.__unscheduled.append((pos, subject))
+        return ret
+
+
+# Precomputed dispatch order for subjects that know in advance the datetimes for all their events.
+# Subjects get dispatched in the same order as with DispatchQueue, but eof and peekDateTime are never called while
+# dispatching.
+class DispatchSchedule:
+    def __init__(self, subjects, schedules):
+        self.__ticks = []
+        self.__nextTick = 0
+        if len(subjects) == 0:
+            return
+
+        timestamps = []
+        ranks = []
+        ids = []
+        for pos, schedule in enumerate(schedules):
+            schedule = np.sort(np.asarray(schedule, dtype=np.int64))
+            timestamps.append(schedule)
+            # Subjects that have many events with the same datetime get dispatched once per tick, so number them.
+            ranks.append(np.arange(len(schedule)) - np.searchsorted(schedule, schedule, side="left"))
+            ids.append(np.repeat(pos, len(schedule)))
+        timestamps = np.concatenate(timestamps)
+        ranks = np.concatenate(ranks)
+        ids = np.concatenate(ids)
+
+        # Sort by datetime, then by rank, and then by position in the subjects list to keep the dispatch order.
+        order = np.lexsort((ids, ranks, timestamps))
+        timestamps = timestamps[order]
+        ranks = ranks[order]
+        ids = ids[order]
+
+        # Split in ticks.
+        tickStarts = np.flatnonzero((np.diff(timestamps) != 0) | (np.diff(ranks) != 0)) + 1
+        bounds = [0] + tickStarts.tolist() + [len(ids)]
+        dispatchOrder = [subjects[pos] for pos in ids.tolist()]
+        self.__ticks = [dispatchOrder[bounds[i]:bounds[i+1]] for i in xrange(len(bounds) - 1) if bounds[i] < bounds[i+1]]
+
+    # Returns a DispatchSchedule, or None if any of the subjects doesn't know its schedule in advance, or if naive and
+    # aware datetimes are mixed.
+    @staticmethod
+    def build(subjects):
+        schedules = []
+        naive = set()
+        for subject in subjects:
+            schedule = subject.getDispatchSchedule()
+            if schedule is None:
+                return None
+            # Schedules don't have timezone information, so peek the first datetime. Comparing naive and aware
+            # datetimes fails with the other dispatch modes, and it should fail here too instead of taking naive
+            # datetimes as UTC.
+            if len(schedule):
+                dateTime = subject.peekDateTime()
+                if dateTime is None:
+                    return None
+                naive.add(dt.datetime_is_naive(dateTime))
+            schedules.append(schedule)
+        if len(naive) > 1:
+            return None
+        return DispatchSchedule(subjects, schedules)
+
+    def getTickCount(self):
+        return len(self.__ticks)
+
+    def dispatch(self):
+        if self.__nextTick == len(self.__ticks):
+            return False
+        for subject in self.__ticks[self.__nextTick]:
+            subject.dispatch()
+        self.__nextTick += 1
+        return True
+
+
+# Wraps a subject to record the time spent dispatching it.
+class InstrumentedSubject(Subject):
+    def __init__(self, subject, instrumentation, name):
+        self.__subject = subject
+        self.dispatch = instrumentation.wrap(name, subject.dispatch)
+
+    def start(self):
+        self.__subject.start()
+
+    def stop(self):
+        self.__subject.stop()
+
+    def join(self):
+        self.__subject.join()
+
+    def eof(self):
+        return self.__subject.eof()
+
+    def peekDateTime(self):
+        return self.__subject.peekDateTime()
+
+    def getDispatchPriority(self):
+        return self.__subject.getDispatchPriority()
+
+    def registerWakeUp(self, wakeUp):
+        return self.__subject.registerWakeUp(wakeUp)
+
+    def getDispatchSchedule(self):
+        return self.__subject.getDispatchSchedule()
+
 
 # This class is responsible for dispatching events from multiple subjects, synchronizing them if necessary.
 class Dispatcher:
+    # Dispatch modes.
+    SCAN = 1  # Scan all the subjects on every tick.
+    HEAP = 2  # Keep non-realtime subjects in a priority queue. Useful when there are many subjects.
+    # Precompute the dispatch order before running. Only if all the subjects know their schedule in advance, which is
+    # the case when backtesting. Otherwise HEAP is used.
+    SCHEDULE = 3
+
+    # The maximum number of seconds to sleep waiting for realtime subjects.
+    WAKE_UP_TIMEOUT = 1
+
     def __init__(self):
         self.__subjects = []
         self.__stopped = False
+        self.__dispatchMode = Dispatcher.SCAN
+        self.__wakeUp = None
+        self.__instrumentation = None
 
     def stop(self):
         self.__stopped = True
+        if self.__wakeUp is not None:
+            self.__wakeUp.notify()
+
+    def isStopped(self):
+        return self.__stopped
+
+    def getDispatchMode(self):
+        return self.__dispatchMode
+
+    def setDispatchMode(self, dispatchMode):
+        # dispatchMode should be Dispatcher.SCAN, Dispatcher.HEAP or Dispatcher.SCHEDULE.
+        if dispatchMode not in [Dispatcher.SCAN, Dispatcher.HEAP, Dispatcher.SCHEDULE]:
+            raise Exception("Invalid dispatch mode")
+        self.__dispatchMode = dispatchMode
+
+    def getInstrumentation(self):
+        return self.__instrumentation
+
+    def setInstrumentation(self, instrumentation):
+        # Record the time spent dispatching each subject. This has to be set before calling run.
+        # Set instrumentation to None to disable it. There is no overhead when disabled.
+        self.__instrumentation = instrumentation
 
     def getSubjects(self):
         return self.__subjects
@@ -116,12 +604,12 @@ class Dispatcher:
                 pos += 1
             self.__subjects.insert(pos, subject)
 
-    def __dispatch(self):
+    def __dispatch(self, subjects):
         smallestDateTime = None
         ret = False
 
         # Scan for the lowest datetime.
-        for subject in self.__subjects:
+        for subject in subjects:
             if not subject.eof():
                 ret = True
                 nextDateTime = subject.peekDateTime()
@@ -133,22 +621,71 @@ class Dispatcher:
 
         # Dispatch realtime subjects and those subjects with the lowest datetime.
         if ret:
-            for subject in self.__subjects:
+            for subject in subjects:
                 if not subject.eof():
                     nextDateTime = subject.peekDateTime()
                     if nextDateTime is None or nextDateTime == smallestDateTime:
                         subject.dispatch()
         return ret
 
+    # Returns True if there are subjects with events to dispatch, and all of them will wake us up when new events
+    # are available.
+    def __canWait(self, subjects, wakeUpSubjects):
+        ret = False
+        for subject in subjects:
+            if not subject.eof():
+                if subject not in wakeUpSubjects:
+                    return False
+                ret = True
+        return ret
+
     def run(self):
-        try:
+        wakeUp = None
+        wakeUpSubjects = set()
+        subjects = self.__subjects
+        if self.__instrumentation is not None:
+            subjects = []
             for subject in self.__subjects:
+                name = "dispatch: %s" % (subject.__class__.__name__)
+                if name in self.__instrumentation.getStats():
+                    name = "%s #%d" % (name, len(subjects) + 1)
+                subjects.append(InstrumentedSubject(subject, self.__instrumentation, name))
+
+        try:
+            for subject in subjects:
                 subject.start()
 
-            while not self.__stopped and self.__dispatch():
-                pass
+            schedule = None
+            if self.__dispatchMode == Dispatcher.SCHEDULE:
+                schedule = DispatchSchedule.build(subjects)
+
+            if schedule is not None:
+                dispatch = schedule.dispatch
+            elif self.__dispatchMode in [Dispatcher.HEAP, Dispatcher.SCHEDULE]:
+                dispatch = DispatchQueue(subjects).dispatch
+            else:
+                dispatch = lambda: self.__dispatch(subjects)
+
+            if WakeUp.isSupported():
+                wakeUp = WakeUp()
+                wakeUpSubjects = set([subject for subject in subjects if subject.registerWakeUp(wakeUp)])
+                # The pipe is only needed if some subject will wake us up. Events that arrived before this point will
+                # be picked up by the first dispatch.
+                if len(wakeUpSubjects):
+                    wakeUp.open()
+                    self.__wakeUp = wakeUp
+
+            while not self.__stopped and dispatch():
+                # Sleep if all the subjects with events to dispatch are realtime subjects that will wake us up.
+                if len(wakeUpSubjects) and self.__canWait(subjects, wakeUpSubjects):
+                    wakeUp.wait(Dispatcher.WAKE_UP_TIMEOUT)
         finally:
-            for subject in self.__subjects:
+            for subject in subjects:
                 subject.stop()
-            for subject in self.__subjects:
+            for subject in subjects:
                 subject.join()
+            for subject in wakeUpSubjects:
+                subject.registerWakeUp(None)
+            if wakeUp is not None:
+                self.__wakeUp = None
+                wakeUp.close()
@@ -0,0 +1,257 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import struct
+import time
+import threading
+import cPickle
+
+from pyalgotrade import observer
+
+# The log starts with this header, and it is followed by records.
+# Each record has a timestamp (microseconds since the epoch), a channel id and the size of the payload, followed
+# by the payload. The first record for each channel defines it, using DEFINE_CHANNEL as the channel id, and the id
+# for the new channel followed by its name as the payload. The payload for the rest of the records are the pickled
+# event parameters.
+LOG_HEADER = "PYALGOTRADE-EVENTLOG-1\n"
+RECORD_HEADER = struct.Struct("<qHI")
+CHANNEL_ID = struct.Struct("<H")
+DEFINE_CHANNEL = 0
+
+
+def now_microseconds():
+    return int(time.time() * 1000000)
+
+
+class Recorder:
+    """Records events into an append-only binary log, so they can be replayed later using :class:`ReplaySubject`.
+
+    :param path: The path to the log. If the file exists, records are appended to it.
+    :type path: string.
+
+    .. note::
+        * Event parameters are pickled, so they must be picklable.
+        * Events can be recorded from any thread.
+        * For subjects that take callbacks instead of exposing events, like :class:`pyalgotrade.twitter.feed.TwitterFeed`,
+          use :meth:`getHandler`.
+        * Events get dispatched some time after they're received. Pass the subject to :meth:`record` or
+          :meth:`getHandler` to record the time when the events were received instead of the time when they were
+          dispatched.
+        * Call :meth:`close` once done.
+    """
+
+    def __init__(self, path):
+        self.__file = open(path, "ab")
+        if self.__file.tell() == 0:
+            self.__file.write(LOG_HEADER)
+        self.__channels = {}
+        self.__lock = threading.Lock()
+
+    def __write(self, timestamp, channelId, payload):
+        self.__file.write(RECORD_HEADER.pack(timestamp, channelId, len(payload)))
+        self.__file.write(payload)
+
+    def write(self, name, parameters, timestamp=None):
+        """Records an event.
+
+        :param name: The name of the channel.
+        :type name: string.
+        :param parameters: The event parameters.
+        :type parameters: tuple.
+        :param timestamp: The time, in seconds since the epoch, when the event was received. If None, the current time
+            is used.
+        :type timestamp: float.
+        """
+        payload = cPickle.dumps(tuple(parameters), cPickle.HIGHEST_PROTOCOL)
+        if timestamp is None:
+            timestamp = now_microseconds()
+        else:
+            timestamp = int(timestamp * 1000000)
+        with self.__lock:
+            channelId = self.__channels.get(name)
+            if channelId is None:
+                # Channel ids are local to this recorder, so logs that get appended to may redefine them.
+                channelId = len(self.__channels) + 1
+                self.__channels[name] = channelId
+                self.__write(timestamp, DEFINE_CHANNEL, CHANNEL_ID.pack(channelId) + name)
+            self.__write(timestamp, channelId, payload)
+
+    def getHandler(self, name, subject=None):
+        """Returns an event handler that records the events it receives in a given channel.
+
+        :param name: The name of the channel.
+        :type name: string.
+        :param subject: The subject that dispatches the events. If set, the time returned by its getEventTimestamp
+            method is recorded instead of the current time.
+        """
+        if subject is None:
+            return lambda *parameters: self.write(name, parameters)
+        return lambda *parameters: self.write(name, parameters, subject.getEventTimestamp())
+
+    def record(self, event, name, subject=None):
+        """Subscribes to an :class:`pyalgotrade.observer.Event` to record it in a given channel.
+
+        :param event: The event to record.
+        :type event: :class:`pyalgotrade.observer.Event`.
+        :param name: The name of the channel.
+        :type name: string.
+        :param subject: The subject that dispatches the event. If set, the time returned by its getEventTimestamp
+            method is recorded instead of the current time.
+        """
+        event.subscribe(self.getHandler(name, subject))
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class LogReader:
+    """Reads the records from a log written by :class:`Recorder`, one at a time.
+
+    :param path: The path to the log.
+    :type path: string.
+    """
+
+    def __init__(self, path):
+        self.__file = open(path, "rb")
+        if self.__file.read(len(LOG_HEADER)) != LOG_HEADER:
+            self.__file.close()
+            raise Exception("%s is not an event log" % (path))
+        self.__channels = {}
+
+    def next(self):
+        """Returns a tuple with the timestamp, the channel name and the event parameters for the next record,
+        or None if there are no more records."""
+        while True:
+            header = self.__file.read(RECORD_HEADER.size)
+            # A truncated record may be found if the recorder didn't finish writing it.
+            if len(header) < RECORD_HEADER.size:
+                return None
+            timestamp, channelId, payloadSize = RECORD_HEADER.unpack(header)
+            payload = self.__file.read(payloadSize)
+            if len(payload) < payloadSize:
+                return None
+
+            if channelId == DEFINE_CHANNEL:
+                self.__channels[CHANNEL_ID.unpack(payload[:CHANNEL_ID.size])[0]] = payload[CHANNEL_ID.size:]
+            else:
+                return (timestamp, self.__channels[channelId], cPickle.loads(payload))
+
+    def close(self):
+        self.__file.close()
+
+
+class ReplaySubject(observer.Subject):
+    """A realtime :class:`pyalgotrade.observer.Subject` that replays events recorded by :class:`Recorder`.
+
+    :param path: The path to the log.
+    :type path: string.
+    :param speed: None to replay events as fast as possible, one event per dispatch, or a speed factor to replay them
+        at the recorded pace. 1 is the recorded pace, 2 is twice as fast, etc.
+    :type speed: float.
+    """
+
+    # The maximum number of seconds to sleep in dispatch, while waiting for the next event when replaying at the recorded
+    # pace.
+    MAX_SLEEP = 0.01
+
+    def __init__(self, path, speed=None):
+        if speed is not None and speed <= 0:
+            raise Exception("Invalid speed")
+        self.__path = path
+        self.__speed = speed
+        self.__reader = None
+        self.__nextRecord = None
+        self.__events = {}
+        self.__firstTimestamp = None
+        self.__startTime = None
+        self.__dispatchedCount = 0
+        self.__eventTimestamp = None
+
+    def getEvent(self, name):
+        """Returns the :class:`pyalgotrade.observer.Event` for a given channel.
+        Handlers receive the same parameters that were recorded."""
+        ret = self.__events.get(name)
+        if ret is None:
+            ret = observer.Event()
+            self.__events[name] = ret
+        return ret
+
+    def getDispatchedCount(self):
+        """Returns the number of events replayed so far."""
+        return self.__dispatchedCount
+
+    def getEventTimestamp(self):
+        """Returns the recorded time, in seconds since the epoch, for the event being replayed."""
+        return self.__eventTimestamp
+
+    def start(self):
+        if self.__reader is not None:
+            raise Exception("Already running")
+        self.__reader = LogReader(self.__path)
+        self.__nextRecord = self.__reader.next()
+        if self.__nextRecord is not None:
+            self.__firstTimestamp = self.__nextRecord[0]
+        self.__startTime = time.time()
+
+    def stop(self):
+        if self.__reader is not None:
+            self.__reader.close()
+        self.__nextRecord = None
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__nextRecord is None
+
+    def __emitNext(self):
+        timestamp, name, parameters = self.__nextRecord
+        self.__nextRecord = self.__reader.next()
+        self.__dispatchedCount += 1
+        self.__eventTimestamp = timestamp / 1000000.0
+        self.getEvent(name).emit(*parameters)
+
+    # Returns the number of seconds until the next event is due.
+    def __getWaitTime(self):
+        recordedElapsed = (self.__nextRecord[0] - self.__firstTimestamp) / 1000000.0
+        return recordedElapsed / self.__speed - (time.time() - self.__startTime)
+
+    def dispatch(self):
+        if self.__nextRecord is None:
+            return
+
+        if self.__speed is None:
+            self.__emitNext()
+        else:
+            waitTime = self.__getWaitTime()
+            if waitTime > 0:
+                time.sleep(min(waitTime, ReplaySubject.MAX_SLEEP))
+            # Emit all the events that are due.
+            while self.__nextRecord is not None and self.__getWaitTime() <= 0:
+                self.__emitNext()
+
+    def peekDateTime(self):
+        # Return None since this is a realtime subject.
+        return None
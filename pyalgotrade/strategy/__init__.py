@@ -46,6 +46,7 @@ class BaseStrategy:
         self.__analyzers = []
         self.__namedAnalyzers = {}
         self.__dispatcher = pyalgotrade.observer.Dispatcher()
+        self.__instrumentation = None
         self.__broker.getOrderUpdatedEvent().subscribe(self.__onOrderUpdated)
         self.__feed.getNewBarsEvent().subscribe(self.__onBars)
 
@@ -62,6 +63,29 @@ class BaseStrategy:
     def getDispatcher(self):
         return self.__dispatcher
 
+    def setUseInstrumentation(self, useInstrumentation):
+        """Call before :meth:`run` to record call counts and wall time for the feed and broker dispatches, the
+        handlers for new bars, order updates and processed bars, the analyzers and :meth:`onBars`.
+        Use :meth:`getInstrumentation` to get the results once :meth:`run` finishes.
+
+        :param useInstrumentation: True to enable instrumentation, False to disable it.
+        :type useInstrumentation: boolean.
+        """
+        instrumentation = None
+        if useInstrumentation:
+            instrumentation = pyalgotrade.observer.Instrumentation()
+
+        self.__instrumentation = instrumentation
+        self.__dispatcher.setInstrumentation(instrumentation)
+        self.__feed.getNewBarsEvent().setInstrumentation(instrumentation, "new bars")
+        self.__broker.getOrderUpdatedEvent().setInstrumentation(instrumentation, "order updated")
+        self.__barsProcessedEvent.setInstrumentation(instrumentation, "bars processed")
+
+    def getInstrumentation(self):
+        """Returns the :class:`pyalgotrade.observer.Instrumentation` with the results, or None if instrumentation
+        is not enabled."""
+        return self.__instrumentation
+
     def getResult(self):
         return self.getBroker().getEquity()
 
@@ -383,10 +407,18 @@ class BaseStrategy:
     def __onBars(self, dateTime, bars):
         # THE ORDER HERE IS VERY IMPORTANT
 
-        self.__notifyAnalyzers(lambda s: s.beforeOnBars(self, bars))
+        instrumentation = self.__instrumentation
+        if instrumentation is None:
+            self.__notifyAnalyzers(lambda s: s.beforeOnBars(self, bars))
+
+            # 1: Let the strategy process current bars and place orders.
+            self.onBars(bars)
+        else:
+            # Record the time spent by each analyzer and by onBars separately.
+            self.__notifyAnalyzers(lambda s: instrumentation.wrap("analyzer: %s" % (s.__class__.__name__), s.beforeOnBars)(self, bars))
 
-        # 1: Let the strategy process current bars and place orders.
-        self.onBars(bars)
+            # 1: Let the strategy process current bars and place orders.
+            instrumentation.wrap("strategy: onBars", self.onBars)(bars)
 
         # 2: Place the necessary orders for positions marked to exit on session close.
         self.__checkExitOnSessionClose(bars)
@@ -0,0 +1,394 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import os
+import multiprocessing
+import traceback
+
+from pyalgotrade import observer
+from pyalgotrade import dataseries
+from pyalgotrade import barfeed
+
+
+class BarFeedView(observer.Subject):
+    """A view over a bar feed shared by many strategies. Data series and bars come from the shared feed, but each view
+    has its own new bars event, so the broker and the strategy that use it get notified in order.
+
+    .. note::
+        Use :meth:`FanOutDispatcher.createFeed` to build instances.
+    """
+
+    def __init__(self, barFeed):
+        self.__barFeed = barFeed
+        self.__newBarsEvent = observer.Event()
+
+    def getNewBarsEvent(self):
+        return self.__newBarsEvent
+
+    def getNewValuesEvent(self):
+        return self.__newBarsEvent
+
+    def getSharedFeed(self):
+        """Returns the :class:`pyalgotrade.barfeed.BaseBarFeed` that this view is built on."""
+        return self.__barFeed
+    def isRealTime(self):
+        return self.__barFeed.isRealTime()
+
+    def barsHaveAdjClose(self):
+        return self.__barFeed.barsHaveAdjClose()
+
+    def getFrequency(self):
+        return self.__barFeed.getFrequency()
+
+    def getCurrentBars(self):
+        return self.__barFeed.getCurrentBars()
+
+    def getLastBar(self, instrument):
+        return self.__barFeed.getLastBar(instrument)
+
+    def getDefaultInstrument(self):
+        return self.__barFeed.getDefaultInstrument()
+
+    def getRegisteredInstruments(self):
+        return self.__barFeed.getRegisteredInstruments()
+
+    def getDataSeries(self, instrument=None):
+        return self.__barFeed.getDataSeries(instrument)
+
+    def getKeys(self):
+        return self.__barFeed.getKeys()
+
+    def __getitem__(self, key):
+        return self.__barFeed[key]
+
+    def __contains__(self, key):
+        return key in self.__barFeed
+
+    # The shared feed gets started, stopped and dispatched by FanOutDispatcher.
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__barFeed.eof()
+
+    def dispatch(self):
+        pass
+
+    def peekDateTime(self):
+        return None
+
+
+# The bar feed for a group of strategies that run on a worker process. It has its own data series, and the worker
+# process sets the bars to dispatch on every tick.
+class WorkerBarFeed(barfeed.BaseBarFeed):
+    def __init__(self, barFeed):
+        maxLen = dataseries.DEFAULT_MAX_LEN
+        if barFeed.getDefaultInstrument() is not None:
+            maxLen = barFeed.getDataSeries().getMaxLen()
+        barfeed.BaseBarFeed.__init__(self, barFeed.getFrequency(), maxLen)
+        self.__isRealTime = barFeed.isRealTime()
+        self.__barsHaveAdjClose = barFeed.barsHaveAdjClose()
+        self.__nextBars = None
+        for instrument in barFeed.getRegisteredInstruments():
+            self.registerInstrument(instrument)
+        # Keep the same default instrument.
+        if barFeed.getDefaultInstrument() is not None:
+            self.registerInstrument(barFeed.getDefaultInstrument())
+
+    def barsHaveAdjClose(self):
+        return self.__barsHaveAdjClose
+
+    def isRealTime(self):
+        return self.__isRealTime
+
+    def setNextBars(self, bars):
+        self.__nextBars = bars
+
+    def getNextBars(self):
+        ret = self.__nextBars
+        self.__nextBars = None
+        return ret
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__nextBars is None
+
+    def peekDateTime(self):
+        return None
+
+
+# Runs a group of strategies on a child process. The child process gets its own copy of the strategies when it is
+# forked, and bars are sent to it on every tick.
+class WorkerProcess:
+    # Replies from the child process.
+    OK = 1
+    STOPPED = 2
+    ERROR = 3
+
+    def __init__(self, barFeed, strategies):
+        self.__barFeed = barFeed
+        self.__strategies = strategies
+        self.__conn = None
+        self.__process = None
+
+    def getStrategies(self):
+        return self.__strategies
+
+    def __isStopped(self):
+        for strategy in self.__strategies:
+            if strategy.getDispatcher().isStopped():
+                return True
+        return False
+
+    # This runs on the child process.
+    def __run(self, conn):
+        try:
+            for strategy in self.__strategies:
+                strategy.onStart()
+            conn.send((WorkerProcess.OK, None))
+
+            bars = conn.recv()
+            while bars is not None:
+                self.__barFeed.setNextBars(bars)
+                self.__barFeed.dispatch()
+                if self.__isStopped():
+                    conn.send((WorkerProcess.STOPPED, None))
+                else:
+                    conn.send((WorkerProcess.OK, None))
+                bars = conn.recv()
+
+            results = []
+            for strategy in self.__strategies:
+                strategy.onFinish(self.__barFeed.getCurrentBars())
+                results.append(strategy.getResult())
+            conn.send((WorkerProcess.OK, results))
+        except Exception:
+            conn.send((WorkerProcess.ERROR, traceback.format_exc()))
+        conn.close()
+
+    def __getReply(self):
+        status, value = self.__conn.recv()
+        if status == WorkerProcess.ERROR:
+            raise Exception("A strategy failed on worker process %d:\n%s" % (self.__process.pid, value))
+        return (status, value)
+
+    # Starts the child process and waits for the strategies to start.
+    def start(self):
+        self.__conn, childConn = multiprocessing.Pipe()
+        self.__process = multiprocessing.Process(target=self.__run, args=(childConn,))
+        self.__process.daemon = True
+        self.__process.start()
+        childConn.close()
+        self.__getReply()
+
+    def sendBars(self, bars):
+        self.__conn.send(bars)
+
+    # Waits until the strategies are done processing the last bars. Returns True if any of them was stopped.
+    def waitBars(self):
+        return self.__getReply()[0] == WorkerProcess.STOPPED
+
+    # Lets the strategies finish and returns their results.
+    def finish(self):
+        self.__conn.send(None)
+        return self.__getReply()[1]
+
+    def terminate(self):
+        if self.__process.is_alive():
+            self.__process.terminate()
+        self.__process.join()
+        self.__conn.close()
+
+
+class FanOutDispatcher:
+    """Runs many strategies on a single bar feed, so bars are loaded and parsed only once.
+    Each strategy has its own broker. Strategies get split in groups, and each group runs on its own worker process
+    with its own copy of the data series. Every time the feed emits new bars, they are sent to all the workers, and
+    the feed doesn't move forward until all the strategies are done processing them.
+
+    :param barFeed: The bar feed shared by all the strategies.
+    :type barFeed: :class:`pyalgotrade.barfeed.BaseBarFeed`.
+    :param workerCount: The number of worker processes. If 1, strategies run in this process.
+    :type workerCount: int.
+
+    .. note::
+        * Strategies should be built using a feed returned by :meth:`createFeed`, once the bars were added to the
+          shared feed.
+        * Strategies should not share anything other than the feed. The data series from the feed, and any technical
+          indicator built on top of them, get updated before the strategies are notified and they should be treated
+          as read-only.
+        * Worker processes are forked once :meth:`run` is called, and each one gets a copy of its strategies. The
+          strategies in this process don't get updated, so use :meth:`getResults` to get the results.
+        * Worker processes don't dispatch the brokers, so only backtesting brokers are supported.
+        * Bars are pickled and sent to worker processes on every tick, so more than one worker only pays off if the
+          strategies take longer to process bars than that.
+        * More than one worker requires a platform that supports fork, so it is not supported on Windows.
+    """
+
+    def __init__(self, barFeed, workerCount=1):
+        assert(workerCount > 0)
+        if workerCount > 1 and not hasattr(os, "fork"):
+            raise Exception("More than one worker is not supported on this platform")
+
+        self.__barFeed = barFeed
+        self.__workerCount = workerCount
+        self.__strategies = []
+        self.__dispatcher = observer.Dispatcher()
+        self.__workers = []
+        self.__results = None
+        # Strategies get split in groups, one for each worker, and each group has its own feed. With a single worker
+        # the strategies run in this process using the shared feed.
+        if workerCount == 1:
+            self.__groupFeeds = [barFeed]
+        else:
+            self.__groupFeeds = [WorkerBarFeed(barFeed) for i in xrange(workerCount)]
+        self.__groupViews = []
+        for groupFeed in self.__groupFeeds:
+            views = []
+            groupFeed.getNewBarsEvent().subscribe(lambda dateTime, bars, views=views: self.__emitBars(views, dateTime, bars))
+            self.__groupViews.append(views)
+        self.__viewCount = 0
+        self.__barFeed.getNewBarsEvent().subscribe(self.__onBars)
+
+    def createFeed(self):
+        """Returns a :class:`BarFeedView` to build a strategy with."""
+        group = self.__viewCount % len(self.__groupFeeds)
+        self.__viewCount += 1
+        ret = BarFeedView(self.__groupFeeds[group])
+        self.__groupViews[group].append(ret)
+        return ret
+
+    def addStrategy(self, strategy):
+        """Adds a strategy to run.
+
+        :param strategy: The strategy to add. It must be built using a feed returned by :meth:`createFeed`.
+        :type strategy: :class:`pyalgotrade.strategy.BaseStrategy`.
+        """
+        feed = strategy.getFeed()
+        if not isinstance(feed, BarFeedView) or feed.getSharedFeed() not in self.__groupFeeds:
+            raise Exception("The strategy was not built using a feed from this dispatcher")
+        if strategy in self.__strategies:
+            raise Exception("The strategy was already added")
+        self.__strategies.append(strategy)
+
+    def getStrategies(self):
+        """Returns the strategies that were added."""
+        return self.__strategies
+
+    def getResults(self):
+        """Returns a list with the result of each strategy, as returned by getResult, once :meth:`run` finishes."""
+        return self.__results
+
+    def getWorkerCount(self):
+        return self.__workerCount
+
+    def __emitBars(self, views, dateTime, bars):
+        for view in views:
+            view.getNewBarsEvent().emit(dateTime, bars)
+
+    def __isStopped(self):
+        for strategy in self.__strategies:
+            if strategy.getDispatcher().isStopped():
+                return True
+        return False
+
+    def __onBars(self, dateTime, bars):
+        stopped = False
+        if len(self.__workers):
+            for worker in self.__workers:
+                worker.sendBars(bars)
+            # Wait for all the workers before moving forward.
+            for worker in self.__workers:
+                stopped = worker.waitBars() or stopped
+        else:
+            stopped = self.__isStopped()
+
+        # Stopping any of the strategies stops the whole run.
+        if stopped:
+            self.__dispatcher.stop()
+
+    def __runInline(self):
+        # It is important to dispatch broker events before feed events, specially if we're backtesting.
+        for strategy in self.__strategies:
+            self.__dispatcher.addSubject(strategy.getBroker())
+        self.__dispatcher.addSubject(self.__barFeed)
+
+        for strategy in self.__strategies:
+            strategy.onStart()
+        self.__dispatcher.run()
+
+        bars = self.__barFeed.getCurrentBars()
+        if bars is None:
+            raise Exception("Feed was empty")
+        for strategy in self.__strategies:
+            strategy.onFinish(bars)
+        self.__results = [strategy.getResult() for strategy in self.__strategies]
+
+    def __runWorkers(self):
+        for groupFeed in self.__groupFeeds:
+            strategies = [strategy for strategy in self.__strategies if strategy.getFeed().getSharedFeed() is groupFeed]
+            if len(strategies):
+                self.__workers.append(WorkerProcess(groupFeed, strategies))
+
+        self.__dispatcher.addSubject(self.__barFeed)
+        try:
+            for worker in self.__workers:
+                worker.start()
+            self.__dispatcher.run()
+
+            if self.__barFeed.getCurrentBars() is None:
+                raise Exception("Feed was empty")
+            results = {}
+            for worker in self.__workers:
+                for strategy, result in zip(worker.getStrategies(), worker.finish()):
+                    results[strategy] = result
+            self.__results = [results[strategy] for strategy in self.__strategies]
+        finally:
+            for worker in self.__workers:
+                worker.terminate()
+            self.__workers = []
+
+    def run(self):
+        """Call once (**and only once**) to run all the strategies."""
+        if len(self.__strategies) == 0:
+            raise Exception("No strategies were added")
+
+        if len(self.__groupFeeds) == 1:
+            self.__runInline()
+        else:
+            self.__runWorkers()
+
+    def stop(self):
+        """Stops all running strategies."""
+        self.__dispatcher.stop()
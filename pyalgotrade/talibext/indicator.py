@@ -26,11 +26,12 @@ import numpy
 def value_ds_to_numpy(ds, count):
     ret = None
     try:
-        values = ds[count*-1:]
-        ret = numpy.array([float(value) for value in values])
-    except IndexError:
-        pass
-    except TypeError:  # In case we try to convert None to float.
+        # This is a view for DataSeries backed by numpy arrays.
+        ret = numpy.asarray(ds.asArray(count*-1), dtype=float)
+        # None values are mapped to NaN, so check the values themselves to tell them apart from NaN values.
+        if numpy.isnan(ret).any() and None in ds[count*-1:]:
+            ret = None
+    except (TypeError, ValueError):  # In case we try to convert something that is not a number.
         pass
     return ret
 
@@ -75,6 +75,15 @@ class TwitterFeed(observer.Subject):
     :type follow: list.
     :param languages: A list of language IDs a defined in http://tools.ietf.org/html/bcp47.
     :type languages: list.
+    :param maxQueueSize: The maximum number of tweets waiting to be dispatched. 0 means no limit.
+    :type maxQueueSize: int.
+    :param queueOverflowPolicy: What to do when the queue is full. Valid values are:
+
+     * observer.NotifyingQueue.BLOCK to block until there is room.
+     * observer.NotifyingQueue.DROP_OLDEST to drop the oldest tweet.
+     * observer.NotifyingQueue.DROP_NEWEST to drop the new tweet.
+
+    :type queueOverflowPolicy: int.
 
     .. note::
         * Go to http://dev.twitter.com and create an app. The consumer key and secret will be generated for you after that.
@@ -85,7 +94,7 @@ class TwitterFeed(observer.Subject):
     QUEUE_TIMEOUT = 0.01
     MAX_EVENTS_PER_DISPATCH = 50
 
-    def __init__(self, consumerKey, consumerSecret, accessToken, accessTokenSecret, track=[], follow=[], languages=[]):
+    def __init__(self, consumerKey, consumerSecret, accessToken, accessTokenSecret, track=[], follow=[], languages=[], maxQueueSize=0, queueOverflowPolicy=observer.NotifyingQueue.BLOCK):
         if not isinstance(track, types.ListType):
             raise Exception("track must be a list")
         if not isinstance(follow, types.ListType):
@@ -94,7 +103,8 @@ class TwitterFeed(observer.Subject):
             raise Exception("languages must be a list")
 
         self.__event = observer.Event()
-        self.__queue = Queue.Queue()
+        self.__queue = observer.NotifyingQueue(maxQueueSize, queueOverflowPolicy)
+        self.__wakeUp = None
         self.__thread = None
         self.__running = False
 
@@ -113,17 +123,36 @@ class TwitterFeed(observer.Subject):
         finally:
             logger.info("Twitter client finished.")
             self.__running = False
+            # eof changed.
+            wakeUp = self.__wakeUp
+            if wakeUp is not None:
+                wakeUp.notify()
 
     def __dispatchImpl(self):
         ret = False
         try:
-            nextTweet = json.loads(self.__queue.get(True, TwitterFeed.QUEUE_TIMEOUT))
+            if self.__wakeUp is None:
+                nextTweet = json.loads(self.__queue.get(True, TwitterFeed.QUEUE_TIMEOUT))
+            else:
+                nextTweet = json.loads(self.__queue.get(False))
             ret = True
             self.__event.emit(nextTweet)
         except Queue.Empty:
             pass
         return ret
 
+    def getQueueHighWaterMark(self):
+        """Returns the maximum number of tweets that were waiting to be dispatched at the same time."""
+        return self.__queue.getHighWaterMark()
+
+    def getQueueDroppedCount(self):
+        """Returns the number of tweets that were dropped because the queue was full."""
+        return self.__queue.getDroppedCount()
+
+    def getEventTimestamp(self):
+        """Returns the time, in seconds since the epoch, when the tweet being dispatched was received."""
+        return self.__queue.getLastTimestamp()
+
     def subscribe(self, callback):
         """Subscribe to Twitter events. The event handler will receive a dictionary with the data as defined in:
         https://dev.twitter.com/docs/streaming-apis/messages#Public_stream_messages.
@@ -159,9 +188,18 @@ class TwitterFeed(observer.Subject):
         dispatched = TwitterFeed.MAX_EVENTS_PER_DISPATCH
         while self.__dispatchImpl() and dispatched > 0:
             dispatched -= 1
+        # If there are events left, make sure the dispatcher doesn't sleep.
+        wakeUp = self.__wakeUp
+        if wakeUp is not None and not self.__queue.empty():
+            wakeUp.notify()
 
     def peekDateTime(self):
         return None
 
     def getDispatchPriority(self):
         return None
+
+    def registerWakeUp(self, wakeUp):
+        self.__wakeUp = wakeUp
+        self.__queue.setWakeUp(wakeUp)
+        return True
@@ -18,6 +18,9 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import os
+import tempfile
+
 import numpy as np
 
 
@@ -57,47 +60,67 @@ def intersect(values1, values2, skipNone=False):
 
 
 # Like a collections.deque but using a numpy.array.
+# Values are stored in a circular buffer that is twice as large as maxLen. Every value is written twice, at
+# pos and at pos + maxLen, so the last maxLen values are always available as a contiguous slice and appending
+# is O(1) regardless of the window size.
 class NumPyDeque:
     def __init__(self, maxLen, dtype=float):
         if not maxLen > 0:
             raise Exception("Invalid maximum length")
 
-        self.__values = np.empty(maxLen, dtype=dtype)
+        self.__values = np.empty(maxLen*2, dtype=dtype)
         self.__maxLen = maxLen
         self.__nextPos = 0
+        self.__len = 0
 
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
-        if self.__nextPos < self.__maxLen:
-            self.__values[self.__nextPos] = value
-            self.__nextPos += 1
-        else:
-            # Shift items to the left and put the last value.
-            # I'm not using np.roll to avoid creating a new array.
-            self.__values[0:-1] = self.__values[1:]
-            self.__values[self.__nextPos - 1] = value
+        self.__values[self.__nextPos] = value
+        self.__values[self.__nextPos + self.__maxLen] = value
+        self.__nextPos += 1
+        if self.__nextPos == self.__maxLen:
+            self.__nextPos = 0
+        if self.__len < self.__maxLen:
+            self.__len += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.__values.dtype)
+        count = len(values)
+        # Only the last maxLen values will be kept.
+        values = values[-self.__maxLen:]
+        # Write up to the end of the first half of the buffer, and then wrap around.
+        chunk = min(len(values), self.__maxLen - self.__nextPos)
+        for begin, end, pos in ((0, chunk, self.__nextPos), (chunk, len(values), 0)):
+            self.__values[pos:pos + end - begin] = values[begin:end]
+            self.__values[pos + self.__maxLen:pos + self.__maxLen + end - begin] = values[begin:end]
+        self.__nextPos = (self.__nextPos + len(values)) % self.__maxLen
+        self.__len = min(self.__len + count, self.__maxLen)
 
     def data(self):
         # If all values are not initialized, return a portion of the array.
-        if self.__nextPos < self.__maxLen:
-            ret = self.__values[0:self.__nextPos]
+        if self.__len < self.__maxLen:
+            ret = self.__values[0:self.__len]
         else:
-            ret = self.__values
+            ret = self.__values[self.__nextPos:self.__nextPos + self.__maxLen]
         return ret
 
     def resize(self, maxLen):
         if not maxLen > 0:
             raise Exception("Invalid maximum length")
 
-        self.__values = np.resize(self.__values, maxLen)
+        # Keep the first maxLen values, just like numpy.resize does.
+        values = self.data()[0:maxLen]
+        self.__values = np.empty(maxLen*2, dtype=self.__values.dtype)
         self.__maxLen = maxLen
-        if self.__nextPos >= self.__maxLen:
-            self.__nextPos = self.__maxLen
+        self.__len = len(values)
+        self.__values[0:self.__len] = values
+        self.__values[maxLen:maxLen + self.__len] = values
+        self.__nextPos = self.__len % maxLen
 
     def __len__(self):
-        return self.__nextPos
+        return self.__len
 
     def __getitem__(self, key):
         return self.data()[key]
@@ -106,36 +129,158 @@ class NumPyDeque:
 # I'm not using collections.deque because:
 # 1: Random access is slower.
 # 2: Slicing is not supported.
+# Instead of popping the first item on every append (which is O(n)), discarded items are left at the front of the
+# list and are removed in bulk once there are maxLen of them, so appending is amortized O(1).
 class ListDeque:
     def __init__(self, maxLen, dtype=float):
         if not maxLen > 0:
             raise Exception("Invalid maximum length")
 
         self.__values = []
+        self.__start = 0
         self.__maxLen = maxLen
 
     def getMaxLen(self):
         return self.__maxLen
 
+    def __compact(self):
+        if self.__start:
+            del self.__values[0:self.__start]
+            self.__start = 0
+
     def append(self, value):
         self.__values.append(value)
         # Check bounds
-        if len(self.__values) > self.__maxLen:
-            self.__values.pop(0)
+        if len(self.__values) - self.__start > self.__maxLen:
+            self.__start += 1
+            if self.__start >= self.__maxLen:
+                self.__compact()
+
+    def extend(self, values):
+        self.__values.extend(values)
+        # Check bounds
+        excess = len(self.__values) - self.__start - self.__maxLen
+        if excess > 0:
+            self.__start += excess
+            if self.__start >= self.__maxLen:
+                self.__compact()
 
     def data(self):
-        return self.__values
+        # Compacting here would make data O(n) on every call once the deque is full, so discarded items are skipped
+        # with a slice instead, and compacting is left to append and extend.
+        if self.__start == 0:
+            return self.__values
+        return self.__values[self.__start:]
 
     def resize(self, maxLen):
         if not maxLen > 0:
             raise Exception("Invalid maximum length")
 
+        self.__compact()
         self.__maxLen = maxLen
         if len(self.__values) > maxLen:
             self.__values = self.__values[-1*maxLen:]
 
     def __len__(self):
-        return len(self.__values)
+        return len(self.__values) - self.__start
 
     def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            start += self.__start
+            stop += self.__start
+            # With negative steps, stop may be -1 to include the first item.
+            if stop < 0:
+                stop = None
+            return self.__values[start:stop:step]
+
+        if key < 0:
+            if key < -len(self):
+                raise IndexError("Index out of range")
+        else:
+            key += self.__start
         return self.__values[key]
+
+
+# An unbounded, append only, numpy array that holds the most recent values in memory and spills older ones to a
+# memory-mapped file. Values are written to the file in segments of hotLen items.
+class SpillArray:
+    def __init__(self, hotLen, dtype=float, path=None):
+        if not hotLen > 0:
+            raise Exception("Invalid hot length")
+
+        self.__hot = np.empty(hotLen, dtype=dtype)
+        self.__hotCount = 0
+        self.__spilledCount = 0
+        if path is None:
+            self.__file = tempfile.TemporaryFile()
+        else:
+            self.__file = open(path, "w+b")
+        self.__mmap = None
+
+    def __spill(self):
+        self.__file.seek(0, os.SEEK_END)
+        self.__hot.tofile(self.__file)
+        self.__file.flush()
+        self.__spilledCount += self.__hotCount
+        self.__hotCount = 0
+        # The memory map needs to be rebuilt to include the new segment.
+        self.__mmap = None
+
+    def __getSpilled(self):
+        if self.__mmap is None:
+            self.__mmap = np.memmap(self.__file, dtype=self.__hot.dtype, mode="r", shape=(self.__spilledCount,))
+        return self.__mmap
+
+    def getSpilledCount(self):
+        return self.__spilledCount
+
+    def append(self, value):
+        if self.__hotCount == len(self.__hot):
+            self.__spill()
+        self.__hot[self.__hotCount] = value
+        self.__hotCount += 1
+
+    # Returns the values in the [start:end] range. If all of them are in memory a view is returned, otherwise a copy.
+    def slice(self, start=None, end=None):
+        start, end, step = slice(start, end).indices(len(self))
+        end = max(start, end)
+        if start >= self.__spilledCount:
+            ret = self.__hot[start - self.__spilledCount:end - self.__spilledCount]
+        elif end <= self.__spilledCount:
+            ret = np.array(self.__getSpilled()[start:end])
+        else:
+            ret = np.concatenate((self.__getSpilled()[start:], self.__hot[0:end - self.__spilledCount]))
+        return ret
+
+    # Like numpy.searchsorted. Values are assumed to be sorted.
+    def searchsorted(self, value, side="left"):
+        # Look in memory first, and only if that fails go through the values in disk.
+        ret = int(np.searchsorted(self.__hot[0:self.__hotCount], value, side))
+        if ret == 0 and self.__spilledCount:
+            ret = int(np.searchsorted(self.__getSpilled(), value, side))
+        else:
+            ret += self.__spilledCount
+        return ret
+
+    def close(self):
+        self.__mmap = None
+        self.__file.close()
+
+    def __len__(self):
+        return self.__spilledCount + self.__hotCount
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, end, step = key.indices(len(self))
+            if step == 1:
+                return self.slice(start, end)
+            return np.array([self[i] for i in xrange(start, end, step)], dtype=self.__hot.dtype)
+
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("Index out of range")
+        if key < self.__spilledCount:
+            return self.__getSpilled()[key]
+        return self.__hot[key - self.__spilledCount]
@@ -47,3 +47,35 @@ class FastDictReader:
             self.__dict[self.__fieldNames[i]] = row[i]
 
         return self.__dict
+
+
+def read_columns(f, fieldnames=None, delimiter=","):
+    # Reads all the rows and returns a dictionary that maps field names to lists of strings.
+    # Empty rows are skipped.
+    data = f.read()
+    if data.find('"') != -1:
+        # Quoted values need the csv module.
+        rows = [row for row in csv.reader(data.splitlines(), delimiter=delimiter) if len(row)]
+        if fieldnames is None:
+            fieldnames = rows.pop(0)
+        columnCounts = [len(row) for row in rows]
+        values = [value for row in rows for value in row]
+    else:
+        lines = [line for line in data.splitlines() if len(line)]
+        if fieldnames is None:
+            fieldnames = lines.pop(0).split(delimiter)
+        columnCounts = [line.count(delimiter) + 1 for line in lines]
+        values = []
+        # Splitting an empty string returns a single empty value.
+        if len(lines):
+            values = delimiter.join(lines).split(delimiter)
+
+    # Check that each row has the right number of columns. Otherwise values would end up in the wrong columns.
+    if columnCounts.count(len(fieldnames)) != len(columnCounts):
+        badRow = [count == len(fieldnames) for count in columnCounts].index(False)
+        raise Exception("Rows should have %d columns. Row %d has %d" % (len(fieldnames), badRow + 1, columnCounts[badRow]))
+
+    ret = {}
+    for i, name in enumerate(fieldnames):
+        ret[name] = values[i::len(fieldnames)]
+    return ret
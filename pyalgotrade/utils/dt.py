@@ -57,3 +57,27 @@ def timestamp_to_datetime(timeStamp, localized=True):
     if localized:
         ret = localize(ret, pytz.utc)
     return ret
+
+
+epoch = datetime.datetime(1970, 1, 1)
+
+
+def timedelta_to_microseconds(delta):
+    """ Converts a datetime.timedelta to microseconds."""
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def datetime_to_microseconds(dateTime):
+    """ Converts a datetime.datetime to the number of microseconds since the epoch. Naive datetimes are treated as UTC."""
+    if not datetime_is_naive(dateTime):
+        dateTime = dateTime.replace(tzinfo=None) - dateTime.utcoffset()
+    return timedelta_to_microseconds(dateTime - epoch)
+
+
+def microseconds_to_datetime(microseconds, tzinfo=None):
+    """ Converts the number of microseconds since the epoch to a datetime.datetime.
+    If tzinfo is None a naive datetime is returned, otherwise the datetime is localized to tzinfo."""
+    ret = epoch + datetime.timedelta(microseconds=int(microseconds))
+    if tzinfo is not None:
+        ret = pytz.utc.localize(ret).astimezone(tzinfo)
+    return ret
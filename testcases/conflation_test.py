@@ -0,0 +1,188 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import unittest
+import datetime
+import pickle
+
+from pyalgotrade.barfeed import conflation
+from pyalgotrade.mtgox import barfeed
+from pyalgotrade.mtgox import base
+from pyalgotrade import observer
+from pyalgotrade import bar
+from pyalgotrade.utils import dt
+
+
+def build_bar(dateTime, price, volume=1):
+    return bar.BasicBar(dateTime, price, price, price, price, volume, None)
+
+
+# Emits a burst of trades every time it gets dispatched.
+class ClientStub(observer.Subject):
+    def __init__(self, bursts):
+        self.__bursts = bursts
+        self.__tradeEvent = observer.Event()
+
+    def getCurrency(self):
+        return "USD"
+
+    def getTradeEvent(self):
+        return self.__tradeEvent
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return len(self.__bursts) == 0
+
+    def dispatch(self):
+        for dateTime, price in self.__bursts.pop(0):
+            trade = base.Trade({
+                "amount_int": 100000000,
+                "tid": dt.datetime_to_microseconds(dateTime),
+                "price_int": price * 100000,
+                "price_currency": "USD",
+                "trade_type": "bid",
+            })
+            self.__tradeEvent.emit(trade)
+
+    def peekDateTime(self):
+        return None
+
+    def getDispatchPriority(self):
+        return 100
+
+
+class ConflationPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.__begin = datetime.datetime(2013, 1, 1)
+
+    def __dateTime(self, milliseconds):
+        return self.__begin + datetime.timedelta(milliseconds=milliseconds)
+
+    def testLatestOnly(self):
+        policy = conflation.LatestOnlyPolicy()
+        for i in xrange(5):
+            policy.push(build_bar(self.__dateTime(i), i + 1))
+        self.assertEqual(policy.getQueueDepth(), 1)
+        self.assertEqual(policy.getDroppedCount(), 4)
+        self.assertEqual(policy.getMergedCount(), 0)
+        self.assertEqual(policy.pop().getClose(), 5)
+        self.assertEqual(policy.pop(), None)
+
+        policy.push(build_bar(self.__dateTime(10), 10))
+        self.assertEqual(policy.pop().getClose(), 10)
+        self.assertEqual(policy.getDroppedCount(), 4)
+        self.assertEqual(policy.getMaxQueueDepth(), 1)
+
+    def testTimeBucket(self):
+        policy = conflation.TimeBucketPolicy(datetime.timedelta(milliseconds=100))
+        for milliseconds, price in [(0, 10), (50, 12), (99, 9), (100, 11), (250, 13)]:
+            policy.push(build_bar(self.__dateTime(milliseconds), price))
+        self.assertEqual(policy.getQueueDepth(), 3)
+        self.assertEqual(policy.getMergedCount(), 2)
+        self.assertEqual(policy.getDroppedCount(), 0)
+
+        merged = policy.pop()
+        self.assertEqual(merged.getDateTime(), self.__dateTime(99))
+        self.assertEqual(merged.getOpen(), 10)
+        self.assertEqual(merged.getHigh(), 12)
+        self.assertEqual(merged.getLow(), 9)
+        self.assertEqual(merged.getClose(), 9)
+        self.assertEqual(merged.getVolume(), 3)
+        self.assertEqual(policy.pop().getClose(), 11)
+        self.assertEqual(policy.pop().getClose(), 13)
+        self.assertEqual(policy.pop(), None)
+
+    def testBarCount(self):
+        policy = conflation.BarCountPolicy(2)
+        for i in xrange(5):
+            policy.push(build_bar(self.__dateTime(i), i + 1))
+        self.assertEqual(policy.getQueueDepth(), 3)
+        self.assertEqual(policy.getMaxQueueDepth(), 3)
+        self.assertEqual(policy.getMergedCount(), 2)
+        self.assertEqual([policy.pop().getVolume() for i in xrange(3)], [2, 2, 1])
+
+    def testTradeBars(self):
+        policy = conflation.BarCountPolicy(3)
+        for milliseconds, price, tradeType in [(0, 10, "bid"), (1, 12, "bid"), (2, 11, "ask")]:
+            policy.push(barfeed.TradeBar(self.__dateTime(milliseconds), price, 2, tradeType))
+        merged = policy.pop()
+        self.assertTrue(isinstance(merged, barfeed.TradeBar))
+        self.assertEqual(merged.getTradeType(), "ask")
+        self.assertEqual(merged.getDateTime(), self.__dateTime(2))
+        self.assertEqual([merged.getOpen(), merged.getHigh(), merged.getLow(), merged.getClose()], [10, 12, 10, 11])
+        self.assertEqual(merged.getVolume(), 6)
+        self.assertEqual(merged.getAdjClose(), 11)
+        self.assertEqual(merged.getTypicalPrice(), 11)
+
+        merged = pickle.loads(pickle.dumps(merged))
+        self.assertEqual([merged.getOpen(), merged.getHigh(), merged.getClose(), merged.getTradeType()], [10, 12, 11, "ask"])
+
+    def testInvalidParameters(self):
+        with self.assertRaises(Exception):
+            conflation.TimeBucketPolicy(datetime.timedelta(0))
+        with self.assertRaises(Exception):
+            conflation.BarCountPolicy(0)
+
+
+class LiveTradeFeedTestCase(unittest.TestCase):
+    def __run(self, conflationPolicy):
+        begin = datetime.datetime(2013, 1, 1)
+        bursts = [
+            [(begin + datetime.timedelta(milliseconds=i), 10 + i) for i in xrange(5)],
+            [(begin + datetime.timedelta(seconds=1), 20)],
+        ]
+        client = ClientStub(bursts)
+        feed = barfeed.LiveTradeFeed(client, conflationPolicy=conflationPolicy)
+        closes = []
+
+        def onBars(dateTime, bars):
+            # Merged trades should still be TradeBars.
+            self.assertEqual(bars["BTC"].getTradeType(), "bid")
+            closes.append(round(bars["BTC"].getClose(), 2))
+        feed.getNewBarsEvent().subscribe(onBars)
+
+        dispatcher = observer.Dispatcher()
+        dispatcher.addSubject(client)
+        dispatcher.addSubject(feed)
+        dispatcher.run()
+        self.assertEqual(feed.getQueueDepth(), 0)
+        return closes
+
+    def testWithoutConflation(self):
+        self.assertEqual(self.__run(None), [10, 11, 12, 13, 14, 20])
+
+    def testLatestOnly(self):
+        policy = conflation.LatestOnlyPolicy()
+        self.assertEqual(self.__run(policy), [14, 20])
+        self.assertEqual(policy.getDroppedCount(), 4)
+
+    def testTimeBucket(self):
+        policy = conflation.TimeBucketPolicy(datetime.timedelta(milliseconds=100))
+        self.assertEqual(self.__run(policy), [14, 20])
+        self.assertEqual(policy.getMergedCount(), 4)
+        self.assertEqual(policy.getMaxQueueDepth(), 1)
@@ -20,10 +20,18 @@
 
 import unittest
 import datetime
+import os
+import shutil
+import glob
+import pickle
 
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.barfeed import columnar
+from pyalgotrade.barfeed import barcache
+from pyalgotrade import barfeed
+from pyalgotrade.dataseries import bards
 from pyalgotrade.utils import dt
 from pyalgotrade import marketsession
 import feed_test
@@ -213,6 +221,23 @@ class YahooTestCase(unittest.TestCase):
         self.assertEqual(len(barDS.getLowDataSeries()), 2)
         self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
 
+    def testColumnarDataSeries(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV(YahooTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        barFeed.loadAll()
+        columnarBarFeed = yahoofeed.Feed()
+        columnarBarFeed.setUseColumnarDataSeries(True)
+        columnarBarFeed.addBarsFromCSV(YahooTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        columnarBarFeed.loadAll()
+
+        barDS = barFeed[YahooTestCase.TestInstrument]
+        columnarBarDS = columnarBarFeed[YahooTestCase.TestInstrument]
+        self.assertTrue(isinstance(columnarBarDS, bards.ColumnarBarDataSeries))
+        self.assertEqual(barDS.getDateTimes(), columnarBarDS.getDateTimes())
+        self.assertEqual(barDS.getCloseDataSeries()[:], columnarBarDS.getCloseDataSeries()[:])
+        self.assertEqual(barDS.getAdjCloseDataSeries()[:], columnarBarDS.getAdjCloseDataSeries()[:])
+        self.assertEqual(barDS[-1].getOpen(), columnarBarDS[-1].getOpen())
+
 
 class NinjaTraderTestCase(unittest.TestCase):
     def __loadIntradayBarFeed(self, timeZone=None):
@@ -290,3 +315,507 @@ class NinjaTraderTestCase(unittest.TestCase):
         self.assertEqual(len(barDS.getHighDataSeries()), 2)
         self.assertEqual(len(barDS.getLowDataSeries()), 2)
         self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
+
+
+def get_bar_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        for instrument in sorted(bars.keys()):
+            bar_ = bars[instrument]
+            ret.append((
+                instrument, bar_.getDateTime(), str(bar_.getDateTime().tzinfo), bar_.getOpen(), bar_.getHigh(),
+                bar_.getLow(), bar_.getClose(), bar_.getVolume(), bar_.getAdjClose(), bar_.getSessionClose(),
+                bar_.getBarsTillSessionClose()
+            ))
+    return ret
+
+
+YAHOO_FILES = [
+    ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+    ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+    ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+]
+
+
+# Adds (instrument, path) pairs one at a time, or all at once using worker processes if parallel is True.
+def add_bars_from_csvs(barFeed, files, parallel=False, timezone=None):
+    if parallel:
+        barFeed.addBarsFromCSVs(files, timezone, processes=2)
+    else:
+        for instrument, path in files:
+            barFeed.addBarsFromCSV(instrument, path, timezone)
+    return barFeed
+
+
+# Checks that buildFeed(True), which builds a feed with the option being tested, has the same bars as
+# buildFeed(False), which builds a feed that loads bars row by row.
+def assert_same_bars(testCase, buildFeed):
+    expected = get_bar_values(buildFeed(False))
+    testCase.assertTrue(len(expected) > 0)
+    testCase.assertEqual(get_bar_values(buildFeed(True)), expected)
+
+
+class BulkLoadingTestCase(unittest.TestCase):
+    def __testYahoo(self, timezone=None, dailyBarTime=None, barFilter=None, sanitize=False):
+        def buildFeed(useBulkLoading):
+            barFeed = yahoofeed.Feed(timezone)
+            barFeed.setUseBulkLoading(useBulkLoading)
+            barFeed.sanitizeBars(sanitize)
+            if dailyBarTime is not None:
+                barFeed.setDailyBarTime(dailyBarTime)
+            if barFilter is not None:
+                barFeed.setBarFilter(barFilter)
+            return add_bars_from_csvs(barFeed, YAHOO_FILES)
+        assert_same_bars(self, buildFeed)
+
+    def __testNinjaTrader(self, timezone=None, barFilter=None):
+        def buildFeed(useBulkLoading):
+            barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, timezone)
+            barFeed.setUseBulkLoading(useBulkLoading)
+            if barFilter is not None:
+                barFeed.setBarFilter(barFilter)
+            barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+            return barFeed
+        assert_same_bars(self, buildFeed)
+
+    def testYahoo(self):
+        self.__testYahoo()
+        self.__testYahoo(sanitize=True)
+        self.__testYahoo(marketsession.USEquities.getTimezone())
+        self.__testYahoo(marketsession.TSE.getTimezone(), datetime.time(3, 0))
+
+    def testYahooDateRangeFilter(self):
+        self.__testYahoo(barFilter=csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2001, 1, 5)))
+
+    def testDateRangeFilterNaiveAndAware(self):
+        naive = datetime.datetime(2000, 3, 1)
+        for useBulkLoading in [False, True]:
+            for barFilter, timezone in [
+                (csvfeed.DateRangeFilter(toDate=naive), marketsession.USEquities.getTimezone()),
+                (csvfeed.DateRangeFilter(fromDate=dt.as_utc(naive)), None),
+            ]:
+                barFeed = yahoofeed.Feed(timezone)
+                barFeed.setUseBulkLoading(useBulkLoading)
+                barFeed.setBarFilter(barFilter)
+                with self.assertRaises(TypeError):
+                    barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+
+    def testNinjaTrader(self):
+        self.__testNinjaTrader()
+        self.__testNinjaTrader(marketsession.USEquities.getTimezone())
+
+    def testNinjaTraderRTHFilter(self):
+        self.__testNinjaTrader(barFilter=csvfeed.USEquitiesRTH())
+        fromDate = dt.as_utc(datetime.datetime(2011, 3, 8))
+        toDate = dt.as_utc(datetime.datetime(2011, 3, 20))
+        self.__testNinjaTrader(marketsession.USEquities.getTimezone(), csvfeed.USEquitiesRTH(fromDate, toDate))
+
+    def testGenericBarFeed(self):
+        common.init_temp_path()
+        path = os.path.join(common.get_temp_path(), "generic.csv")
+        with open(path, "w") as f:
+            f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+            f.write("2013-03-09 23:59:00,10,12,9,11,100,\n")
+            f.write("2013-03-10 02:30:00,11,13,10,12,200,11.5\n")
+            f.write("\n")
+            f.write("2013-03-10 23:59:00,12,12,10,11,300,10.5\n")
+
+        for timezone in [None, marketsession.USEquities.getTimezone()]:
+            def buildFeed(useBulkLoading):
+                barFeed = csvfeed.GenericBarFeed(barfeed.Frequency.MINUTE, timezone)
+                barFeed.setUseBulkLoading(useBulkLoading)
+                barFeed.addBarsFromCSV("spy", path)
+                self.assertTrue(barFeed.barsHaveAdjClose())
+                return barFeed
+            assert_same_bars(self, buildFeed)
+
+    def testMixedWithSequences(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.setUseBulkLoading(True)
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        self.assertEqual(len(get_bar_values(barFeed)), 252)
+
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        barFeed.setUseBulkLoading(True)
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+        self.assertEqual(len(get_bar_values(barFeed)), 252 + 248)
+
+    def testParseDateTimes(self):
+        dateTimes = columnar.parse_datetimes(["2011-03-09 16:00:01", "1969-12-31 23:59:59", "2012-02-29 00:00:00"], "%Y-%m-%d %H:%M:%S")
+        self.assertEqual(dateTimes.tolist(), [
+            dt.datetime_to_microseconds(datetime.datetime(2011, 3, 9, 16, 0, 1)),
+            dt.datetime_to_microseconds(datetime.datetime(1969, 12, 31, 23, 59, 59)),
+            dt.datetime_to_microseconds(datetime.datetime(2012, 2, 29)),
+        ])
+        for invalid in [["2011-3-09"], ["2011/03/09"], ["2011-02-29"], ["2011-13-01"], ["2011-03-09 "]]:
+            with self.assertRaises(Exception):
+                columnar.parse_datetimes(invalid, "%Y-%m-%d")
+
+    def testRowsWithWrongColumnCount(self):
+        common.init_temp_path()
+        path = os.path.join(common.get_temp_path(), "generic.csv")
+        # The total number of values is right, but the second row is short and the third one is long.
+        for quote in ["", '"']:
+            with open(path, "w") as f:
+                f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2013-03-09 23:59:00,10,12,9,11,100,%s%s\n" % (quote, quote))
+                f.write("2013-03-10 23:59:00,11,13,10,12,200\n")
+                f.write("2013-03-11 23:59:00,12,12,10,11,300,10.5,10.5\n")
+            barFeed = csvfeed.GenericBarFeed(barfeed.Frequency.DAY)
+            barFeed.setUseBulkLoading(True)
+            with self.assertRaisesRegexp(Exception, "Rows should have 7 columns. Row 2 has 6"):
+                barFeed.addBarsFromCSV("spy", path)
+
+    def testNoRows(self):
+        common.init_temp_path()
+        genericPath = os.path.join(common.get_temp_path(), "generic.csv")
+        with open(genericPath, "w") as f:
+            f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+        ninjaTraderPath = os.path.join(common.get_temp_path(), "ninjatrader.csv")
+        open(ninjaTraderPath, "w").close()
+
+        for useBulkLoading in [False, True]:
+            barFeed = csvfeed.GenericBarFeed(barfeed.Frequency.DAY)
+            barFeed.setUseBulkLoading(useBulkLoading)
+            barFeed.addBarsFromCSV("spy", genericPath)
+            self.assertEqual(get_bar_values(barFeed), [])
+
+            barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+            barFeed.setUseBulkLoading(useBulkLoading)
+            barFeed.addBarsFromCSV("spy", ninjaTraderPath)
+            self.assertEqual(get_bar_values(barFeed), [])
+
+    def testBarValidation(self):
+        with self.assertRaisesRegexp(Exception, "high < close on 2013-01-02 00:00:00"):
+            columnar.BarColumns(
+                columnar.parse_datetimes(["2013-01-01", "2013-01-02"], "%Y-%m-%d"),
+                [10, 10], [11, 11], [9, 9], [10, 12], [1, 1]
+            )
+
+
+class BarCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        common.init_temp_path()
+        self.__cacheDir = os.path.join(common.get_temp_path(), "cache")
+        if os.path.exists(self.__cacheDir):
+            shutil.rmtree(self.__cacheDir)
+        os.mkdir(self.__cacheDir)
+
+    def __getCacheFiles(self):
+        return glob.glob(os.path.join(self.__cacheDir, "*" + barcache.CACHE_FILE_EXTENSION))
+
+    def __buildYahooFeed(self, path, useCache, timezone=None):
+        barFeed = yahoofeed.Feed(timezone)
+        barFeed.setUseCache(useCache, self.__cacheDir)
+        barFeed.addBarsFromCSV("orcl", path)
+        return barFeed
+
+    def testYahoo(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        expected = get_bar_values(self.__buildYahooFeed(path, False))
+        # The first time the cache file gets written, and then it gets read.
+        for i in xrange(2):
+            self.assertEqual(get_bar_values(self.__buildYahooFeed(path, True)), expected)
+            self.assertEqual(len(self.__getCacheFiles()), 1)
+
+        rowParser = yahoofeed.RowParser(datetime.time(23, 59, 59))
+        parserKey = barcache.get_parser_key(rowParser)
+        barColumns = barcache.read(barcache.get_cache_path(path, parserKey, self.__cacheDir), barcache.get_cache_key(path, parserKey))
+        self.assertEqual(len(barColumns), 252)
+
+        # Loading with a different timezone uses a different cache file.
+        timezone = marketsession.USEquities.getTimezone()
+        expected = get_bar_values(self.__buildYahooFeed(path, False, timezone))
+        for i in xrange(2):
+            self.assertEqual(get_bar_values(self.__buildYahooFeed(path, True, timezone)), expected)
+            self.assertEqual(len(self.__getCacheFiles()), 2)
+
+    def testCSVChanged(self):
+        path = os.path.join(common.get_temp_path(), "orcl.csv")
+        shutil.copy(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path)
+        self.assertEqual(len(get_bar_values(self.__buildYahooFeed(path, True))), 252)
+
+        # Keep the first 11 lines, and make sure that the modification time changes too.
+        with open(path, "r") as f:
+            lines = f.readlines()[:11]
+        with open(path, "w") as f:
+            f.writelines(lines)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+        self.assertEqual(len(get_bar_values(self.__buildYahooFeed(path, True))), 10)
+        self.assertEqual(len(self.__getCacheFiles()), 1)
+
+    def testGenericBarFeed(self):
+        path = os.path.join(common.get_temp_path(), "generic.csv")
+        with open(path, "w") as f:
+            f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+            f.write("2013-03-09 23:59:00,10,12,9,11,100,\n")
+            f.write("2013-03-10 23:59:00,12,12,10,11,300,10.5\n")
+
+        values = []
+        for i in xrange(2):
+            barFeed = csvfeed.GenericBarFeed(barfeed.Frequency.DAY, marketsession.USEquities.getTimezone())
+            barFeed.setUseCache(True, self.__cacheDir)
+            barFeed.addBarsFromCSV("spy", path)
+            self.assertTrue(barFeed.barsHaveAdjClose())
+            values.append(get_bar_values(barFeed))
+        self.assertEqual(values[0], values[1])
+        self.assertEqual(values[0][0][8], None)
+        self.assertEqual(len(self.__getCacheFiles()), 1)
+
+    def testInvalidCacheFile(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        expected = get_bar_values(self.__buildYahooFeed(path, False))
+        self.__buildYahooFeed(path, True)
+        cachePath = self.__getCacheFiles()[0]
+        with open(cachePath, "r+b") as f:
+            f.truncate(100)
+        self.assertEqual(get_bar_values(self.__buildYahooFeed(path, True)), expected)
+        self.assertTrue(os.path.getsize(cachePath) > 100)
+
+    def testCorruptedMetadata(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        expected = get_bar_values(self.__buildYahooFeed(path, False))
+        self.__buildYahooFeed(path, True)
+        cachePath = self.__getCacheFiles()[0]
+        size = os.path.getsize(cachePath)
+        # Overwrite the metadata, keeping the size of the file.
+        with open(cachePath, "r+b") as f:
+            f.seek(barcache.HEADER_LEN * barcache.ITEM_SIZE)
+            f.write("\x80\x02" + "\xff" * 14)
+        self.assertEqual(os.path.getsize(cachePath), size)
+        self.assertEqual(get_bar_values(self.__buildYahooFeed(path, True)), expected)
+
+
+class StreamingBarFeedTestCase(unittest.TestCase):
+    def __buildNinjaTraderFeed(self, streaming, timezone=None, barFilter=None, chunkSize=csvfeed.STREAMING_CHUNK_SIZE):
+        if streaming:
+            barFeed = csvfeed.StreamingBarFeed(barfeed.Frequency.MINUTE, chunkSize)
+        else:
+            barFeed = ninjatraderfeed.Feed(barfeed.Frequency.MINUTE, timezone)
+        if barFilter is not None:
+            barFeed.setBarFilter(barFilter)
+        for instrument in ["spy", "qqq"]:
+            path = common.get_data_file_path("nt-spy-minute-2011-03.csv")
+            if streaming:
+                rowParser = ninjatraderfeed.RowParser(barfeed.Frequency.MINUTE, datetime.time(23, 59, 59), timezone)
+                barFeed.addBarsFromCSV(instrument, path, rowParser)
+            else:
+                barFeed.addBarsFromCSV(instrument, path)
+        return barFeed
+
+    def __testNinjaTrader(self, timezone=None, barFilter=None):
+        expected = get_bar_values(self.__buildNinjaTraderFeed(False, timezone, barFilter))
+        self.assertTrue(len(expected) > 0)
+        for chunkSize in [333, csvfeed.STREAMING_CHUNK_SIZE]:
+            self.assertEqual(get_bar_values(self.__buildNinjaTraderFeed(True, timezone, barFilter, chunkSize)), expected)
+
+    def testBaseFeedInterface(self):
+        barFeed = self.__buildNinjaTraderFeed(True)
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testNinjaTrader(self):
+        self.__testNinjaTrader()
+        self.__testNinjaTrader(marketsession.USEquities.getTimezone())
+
+    def testNinjaTraderRTHFilter(self):
+        self.__testNinjaTrader(barFilter=csvfeed.USEquitiesRTH())
+
+    def __writeGenericFile(self, fileName, rows):
+        common.init_temp_path()
+        path = os.path.join(common.get_temp_path(), fileName)
+        with open(path, "w") as f:
+            f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+            for row in rows:
+                f.write(row + "\n")
+        return path
+
+    def testGenericManyFilesAndInstruments(self):
+        path1 = self.__writeGenericFile("generic-1.csv", [
+            "2013-03-08 23:59:00,10,12,9,11,100,10",
+            "2013-03-09 02:30:00,11,13,10,12,200,11.5",
+            "",
+            "2013-03-09 23:59:00,12,12,10,11,300,10.5",
+        ])
+        path2 = self.__writeGenericFile("generic-2.csv", [
+            "2013-03-10 23:59:00,12,12,10,11,300,10.5",
+        ])
+        path3 = self.__writeGenericFile("generic-3.csv", [
+            "2013-03-09 02:30:00,11,13,10,12,200,11.5",
+            "2013-03-10 23:59:00,12,12,10,11,300,10.5",
+        ])
+
+        barFeed = csvfeed.GenericBarFeed(barfeed.Frequency.MINUTE)
+        barFeed.addBarsFromCSV("spy", path1)
+        barFeed.addBarsFromCSV("spy", path2)
+        barFeed.addBarsFromCSV("ige", path3)
+        expected = get_bar_values(barFeed)
+        self.assertEqual(len(expected), 6)
+
+        for chunkSize in [1, 2, 100]:
+            barFeed = csvfeed.StreamingBarFeed(barfeed.Frequency.MINUTE, chunkSize)
+            barFeed.addBarsFromCSV("spy", path1, csvfeed.GenericRowParser(None))
+            barFeed.addBarsFromCSV("spy", path2, csvfeed.GenericRowParser(None))
+            barFeed.addBarsFromCSV("ige", path3, csvfeed.GenericRowParser(None))
+            self.assertTrue(barFeed.barsHaveAdjClose())
+            self.assertEqual(get_bar_values(barFeed), expected)
+
+    def testUnsortedBars(self):
+        barFeed = csvfeed.StreamingBarFeed(barfeed.Frequency.DAY)
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), yahoofeed.RowParser(datetime.time(23, 59, 59)))
+        with self.assertRaisesRegexp(Exception, "Bars for orcl are not sorted by datetime"):
+            get_bar_values(barFeed)
+
+    def testAddBarsAfterStart(self):
+        barFeed = csvfeed.StreamingBarFeed(barfeed.Frequency.DAY)
+        barFeed.start()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), yahoofeed.RowParser(datetime.time(23, 59, 59)))
+        barFeed.stop()
+
+
+class ParallelLoadingTestCase(unittest.TestCase):
+    def __getYahooFiles(self):
+        return [
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+            ("nikkei", common.get_data_file_path("nikkei-2011-yahoofinance.csv")),
+        ]
+
+    def __testYahoo(self, timezone=None, barFilter=None):
+        def buildFeed(parallel):
+            barFeed = yahoofeed.Feed()
+            if barFilter is not None:
+                barFeed.setBarFilter(barFilter)
+            return add_bars_from_csvs(barFeed, self.__getYahooFiles(), parallel, timezone)
+        assert_same_bars(self, buildFeed)
+
+    def testYahoo(self):
+        self.__testYahoo()
+        self.__testYahoo(marketsession.USEquities.getTimezone())
+
+    def testYahooDateRangeFilter(self):
+        self.__testYahoo(barFilter=csvfeed.DateRangeFilter(datetime.datetime(2011, 3, 1), datetime.datetime(2011, 6, 5)))
+
+    def testWithCache(self):
+        common.init_temp_path()
+        cacheDir = os.path.join(common.get_temp_path(), "parallel-cache")
+        if os.path.exists(cacheDir):
+            shutil.rmtree(cacheDir)
+        os.mkdir(cacheDir)
+
+        expected = get_bar_values(add_bars_from_csvs(yahoofeed.Feed(), self.__getYahooFiles()))
+        # The first time the cache files get written by the workers, and then they get read.
+        for i in xrange(2):
+            barFeed = yahoofeed.Feed()
+            barFeed.setUseCache(True, cacheDir)
+            add_bars_from_csvs(barFeed, self.__getYahooFiles(), True)
+            self.assertEqual(get_bar_values(barFeed), expected)
+            self.assertEqual(len(glob.glob(os.path.join(cacheDir, "*" + barcache.CACHE_FILE_EXTENSION))), 3)
+
+    def testManyFilesPerInstrument(self):
+        files = [
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+        ]
+        assert_same_bars(self, lambda parallel: add_bars_from_csvs(yahoofeed.Feed(), files, parallel))
+
+    def testNinjaTrader(self):
+        files = [
+            ("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv")),
+            ("qqq", common.get_data_file_path("nt-spy-minute-2011-03.csv")),
+        ]
+        assert_same_bars(self, lambda parallel: add_bars_from_csvs(ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE), files, parallel))
+
+    def testGenericBarFeed(self):
+        common.init_temp_path()
+        path = os.path.join(common.get_temp_path(), "generic.csv")
+        with open(path, "w") as f:
+            f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+            f.write("2013-03-09 23:59:00,10,12,9,11,100,\n")
+            f.write("2013-03-10 23:59:00,12,12,10,11,300,10.5\n")
+        files = [("spy", path), ("ige", path)]
+        assert_same_bars(self, lambda parallel: add_bars_from_csvs(csvfeed.GenericBarFeed(barfeed.Frequency.DAY), files, parallel))
+
+        barFeed = add_bars_from_csvs(csvfeed.GenericBarFeed(barfeed.Frequency.DAY), files, True)
+        self.assertTrue(barFeed.barsHaveAdjClose())
+        self.assertEqual(sorted(barFeed.getRegisteredInstruments()), ["ige", "spy"])
+
+
+class CompactBarsTestCase(unittest.TestCase):
+    def __assertCompactBars(self, buildFeed):
+        assert_same_bars(self, buildFeed)
+        for dateTime, bars in buildFeed(True):
+            for instrument in bars.keys():
+                self.assertTrue(isinstance(bars[instrument], columnar.BarView))
+
+    def testYahoo(self):
+        for useBulkLoading in [False, True]:
+            for timezone in [None, marketsession.USEquities.getTimezone()]:
+                def buildFeed(useCompactBars):
+                    barFeed = yahoofeed.Feed(timezone)
+                    barFeed.setUseCompactBars(useCompactBars)
+                    barFeed.setUseBulkLoading(useBulkLoading)
+                    return add_bars_from_csvs(barFeed, YAHOO_FILES)
+                self.__assertCompactBars(buildFeed)
+
+    def testNinjaTrader(self):
+        for timezone in [None, marketsession.USEquities.getTimezone()]:
+            def buildFeed(useCompactBars):
+                barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, timezone)
+                barFeed.setUseCompactBars(useCompactBars)
+                barFeed.setBarFilter(csvfeed.USEquitiesRTH())
+                barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+                return barFeed
+            self.__assertCompactBars(buildFeed)
+
+    def testFromBars(self):
+        barFeed = yahoofeed.Feed(marketsession.USEquities.getTimezone())
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        bars = [bars["orcl"] for dateTime, bars in barFeed]
+        barColumns = columnar.from_bars(bars)
+        self.assertEqual(len(barColumns), len(bars))
+        for i in xrange(len(bars)):
+            self.assertEqual(barColumns.getDateTime(i), bars[i].getDateTime())
+            self.assertEqual(barColumns.getView(i).getClose(), bars[i].getClose())
+            self.assertEqual(barColumns.getView(i).getAdjClose(), bars[i].getAdjClose())
+
+        # Naive and localized datetimes can't be mixed.
+        naiveBar = yahoofeed.Feed()
+        naiveBar.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+        self.assertEqual(columnar.from_bars(bars + [bars_["orcl"] for dateTime, bars_ in naiveBar]), None)
+
+    def testBarView(self):
+        barColumns = columnar.BarColumns(
+            columnar.parse_datetimes(["2013-01-01", "2013-01-02"], "%Y-%m-%d"),
+            [10, 10], [11, 12], [9, 9], [10, 12], [1, 2], [9.5, float("nan")]
+        )
+        barView = barColumns.getView(1)
+        self.assertEqual(barView.getDateTime(), datetime.datetime(2013, 1, 2))
+        self.assertEqual(barView.getHigh(), 12)
+        self.assertEqual(barView.getVolume(), 2)
+        self.assertEqual(barView.getAdjClose(), None)
+        self.assertEqual(barColumns.getView(0).getAdjOpen(), 9.5)
+        self.assertEqual(barView.getSessionClose(), False)
+        self.assertEqual(barView.getBarsTillSessionClose(), None)
+
+        # Session attributes are written into the columns.
+        barView.setSessionClose(True)
+        self.assertEqual(barColumns.getView(1).getSessionClose(), True)
+        self.assertEqual(barColumns.getView(1).getBarsTillSessionClose(), 0)
+        self.assertEqual(barColumns[1].getBarsTillSessionClose(), 0)
+        barColumns.getView(0).setBarsTillSessionClose(1)
+        self.assertEqual(barColumns.getView(0).getBarsTillSessionClose(), 1)
+        self.assertEqual(barColumns.getView(0).getSessionClose(), False)
+        # Minute and second bars can have many bars per session.
+        barColumns.getView(0).setBarsTillSessionClose(23400)
+        self.assertEqual(barColumns.getView(0).getBarsTillSessionClose(), 23400)
+        with self.assertRaises(Exception):
+            barView.setBarsTillSessionClose(2**31)
+
+        barView = pickle.loads(pickle.dumps(barView))
+        self.assertEqual(barView.getDateTime(), datetime.datetime(2013, 1, 2))
+        self.assertEqual(barView.getSessionClose(), True)
@@ -20,11 +20,19 @@
 
 import unittest
 import datetime
+import os
+import multiprocessing
+
+import numpy
+import pytz
 
 from pyalgotrade import dataseries
 from pyalgotrade.dataseries import bards
 from pyalgotrade.dataseries import aligned
+from pyalgotrade.dataseries import spill
+from pyalgotrade.dataseries import shared
 from pyalgotrade import bar
+import common
 
 
 class TestSequenceDataSeries(unittest.TestCase):
@@ -140,6 +148,102 @@ class TestSequenceDataSeries(unittest.TestCase):
         self.assertEqual(ds[-1], 99)
 
 
+class TestNumericDataSeries(unittest.TestCase):
+    def testEmpty(self):
+        ds = dataseries.NumericDataSeries()
+        self.assertEqual(len(ds), 0)
+        self.assertEqual(len(ds.asArray()), 0)
+        with self.assertRaises(IndexError):
+            ds[-1]
+        with self.assertRaises(IndexError):
+            ds[0]
+
+    def testNonEmpty(self):
+        ds = dataseries.NumericDataSeries()
+        for value in range(10):
+            ds.append(value)
+        self.assertEqual(len(ds), 10)
+        self.assertEqual(ds[-1], 9)
+        self.assertEqual(ds[0], 0)
+        self.assertEqual(ds[-2:], [8, 9])
+        self.assertEqual(ds.getDateTimes(), [None] * 10)
+        self.assertEqual(ds.asArray().dtype, numpy.float64)
+        self.assertEqual(ds.asArray(-3).tolist(), [7, 8, 9])
+        self.assertEqual(ds.asArray(2, 4).tolist(), [2, 3])
+
+    def testNone(self):
+        ds = dataseries.NumericDataSeries()
+        ds.append(None)
+        ds.append(1)
+        self.assertEqual(ds[0], None)
+        self.assertEqual(ds[1], 1)
+        self.assertTrue(numpy.isnan(ds.asArray()[0]))
+
+    def testBounded(self):
+        ds = dataseries.NumericDataSeries(maxLen=3)
+        for i in xrange(100):
+            ds.append(i)
+            self.assertEqual(ds[-1], i)
+        self.assertEqual(len(ds), 3)
+        self.assertEqual(ds[:], [97, 98, 99])
+
+    def testResize(self):
+        ds = dataseries.NumericDataSeries(100)
+        for i in xrange(100):
+            ds.append(i)
+
+        ds.setMaxLen(2)
+        self.assertEqual(len(ds), 2)
+        self.assertEqual(len(ds.getDateTimes()), 2)
+        self.assertEqual(ds[0], 98)
+        self.assertEqual(ds[1], 99)
+
+        ds.setMaxLen(10)
+        ds.append(100)
+        self.assertEqual(ds[:], [98, 99, 100])
+
+    def testDtype(self):
+        ds = dataseries.NumericDataSeries(dtype=numpy.int32)
+        ds.append(1)
+        ds.append(2)
+        self.assertEqual(ds.asArray().dtype, numpy.int32)
+        self.assertEqual(ds[:], [1, 2])
+        self.assertEqual(type(ds[-1]), int)
+
+    def testPythonValues(self):
+        ds = dataseries.NumericDataSeries()
+        ds.append(1)
+        ds.append(None)
+        self.assertEqual(type(ds[0]), float)
+        self.assertEqual(type(ds.getValueAbsolute(0)), float)
+        self.assertEqual([type(value) for value in ds[:]], [float, type(None)])
+
+    def testDateTimes(self):
+        ds = dataseries.NumericDataSeries()
+        tz = pytz.timezone("US/Eastern")
+        dateTimes = [tz.localize(datetime.datetime(2013, 3, day, 16)) for day in (8, 11, 12)]
+        for i in xrange(len(dateTimes)):
+            ds.appendWithDateTime(dateTimes[i], i)
+        # The datetimes should come back localized, even across a DST change.
+        for i in xrange(len(dateTimes)):
+            self.assertEqual(ds.getDateTimes()[i], dateTimes[i])
+            self.assertEqual(ds.getDateTimes()[i].time(), datetime.time(16))
+        self.assertEqual(ds.asTimestampArray().dtype, numpy.int64)
+        self.assertEqual(ds.asTimestampArray()[2] - ds.asTimestampArray()[1], 24 * 3600 * 1000000)
+
+        # Adding the same datetime twice, or a previous datetime, should fail.
+        self.assertRaises(Exception, ds.appendWithDateTime, dateTimes[-1], 0)
+        self.assertRaises(Exception, ds.appendWithDateTime, dateTimes[0], 0)
+
+    def testNewValueEvent(self):
+        values = []
+        ds = dataseries.NumericDataSeries()
+        ds.getNewValueEvent().subscribe(lambda ds, dateTime, value: values.append(value))
+        ds.append(1)
+        ds.append(None)
+        self.assertEqual(values, [1, None])
+
+
 class TestBarDataSeries(unittest.TestCase):
     def testEmpty(self):
         ds = bards.BarDataSeries()
@@ -184,6 +288,28 @@ class TestBarDataSeries(unittest.TestCase):
         self.__testGetValue(ds.getVolumeDataSeries(), 10, 10)
         self.__testGetValue(ds.getAdjCloseDataSeries(), 10, 3)
 
+    def testLazyNestedDataSeries(self):
+        ds = bards.BarDataSeries(maxLen=5)
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in range(10):
+            ds.append(bar.BasicBar(firstDateTime + datetime.timedelta(seconds=i), i, i, i, i, i, i))
+
+        # The close DataSeries gets backfilled with the bars available.
+        closeDS = ds.getCloseDataSeries()
+        self.assertTrue(ds.getCloseDataSeries() is closeDS)
+        self.assertEqual(closeDS.getMaxLen(), 5)
+        self.assertEqual(closeDS[:], range(5, 10))
+        self.assertEqual(closeDS.getDateTimes(), ds.getDateTimes())
+
+        # And from now on it gets updated as new bars are added.
+        ds.append(bar.BasicBar(firstDateTime + datetime.timedelta(seconds=10), 10, 10, 10, 10, 10, 10))
+        self.assertEqual(closeDS[:], range(6, 11))
+        self.assertEqual(closeDS.getDateTimes(), ds.getDateTimes())
+        self.assertEqual(ds.getOpenDataSeries()[:], range(6, 11))
+
+        ds.setMaxLen(2)
+        self.assertEqual(closeDS[:], [9, 10])
+
     def testSeqLikeOps(self):
         seq = []
         ds = bards.BarDataSeries()
@@ -209,6 +335,466 @@ class TestBarDataSeries(unittest.TestCase):
             self.assertEqual(ds.getDateTimes()[i], firstDt + datetime.timedelta(seconds=i))
 
 
+class TestColumnarBarDataSeries(unittest.TestCase):
+    def testEmpty(self):
+        ds = bards.ColumnarBarDataSeries()
+        self.assertEqual(len(ds), 0)
+        self.assertEqual(len(ds.getCloseDataSeries()), 0)
+        with self.assertRaises(IndexError):
+            ds[-1]
+        with self.assertRaises(IndexError):
+            ds.getCloseDataSeries()[0]
+
+    def testAppendInvalidDatetime(self):
+        ds = bards.ColumnarBarDataSeries()
+        now = datetime.datetime.now()
+        ds.append(bar.BasicBar(now, 0, 0, 0, 0, 0, 0))
+        self.assertRaises(Exception, ds.append, bar.BasicBar(now, 0, 0, 0, 0, 0, 0))
+        self.assertRaises(Exception, ds.append, bar.BasicBar(now - datetime.timedelta(seconds=1), 0, 0, 0, 0, 0, 0))
+
+    def testSameAsBarDataSeries(self):
+        ds = bards.BarDataSeries()
+        columnarDS = bards.ColumnarBarDataSeries()
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in range(10):
+            bar_ = bar.BasicBar(firstDateTime + datetime.timedelta(minutes=i), i+2, i+4, i+1, i+3, i*10, None if i % 2 else i+3)
+            bar_.setSessionClose(i == 9)
+            if i == 8:
+                bar_.setBarsTillSessionClose(1)
+            ds.append(bar_)
+            columnarDS.append(bar_)
+
+        self.assertEqual(len(ds), len(columnarDS))
+        self.assertEqual(ds.getDateTimes(), columnarDS.getDateTimes())
+        for i in range(-10, 10):
+            self.assertEqual(ds[i].getDateTime(), columnarDS[i].getDateTime())
+            self.assertEqual(ds[i].getOpen(), columnarDS[i].getOpen())
+            self.assertEqual(ds[i].getHigh(), columnarDS[i].getHigh())
+            self.assertEqual(ds[i].getLow(), columnarDS[i].getLow())
+            self.assertEqual(ds[i].getClose(), columnarDS[i].getClose())
+            self.assertEqual(ds[i].getVolume(), columnarDS[i].getVolume())
+            self.assertEqual(ds[i].getAdjClose(), columnarDS[i].getAdjClose())
+            self.assertEqual(ds[i].getSessionClose(), columnarDS[i].getSessionClose())
+            self.assertEqual(ds[i].getBarsTillSessionClose(), columnarDS[i].getBarsTillSessionClose())
+
+        self.assertEqual(ds.getOpenDataSeries()[:], columnarDS.getOpenDataSeries()[:])
+        self.assertEqual(ds.getHighDataSeries()[:], columnarDS.getHighDataSeries()[:])
+        self.assertEqual(ds.getLowDataSeries()[:], columnarDS.getLowDataSeries()[:])
+        self.assertEqual(ds.getCloseDataSeries()[:], columnarDS.getCloseDataSeries()[:])
+        self.assertEqual(ds.getVolumeDataSeries()[:], columnarDS.getVolumeDataSeries()[:])
+        self.assertEqual(ds.getAdjCloseDataSeries()[:], columnarDS.getAdjCloseDataSeries()[:])
+        self.assertEqual(ds.getCloseDataSeries().getDateTimes(), columnarDS.getCloseDataSeries().getDateTimes())
+
+    def testColumnViews(self):
+        ds = bards.ColumnarBarDataSeries(maxLen=3)
+        closeDS = ds.getCloseDataSeries()
+        values = []
+        closeDS.getNewValueEvent().subscribe(lambda ds_, dateTime, value: values.append(value))
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in range(5):
+            ds.append(bar.BasicBar(firstDateTime + datetime.timedelta(days=i), i, i, i, i, i, i))
+        self.assertEqual(values, range(5))
+        self.assertEqual(closeDS.asArray().tolist(), [2, 3, 4])
+        self.assertEqual(closeDS.asArray(-1).tolist(), [4])
+        self.assertEqual(len(closeDS), 3)
+
+    def testColumnValueTypes(self):
+        ds = bards.ColumnarBarDataSeries()
+        ds.append(bar.BasicBar(datetime.datetime(2013, 1, 1), 1, 2, 0.5, 1.5, 100, None))
+        for columnDS in [ds.getOpenDataSeries(), ds.getCloseDataSeries(), ds.getVolumeDataSeries()]:
+            self.assertEqual(type(columnDS[-1]), float)
+            self.assertEqual(type(columnDS[:][0]), float)
+        self.assertEqual(ds.getCloseDataSeries()[-1], 1.5)
+        self.assertEqual(repr(ds.getCloseDataSeries()[-1]), "1.5")
+        self.assertEqual(ds.getAdjCloseDataSeries()[-1], None)
+
+    def testResize(self):
+        ds = bards.ColumnarBarDataSeries(10)
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in range(10):
+            ds.append(bar.BasicBar(firstDateTime + datetime.timedelta(days=i), i, i, i, i, i, i))
+        ds.setMaxLen(2)
+        self.assertEqual(len(ds), 2)
+        self.assertEqual(ds.getCloseDataSeries()[:], [8, 9])
+        self.assertEqual(ds[0].getDateTime(), firstDateTime + datetime.timedelta(days=8))
+
+
+class TestSpillDataSeries(unittest.TestCase):
+    def testEmpty(self):
+        ds = spill.SpillDataSeries()
+        self.assertEqual(len(ds), 0)
+        self.assertEqual(len(ds.getDateTimes()), 0)
+        with self.assertRaises(IndexError):
+            ds[-1]
+        ds.close()
+
+    def testUnbounded(self):
+        ds = spill.SpillDataSeries(hotLen=10)
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in xrange(105):
+            ds.appendWithDateTime(firstDateTime + datetime.timedelta(seconds=i), i)
+        self.assertEqual(len(ds), 105)
+        self.assertEqual(ds.getSpilledCount(), 100)
+        self.assertEqual(ds.getMaxLen(), None)
+        self.assertEqual(ds[0], 0)
+        self.assertEqual(ds[-1], 104)
+        self.assertEqual(ds[95:100], range(95, 100))
+        self.assertEqual(ds[:], range(105))
+        self.assertEqual(ds.asArray(98, 102).tolist(), range(98, 102))
+        self.assertEqual(ds.asArray(-2).tolist(), [103, 104])
+
+        dateTimes = ds.getDateTimes()
+        self.assertEqual(len(dateTimes), 105)
+        self.assertEqual(dateTimes[0], firstDateTime)
+        self.assertEqual(dateTimes[-1], firstDateTime + datetime.timedelta(seconds=104))
+        self.assertEqual(dateTimes[1:3], [firstDateTime + datetime.timedelta(seconds=i) for i in (1, 2)])
+        self.assertEqual(dateTimes, [firstDateTime + datetime.timedelta(seconds=i) for i in xrange(105)])
+
+        self.assertRaises(Exception, ds.appendWithDateTime, firstDateTime, 0)
+        ds.close()
+
+    def testNoneAndEvents(self):
+        values = []
+        ds = spill.SpillDataSeries(hotLen=2)
+        ds.getNewValueEvent().subscribe(lambda ds, dateTime, value: values.append(value))
+        for value in [1, None, 3, None, 5]:
+            ds.append(value)
+        self.assertEqual(values, [1, None, 3, None, 5])
+        self.assertEqual(ds[:], [1, None, 3, None, 5])
+        self.assertEqual(ds.getDateTimes()[:], [None] * 5)
+        ds.close()
+
+    def testOlderDateTimeAfterNone(self):
+        ds = spill.SpillDataSeries(hotLen=2)
+        ds.appendWithDateTime(datetime.datetime(2013, 1, 2), 1)
+        ds.appendWithDateTime(None, 2)
+        self.assertRaises(Exception, ds.appendWithDateTime, datetime.datetime(2013, 1, 1), 3)
+        ds.appendWithDateTime(datetime.datetime(2013, 1, 3), 3)
+        self.assertEqual(ds[:], [1, 2, 3])
+        ds.close()
+
+    def testWithPath(self):
+        common.init_temp_path()
+        path = os.path.join(common.get_temp_path(), "spill_test")
+        ds = spill.SpillDataSeries(hotLen=3, path=path)
+        for i in xrange(10):
+            ds.append(i)
+        self.assertTrue(os.path.exists(path + ".values"))
+        self.assertEqual(ds[:], range(10))
+        ds.close()
+        os.remove(path + ".values")
+        os.remove(path + ".timestamps")
+
+
+class TestDateTimeLookup(unittest.TestCase):
+    def __fill(self, ds, appendFun=None):
+        # Values for even seconds only.
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in xrange(0, 20, 2):
+            dateTime = firstDateTime + datetime.timedelta(seconds=i)
+            if appendFun is None:
+                ds.appendWithDateTime(dateTime, i)
+            else:
+                appendFun(dateTime, i)
+        return firstDateTime
+
+    def __testLookup(self, ds, appendFun=None):
+        self.assertEqual(ds.indexOf(datetime.datetime(2013, 1, 1)), None)
+        self.assertEqual(ds.getValueAt(datetime.datetime(2013, 1, 1)), None)
+        self.assertEqual(ds.sliceByTime(), [])
+
+        firstDateTime = self.__fill(ds, appendFun)
+        seconds = lambda i: firstDateTime + datetime.timedelta(seconds=i)
+
+        self.assertEqual(ds.indexOf(seconds(0)), 0)
+        self.assertEqual(ds.indexOf(seconds(18)), 9)
+        self.assertEqual(ds.indexOf(seconds(8)), 4)
+        self.assertEqual(ds.indexOf(seconds(7)), None)
+        self.assertEqual(ds.indexOf(seconds(-1)), None)
+        self.assertEqual(ds.indexOf(seconds(19)), None)
+
+        self.assertEqual(ds.getValueAt(seconds(-1)), None)
+        self.assertEqual(ds.getValueAt(seconds(0)), 0)
+        self.assertEqual(ds.getValueAt(seconds(1)), 0)
+        self.assertEqual(ds.getValueAt(seconds(9)), 8)
+        self.assertEqual(ds.getValueAt(seconds(100)), 18)
+
+        self.assertEqual(ds.sliceByTime(), range(0, 20, 2))
+        self.assertEqual(ds.sliceByTime(seconds(3), seconds(8)), [4, 6, 8])
+        self.assertEqual(ds.sliceByTime(seconds(4), seconds(7)), [4, 6])
+        self.assertEqual(ds.sliceByTime(seconds(15)), [16, 18])
+        self.assertEqual(ds.sliceByTime(None, seconds(2)), [0, 2])
+        self.assertEqual(ds.sliceByTime(seconds(5), seconds(5)), [])
+
+    def testSequenceDataSeries(self):
+        self.__testLookup(dataseries.SequenceDataSeries())
+
+    def testBoundedSequenceDataSeries(self):
+        ds = dataseries.SequenceDataSeries(maxLen=3)
+        firstDateTime = self.__fill(ds)
+        self.assertEqual(ds.indexOf(firstDateTime), None)
+        self.assertEqual(ds.indexOf(firstDateTime + datetime.timedelta(seconds=14)), 0)
+        self.assertEqual(ds.getValueAt(firstDateTime + datetime.timedelta(seconds=15)), 14)
+
+    def testNumericDataSeries(self):
+        self.__testLookup(dataseries.NumericDataSeries())
+
+    def testSpillDataSeries(self):
+        ds = spill.SpillDataSeries(hotLen=3)
+        self.__testLookup(ds)
+        ds.close()
+
+    def testColumnarBarDataSeries(self):
+        ds = bards.ColumnarBarDataSeries()
+        appendFun = lambda dateTime, value: ds.append(bar.BasicBar(dateTime, value, value, value, value, value, value))
+        self.__testLookup(ds.getCloseDataSeries(), appendFun)
+
+    def testBarDataSeries(self):
+        ds = bards.BarDataSeries()
+        appendFun = lambda dateTime, value: ds.append(bar.BasicBar(dateTime, value, value, value, value, value, value))
+        self.__testLookup(ds.getCloseDataSeries(), appendFun)
+
+
+class TestExtend(unittest.TestCase):
+    def __buildValues(self, count, offset=0):
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        dateTimes = [firstDateTime + datetime.timedelta(seconds=i + offset) for i in xrange(count)]
+        values = [i + offset for i in xrange(count)]
+        return dateTimes, values
+
+    def __testExtend(self, ds):
+        batches = []
+        ds.getNewValuesBatchEvent().subscribe(lambda ds_, dateTimes, values: batches.append(values))
+
+        dateTimes, values = self.__buildValues(5)
+        ds.extend(dateTimes, values)
+        self.assertEqual(ds[:], values[-ds.getMaxLen():])
+        self.assertEqual(ds.getDateTimes(), dateTimes[-ds.getMaxLen():])
+        self.assertEqual(batches, [values])
+
+        # Datetimes must be in order, within the batch and with respect to the previous values.
+        self.assertRaises(Exception, ds.extend, dateTimes[-1:], [1])
+        self.assertRaises(Exception, ds.extend, list(reversed(self.__buildValues(2, 10)[0])), [1, 2])
+        self.assertRaises(Exception, ds.extend, dateTimes, [1])
+
+        newDateTimes, newValues = self.__buildValues(3, 5)
+        ds.extend(newDateTimes, newValues)
+        self.assertEqual(ds[:], (values + newValues)[-ds.getMaxLen():])
+        self.assertEqual(ds.getDateTimes(), (dateTimes + newDateTimes)[-ds.getMaxLen():])
+
+    def __testExtendWithSubscribers(self, ds):
+        received = []
+        ds.getNewValueEvent().subscribe(lambda ds_, dateTime, value: received.append((dateTime, value)))
+        dateTimes, values = self.__buildValues(5)
+        ds.extend(dateTimes, values)
+        self.assertEqual(received, zip(dateTimes, values))
+
+    def testSequenceDataSeries(self):
+        self.__testExtend(dataseries.SequenceDataSeries())
+        self.__testExtend(dataseries.SequenceDataSeries(maxLen=4))
+        self.__testExtendWithSubscribers(dataseries.SequenceDataSeries())
+
+    def testNumericDataSeries(self):
+        self.__testExtend(dataseries.NumericDataSeries())
+        self.__testExtend(dataseries.NumericDataSeries(maxLen=4))
+        self.__testExtendWithSubscribers(dataseries.NumericDataSeries())
+
+    def testNone(self):
+        for ds in (dataseries.SequenceDataSeries(), dataseries.NumericDataSeries()):
+            ds.extend([None, None], [1, None])
+            self.assertEqual(ds[:], [1, None])
+            self.assertEqual(ds.getDateTimes(), [None, None])
+
+    def testBarDataSeries(self):
+        for barDS in (bards.BarDataSeries(3), bards.ColumnarBarDataSeries(3)):
+            closeDS = barDS.getCloseDataSeries()
+            dateTimes, values = self.__buildValues(5)
+            bars = [bar.BasicBar(dateTimes[i], values[i], values[i], values[i], values[i], values[i], None) for i in xrange(len(values))]
+            barDS.extend(dateTimes, bars)
+            self.assertEqual(len(barDS), 3)
+            self.assertEqual(barDS[-1].getClose(), 4)
+            self.assertEqual(barDS[-1].getAdjClose(), None)
+            self.assertEqual(barDS.getDateTimes(), dateTimes[-3:])
+            self.assertEqual(closeDS[:], [2, 3, 4])
+            self.assertEqual(barDS.getOpenDataSeries()[:], [2, 3, 4])
+
+    def testBarDataSeriesWithSubscribers(self):
+        # Handlers should see the child DataSeries just like when bars are appended one at a time.
+        received = []
+        for extend in [False, True]:
+            barDS = bards.BarDataSeries()
+            closeDS = barDS.getCloseDataSeries()
+            seen = []
+            barDS.getNewValueEvent().subscribe(lambda ds_, dateTime, value: seen.append((value.getClose(), closeDS[:])))
+            dateTimes, values = self.__buildValues(5)
+            bars = [bar.BasicBar(dateTimes[i], values[i], values[i], values[i], values[i], values[i], None) for i in xrange(len(values))]
+            if extend:
+                barDS.extend(dateTimes, bars)
+            else:
+                for bar_ in bars:
+                    barDS.append(bar_)
+            self.assertEqual(closeDS[:], values)
+            received.append(seen)
+        self.assertEqual(received[0], received[1])
+
+    def testColumnarBarDataSeriesWithSubscribers(self):
+        barDS = bards.ColumnarBarDataSeries()
+        received = []
+        barDS.getCloseDataSeries().getNewValueEvent().subscribe(lambda ds_, dateTime, value: received.append(value))
+        dateTimes, values = self.__buildValues(5)
+        barDS.extend(dateTimes, [bar.BasicBar(dateTimes[i], values[i], values[i], values[i], values[i], values[i], None) for i in xrange(len(values))])
+        self.assertEqual(received, values)
+
+
+class TestAsArray(unittest.TestCase):
+    def testSequenceDataSeries(self):
+        ds = dataseries.SequenceDataSeries()
+        self.assertEqual(len(ds.asArray()), 0)
+        for value in [1, None, 3, 4]:
+            ds.append(value)
+        values = ds.asArray()
+        self.assertEqual(values.dtype, numpy.float64)
+        self.assertEqual(values[0], 1)
+        self.assertTrue(numpy.isnan(values[1]))
+        self.assertEqual(ds.asArray(-2).tolist(), [3, 4])
+        self.assertEqual(ds.asArray(-10).tolist()[2:], [3, 4])
+
+    def testViews(self):
+        barDS = bards.ColumnarBarDataSeries()
+        numericDS = dataseries.NumericDataSeries()
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        for i in range(10):
+            barDS.append(bar.BasicBar(firstDateTime + datetime.timedelta(days=i), i, i, i, i, i, i))
+            numericDS.append(i)
+
+        for ds in (barDS.getCloseDataSeries(), numericDS):
+            values = ds.asArray(-5)
+            self.assertEqual(values.tolist(), range(5, 10))
+            self.assertTrue(values.flags["C_CONTIGUOUS"])
+            # No copies should be made.
+            self.assertTrue(numpy.may_share_memory(values, ds.asArray()))
+
+
+class TestNewValueSubscribers(unittest.TestCase):
+    def __testSubscribers(self, ds, values):
+        now = datetime.datetime(2013, 1, 1)
+        self.assertFalse(ds.hasNewValueSubscribers())
+        ds.appendWithDateTime(now, values[0])
+        # Getting the event doesn't mean there are subscribers.
+        event = ds.getNewValueEvent()
+        self.assertFalse(ds.hasNewValueSubscribers())
+
+        received = []
+        handler = lambda ds_, dateTime, value: received.append(value)
+        event.subscribe(handler)
+        self.assertTrue(ds.hasNewValueSubscribers())
+        ds.appendWithDateTime(now + datetime.timedelta(seconds=1), values[1])
+        self.assertEqual(received, [values[1]])
+
+        event.unsubscribe(handler)
+        self.assertFalse(ds.hasNewValueSubscribers())
+        ds.appendWithDateTime(now + datetime.timedelta(seconds=2), values[2])
+        self.assertEqual(received, [values[1]])
+        self.assertEqual(len(ds), 3)
+
+    def testDataSeries(self):
+        self.__testSubscribers(dataseries.SequenceDataSeries(), [1, 2, 3])
+        self.__testSubscribers(dataseries.NumericDataSeries(), [1, 2, 3])
+        ds = spill.SpillDataSeries(2)
+        self.__testSubscribers(ds, [1, 2, 3])
+        ds.close()
+
+    def testBarDataSeries(self):
+        now = datetime.datetime(2013, 1, 1)
+        bars = [bar.BasicBar(now + datetime.timedelta(seconds=i), i, i, i, i, i, None) for i in xrange(3)]
+        self.__testSubscribers(bards.BarDataSeries(), bars)
+        self.__testSubscribers(bards.ColumnarBarDataSeries(), bars)
+        for barDS in (bards.BarDataSeries(), bards.ColumnarBarDataSeries()):
+            closeDS = barDS.getCloseDataSeries()
+            self.assertFalse(closeDS.hasNewValueSubscribers())
+            received = []
+            closeDS.getNewValueEvent().subscribe(lambda ds_, dateTime, value: received.append(value))
+            self.assertTrue(closeDS.hasNewValueSubscribers())
+            for bar_ in bars:
+                barDS.append(bar_)
+            self.assertEqual(received, [0, 1, 2])
+
+
+class TestSharedDataSeries(unittest.TestCase):
+    def setUp(self):
+        common.init_temp_path()
+        self.__path = os.path.join(common.get_temp_path(), "shared_test")
+
+    def tearDown(self):
+        os.remove(self.__path)
+
+    def testSameProcess(self):
+        writer = shared.SharedDataSeries(self.__path, maxLen=5)
+        reader = shared.SharedDataSeriesReader(self.__path)
+        received = []
+        reader.getNewValueEvent().subscribe(lambda ds, dateTime, value: received.append((dateTime, value)))
+
+        self.assertEqual(reader.getMaxLen(), 5)
+        self.assertEqual(reader.poll(), 0)
+
+        firstDateTime = datetime.datetime(2013, 1, 1)
+        writer.appendWithDateTime(firstDateTime, 1)
+        writer.append(None)
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(reader.poll(), 2)
+        self.assertEqual(received, [(firstDateTime, 1), (None, None)])
+        self.assertEqual(reader[:], [1, None])
+        self.assertEqual(reader.poll(), 0)
+
+        # The reader falls behind and only the last 5 values are available.
+        writer.extend([firstDateTime + datetime.timedelta(seconds=i) for i in xrange(1, 9)], range(1, 9))
+        self.assertEqual(reader.poll(), 5)
+        self.assertEqual(reader[:], range(4, 9))
+        self.assertEqual(reader.getDateTimes()[-1], firstDateTime + datetime.timedelta(seconds=8))
+        self.assertEqual(writer[:], reader[:])
+
+        reader.close()
+        writer.close()
+
+    def testWriterDiedWhileWriting(self):
+        writer = shared.SharedDataSeries(self.__path, maxLen=5)
+        writer.append(1)
+        reader = shared.SharedDataSeriesReader(self.__path)
+        self.assertEqual(reader.poll(), 1)
+
+        # Leave the version odd, as if the writer died in the middle of an update.
+        header = numpy.memmap(self.__path, dtype=numpy.int64, mode="r+", shape=(shared.HEADER_LEN,))
+        header[shared.HEADER_VERSION] += 1
+        header.flush()
+        readAttempts = shared.READ_ATTEMPTS
+        shared.READ_ATTEMPTS = shared.READ_SPIN_ATTEMPTS + 10
+        try:
+            with self.assertRaisesRegexp(Exception, "Timed out waiting for the writer"):
+                reader.poll()
+        finally:
+            shared.READ_ATTEMPTS = readAttempts
+        del header
+
+        reader.close()
+        writer.close()
+
+    def testOtherProcess(self):
+        process = multiprocessing.Process(target=shared_ds_writer, args=(self.__path,))
+        process.start()
+        process.join()
+        reader = shared.SharedDataSeriesReader(self.__path)
+        self.assertEqual(reader.poll(), 10)
+        self.assertEqual(reader[:], range(10))
+        reader.close()
+
+
+def shared_ds_writer(path):
+    writer = shared.SharedDataSeries(path, maxLen=100)
+    for i in xrange(10):
+        writer.append(i)
+    writer.close()
+
+
 class TestDateAlignedDataSeries(unittest.TestCase):
     def testNotAligned(self):
         size = 20
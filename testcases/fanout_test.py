@@ -0,0 +1,131 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import unittest
+import os
+
+from pyalgotrade import strategy
+from pyalgotrade.strategy import fanout
+from pyalgotrade.barfeed import yahoofeed
+import common
+import smacrossover_strategy_test
+
+
+def build_feed():
+    feed = yahoofeed.Feed()
+    feed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+    return feed
+
+
+class FailingStrategy(strategy.BacktestingStrategy):
+    def onBars(self, bars):
+        raise Exception("onBars failed")
+
+
+# Stops after a given number of bars. The result is the number of bars processed and the process id.
+class StoppingStrategy(strategy.BacktestingStrategy):
+    def __init__(self, feed, stopAfter):
+        strategy.BacktestingStrategy.__init__(self, feed)
+        self.__stopAfter = stopAfter
+        self.__count = 0
+
+    def onBars(self, bars):
+        self.__count += 1
+        if self.__count == self.__stopAfter:
+            self.stop()
+
+    def getResult(self):
+        return (self.__count, os.getpid())
+
+
+class FanOutDispatcherTestCase(unittest.TestCase):
+    Parameters = [
+        (smacrossover_strategy_test.MarketOrderStrategy, 10, 25),
+        (smacrossover_strategy_test.LimitOrderStrategy, 10, 25),
+        (smacrossover_strategy_test.MarketOrderStrategy, 5, 20),
+        (smacrossover_strategy_test.LimitOrderStrategy, 15, 30),
+        (smacrossover_strategy_test.MarketOrderStrategy, 20, 40),
+    ]
+
+    def __runStandalone(self, strategyClass, fastSMA, slowSMA):
+        myStrategy = strategyClass(build_feed(), fastSMA, slowSMA)
+        myStrategy.run()
+        return round(myStrategy.getFinalValue(), 2)
+
+    def __runFanOut(self, workerCount):
+        dispatcher = fanout.FanOutDispatcher(build_feed(), workerCount)
+        for strategyClass, fastSMA, slowSMA in FanOutDispatcherTestCase.Parameters:
+            dispatcher.addStrategy(strategyClass(dispatcher.createFeed(), fastSMA, slowSMA))
+        dispatcher.run()
+        return [round(result, 2) for result in dispatcher.getResults()]
+
+    def testSameResultsAsStandalone(self):
+        expected = [self.__runStandalone(*parameters) for parameters in FanOutDispatcherTestCase.Parameters]
+        self.assertEqual(expected[0], 1000 - 22.7)
+        self.assertEqual(expected[1], 1000 + 32.7)
+        for workerCount in [1, 2, 3, 8]:
+            self.assertEqual(self.__runFanOut(workerCount), expected)
+
+    def testErrorsArePropagated(self):
+        dispatcher = fanout.FanOutDispatcher(build_feed(), 2)
+        dispatcher.addStrategy(smacrossover_strategy_test.MarketOrderStrategy(dispatcher.createFeed(), 10, 25))
+        dispatcher.addStrategy(FailingStrategy(dispatcher.createFeed()))
+        with self.assertRaisesRegexp(Exception, "onBars failed"):
+            dispatcher.run()
+
+    def testInvalidStrategies(self):
+        dispatcher = fanout.FanOutDispatcher(build_feed())
+        with self.assertRaises(Exception):
+            dispatcher.run()
+        with self.assertRaises(Exception):
+            dispatcher.addStrategy(FailingStrategy(build_feed()))
+        otherDispatcher = fanout.FanOutDispatcher(build_feed())
+        with self.assertRaises(Exception):
+            dispatcher.addStrategy(FailingStrategy(otherDispatcher.createFeed()))
+        myStrategy = FailingStrategy(dispatcher.createFeed())
+        dispatcher.addStrategy(myStrategy)
+        with self.assertRaises(Exception):
+            dispatcher.addStrategy(myStrategy)
+
+    def testDefaultsToCallingThread(self):
+        dispatcher = fanout.FanOutDispatcher(build_feed())
+        self.assertEqual(dispatcher.getWorkerCount(), 1)
+
+    def testWorkerProcesses(self):
+        barFeed = build_feed()
+        dispatcher = fanout.FanOutDispatcher(barFeed, 2)
+        for i in xrange(3):
+            dispatcher.addStrategy(StoppingStrategy(dispatcher.createFeed(), 0))
+        dispatcher.run()
+        results = dispatcher.getResults()
+        self.assertEqual([count for count, pid in results], [len(barFeed["orcl"])] * 3)
+        # Strategies are spread round-robin across the worker processes.
+        pids = [pid for count, pid in results]
+        self.assertEqual(pids[0], pids[2])
+        self.assertNotEqual(pids[0], pids[1])
+        self.assertTrue(os.getpid() not in pids)
+
+    def testStop(self):
+        for workerCount in [1, 2]:
+            dispatcher = fanout.FanOutDispatcher(build_feed(), workerCount)
+            dispatcher.addStrategy(StoppingStrategy(dispatcher.createFeed(), 0))
+            dispatcher.addStrategy(StoppingStrategy(dispatcher.createFeed(), 10))
+            dispatcher.run()
+            self.assertEqual([count for count, pid in dispatcher.getResults()], [10, 10])
@@ -52,3 +52,23 @@ class MemFeedTestCase(unittest.TestCase):
         self.assertFalse("dt" in feed)
         self.assertEqual(feed["i"][0], 0)
         self.assertEqual(feed["i"][-1], 99)
+
+    def testNextValuesBatch(self):
+        values = [(datetime.datetime(2013, 1, 1) + datetime.timedelta(seconds=i), {"i": i}) for i in xrange(100)]
+        values[50][1]["j"] = 50
+
+        feed = memfeed.MemFeed()
+        feed.addValues(values)
+        feed.start()
+        self.assertEqual(feed.getNextValuesBatchAndUpdateDS(30), values[0:30])
+        self.assertEqual(feed["i"][:], range(30))
+        self.assertEqual(feed.getNextValuesBatchAndUpdateDS(100), values[30:])
+        self.assertEqual(feed.getNextValuesBatchAndUpdateDS(100), [])
+        self.assertTrue(feed.eof())
+        feed.stop()
+        feed.join()
+
+        self.assertEqual(feed["i"][:], range(100))
+        self.assertEqual(feed["i"].getDateTimes(), [dateTime for dateTime, value in values])
+        self.assertEqual(feed["j"][:], [50])
+        self.assertEqual(feed["j"].getDateTimes(), [values[50][0]])
@@ -21,8 +21,15 @@
 import unittest
 import datetime
 import copy
+import threading
+import time
+import Queue
 
 from pyalgotrade import observer
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+from pyalgotrade.barfeed import membf
+from pyalgotrade.utils import dt
 
 
 class NonRealtimeFeed(observer.Subject):
@@ -30,6 +37,7 @@ class NonRealtimeFeed(observer.Subject):
         self.__datetimes = datetimes
         self.__event = observer.Event()
         self.__priority = priority
+        self.peekCount = 0
 
     def getEvent(self):
         return self.__event
@@ -50,11 +58,15 @@ class NonRealtimeFeed(observer.Subject):
         self.__event.emit(self.__datetimes.pop(0))
 
     def peekDateTime(self):
+        self.peekCount += 1
         return self.__datetimes[0]
 
     def getDispatchPriority(self):
         return self.__priority
 
+    def getDispatchSchedule(self):
+        return [dt.datetime_to_microseconds(dateTime) for dateTime in self.__datetimes]
+
 
 class RealtimeFeed(observer.Subject):
     def __init__(self, datetimes, priority=None):
@@ -87,7 +99,66 @@ class RealtimeFeed(observer.Subject):
         return self.__priority
 
 
+# A realtime feed that gets its events from another thread.
+class ThreadedRealtimeFeed(observer.Subject):
+    def __init__(self, values, delay):
+        self.__values = values
+        self.__delay = delay
+        self.__event = observer.Event()
+        self.__queue = observer.NotifyingQueue()
+        self.__thread = threading.Thread(target=self.__threadMain)
+        self.__running = False
+        self.__wakeUp = None
+        self.dispatchCount = 0
+
+    def __threadMain(self):
+        for value in self.__values:
+            time.sleep(self.__delay)
+            self.__queue.put(value)
+        self.__running = False
+        if self.__wakeUp is not None:
+            self.__wakeUp.notify()
+
+    def getEvent(self):
+        return self.__event
+
+    def start(self):
+        self.__running = True
+        self.__thread.start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        self.__thread.join()
+
+    def eof(self):
+        return not self.__running and self.__queue.empty()
+
+    def dispatch(self):
+        self.dispatchCount += 1
+        try:
+            while True:
+                if self.__wakeUp is None:
+                    self.__event.emit(self.__queue.get(True, 0.01))
+                else:
+                    self.__event.emit(self.__queue.get(False))
+        except Queue.Empty:
+            pass
+
+    def peekDateTime(self):
+        return None
+
+    def registerWakeUp(self, wakeUp):
+        self.__wakeUp = wakeUp
+        self.__queue.setWakeUp(wakeUp)
+        return True
+
+
 class DispatcherTestCase(unittest.TestCase):
+    def createDispatcher(self):
+        return observer.Dispatcher()
+
     def test1NrtFeed(self):
         values = []
         now = datetime.datetime.now()
@@ -95,7 +166,7 @@ class DispatcherTestCase(unittest.TestCase):
         nrtFeed = NonRealtimeFeed(copy.copy(datetimes))
         nrtFeed.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(nrtFeed)
         dispatcher.run()
 
@@ -111,7 +182,7 @@ class DispatcherTestCase(unittest.TestCase):
         nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
         nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(nrtFeed1)
         dispatcher.addSubject(nrtFeed2)
         dispatcher.run()
@@ -127,7 +198,7 @@ class DispatcherTestCase(unittest.TestCase):
         nrtFeed = RealtimeFeed(copy.copy(datetimes))
         nrtFeed.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(nrtFeed)
         dispatcher.run()
 
@@ -143,7 +214,7 @@ class DispatcherTestCase(unittest.TestCase):
         nrtFeed2 = RealtimeFeed(copy.copy(datetimes2))
         nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(nrtFeed1)
         dispatcher.addSubject(nrtFeed2)
         dispatcher.run()
@@ -163,7 +234,7 @@ class DispatcherTestCase(unittest.TestCase):
         nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
         nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(nrtFeed1)
         dispatcher.addSubject(nrtFeed2)
         dispatcher.run()
@@ -179,19 +250,19 @@ class DispatcherTestCase(unittest.TestCase):
         feed2 = RealtimeFeed([], 3)
         feed1 = RealtimeFeed([], 0)
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(feed3)
         dispatcher.addSubject(feed2)
         dispatcher.addSubject(feed1)
         self.assertEqual(dispatcher.getSubjects(), [feed1, feed2, feed3])
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(feed1)
         dispatcher.addSubject(feed2)
         dispatcher.addSubject(feed3)
         self.assertEqual(dispatcher.getSubjects(), [feed1, feed2, feed3])
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(feed3)
         dispatcher.addSubject(feed4)
         dispatcher.addSubject(feed2)
@@ -206,7 +277,7 @@ class DispatcherTestCase(unittest.TestCase):
         feed1.getEvent().subscribe(lambda x: values.append(x))
         feed2.getEvent().subscribe(lambda x: values.append(x))
 
-        dispatcher = observer.Dispatcher()
+        dispatcher = self.createDispatcher()
         dispatcher.addSubject(feed2)
         dispatcher.addSubject(feed1)
         self.assertEqual(dispatcher.getSubjects(), [feed1, feed2])
@@ -214,6 +285,310 @@ class DispatcherTestCase(unittest.TestCase):
         # Check that although feed2 is realtime, feed1 was dispatched before.
         self.assertTrue(values[0] < values[1])
 
+    def testManyNrtFeeds(self):
+        values = []
+        now = datetime.datetime.now()
+        feeds = []
+        for i in xrange(10):
+            # Interleave the feeds and have some of them share datetimes.
+            datetimes = [now + datetime.timedelta(seconds=(j * 5 + i % 5)) for j in xrange(10)]
+            feed = NonRealtimeFeed(datetimes)
+            feed.getEvent().subscribe(lambda x, i=i: values.append((x, i)))
+            feeds.append(feed)
+        rtFeed = RealtimeFeed([now] * 3)
+        rtFeed.getEvent().subscribe(lambda x: values.append((None, -1)))
+
+        dispatcher = self.createDispatcher()
+        dispatcher.addSubject(rtFeed)
+        for feed in feeds:
+            dispatcher.addSubject(feed)
+        dispatcher.run()
+
+        self.assertEqual(len(values), 103)
+        nrtValues = [value for value in values if value[1] != -1]
+        self.assertEqual(nrtValues, sorted(nrtValues))
+        # The realtime feed gets dispatched on every tick before the rest.
+        self.assertEqual(values[0], (None, -1))
+        self.assertEqual(values[1], (now, 0))
+        self.assertEqual(values[2], (now, 5))
+        self.assertEqual(values[3], (None, -1))
+
+    def testWakeUp(self):
+        if not observer.WakeUp.isSupported():
+            return
+
+        values = []
+        feed = ThreadedRealtimeFeed(range(5), 0.1)
+        feed.getEvent().subscribe(lambda x: values.append(x))
+        dispatcher = self.createDispatcher()
+        dispatcher.addSubject(feed)
+        dispatcher.run()
+        self.assertEqual(values, range(5))
+        # The dispatcher should sleep until there are new values, instead of polling.
+        self.assertTrue(feed.dispatchCount <= 10)
+
+    def testWakeUpPipeOnlyIfNeeded(self):
+        if not observer.WakeUp.isSupported():
+            return
+
+        fds = []
+        osPipe = observer.os.pipe
+
+        def pipe():
+            ret = osPipe()
+            fds.extend(ret)
+            return ret
+
+        observer.os.pipe = pipe
+        try:
+            now = datetime.datetime.now()
+            for i in xrange(3):
+                dispatcher = self.createDispatcher()
+                dispatcher.addSubject(NonRealtimeFeed([now + datetime.timedelta(seconds=j) for j in xrange(3)]))
+                dispatcher.run()
+            self.assertEqual(fds, [])
+
+            dispatcher = self.createDispatcher()
+            dispatcher.addSubject(ThreadedRealtimeFeed(range(3), 0.01))
+            dispatcher.run()
+        finally:
+            observer.os.pipe = osPipe
+
+        self.assertEqual(len(fds), 2)
+        # The pipe gets closed once the dispatcher is done.
+        for fd in fds:
+            self.assertRaises(OSError, observer.os.fstat, fd)
+
+    def testWakeUpWithOtherSubjects(self):
+        if not observer.WakeUp.isSupported():
+            return
+
+        values = []
+        now = datetime.datetime.now()
+        datetimes = [now + datetime.timedelta(seconds=i) for i in xrange(10)]
+        nrtFeed = NonRealtimeFeed(copy.copy(datetimes))
+        nrtFeed.getEvent().subscribe(lambda x: values.append(x))
+        rtFeed = ThreadedRealtimeFeed(range(3), 0.05)
+        rtFeed.getEvent().subscribe(lambda x: values.append(x))
+        dispatcher = self.createDispatcher()
+        dispatcher.addSubject(rtFeed)
+        dispatcher.addSubject(nrtFeed)
+        dispatcher.run()
+        self.assertEqual([value for value in values if isinstance(value, datetime.datetime)], datetimes)
+        self.assertEqual([value for value in values if not isinstance(value, datetime.datetime)], range(3))
+
+
+class HeapDispatcherTestCase(DispatcherTestCase):
+    def createDispatcher(self):
+        ret = observer.Dispatcher()
+        ret.setDispatchMode(observer.Dispatcher.HEAP)
+        return ret
+
+    def testInvalidDispatchMode(self):
+        dispatcher = observer.Dispatcher()
+        with self.assertRaises(Exception):
+            dispatcher.setDispatchMode(0)
+        self.assertEqual(dispatcher.getDispatchMode(), observer.Dispatcher.SCAN)
+
+
+class ScheduleDispatcherTestCase(DispatcherTestCase):
+    def createDispatcher(self):
+        ret = observer.Dispatcher()
+        ret.setDispatchMode(observer.Dispatcher.SCHEDULE)
+        return ret
+
+    def testScheduleIsUsed(self):
+        values = []
+        now = datetime.datetime(2000, 1, 1)
+        feeds = []
+        for i in xrange(10):
+            datetimes = [now + datetime.timedelta(seconds=(j * 5 + i % 5)) for j in xrange(10)]
+            feed = NonRealtimeFeed(datetimes)
+            feed.getEvent().subscribe(lambda x, i=i: values.append((x, i)))
+            feeds.append(feed)
+
+        dispatcher = self.createDispatcher()
+        for feed in feeds:
+            dispatcher.addSubject(feed)
+        dispatcher.run()
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(values), 100)
+        # Only the first datetime is peeked, when building the schedule.
+        for feed in feeds:
+            self.assertEqual(feed.peekCount, 1)
+
+    def testRepeatedDateTimes(self):
+        # Subjects with many events for the same datetime should be dispatched once per tick, like with SCAN.
+        now = datetime.datetime(2000, 1, 1)
+        datetimes1 = [now, now, now + datetime.timedelta(seconds=1)]
+        datetimes2 = [now, now + datetime.timedelta(seconds=1)]
+        results = []
+        for dispatchMode in [observer.Dispatcher.SCAN, observer.Dispatcher.SCHEDULE]:
+            values = []
+            feed1 = NonRealtimeFeed(copy.copy(datetimes1))
+            feed1.getEvent().subscribe(lambda x: values.append((x, 1)))
+            feed2 = NonRealtimeFeed(copy.copy(datetimes2))
+            feed2.getEvent().subscribe(lambda x: values.append((x, 2)))
+            dispatcher = observer.Dispatcher()
+            dispatcher.setDispatchMode(dispatchMode)
+            dispatcher.addSubject(feed1)
+            dispatcher.addSubject(feed2)
+            dispatcher.run()
+            results.append(values)
+        self.assertEqual(results[0], results[1])
+
+    def testRepeatedBarDateTimes(self):
+        # An instrument with repeated datetimes has no schedule, so SCHEDULE fails just like the other modes instead of
+        # dispatching a single event for both bars.
+        now = datetime.datetime(2000, 1, 1)
+        for dispatchMode in [observer.Dispatcher.SCAN, observer.Dispatcher.HEAP, observer.Dispatcher.SCHEDULE]:
+            barFeed = membf.BarFeed(barfeed.Frequency.SECOND)
+            barFeed.addBarsFromSequence("orcl", [bar.BasicBar(now, 1, 1, 1, 1, 1, None), bar.BasicBar(now, 2, 2, 2, 2, 2, None)])
+            barFeed.addBarsFromSequence("ige", [bar.BasicBar(now, 3, 3, 3, 3, 3, None)])
+            self.assertEqual(barFeed.getDispatchSchedule(), None)
+            dispatcher = observer.Dispatcher()
+            dispatcher.setDispatchMode(dispatchMode)
+            dispatcher.addSubject(barFeed)
+            with self.assertRaisesRegexp(Exception, "Bar date times are not in order"):
+                dispatcher.run()
+
+    def testMixedNaiveAndAwareDateTimes(self):
+        now = datetime.datetime(2000, 1, 1)
+        for dispatchMode in [observer.Dispatcher.SCAN, observer.Dispatcher.HEAP, observer.Dispatcher.SCHEDULE]:
+            feed1 = NonRealtimeFeed([now, now + datetime.timedelta(seconds=2)])
+            feed2 = NonRealtimeFeed([dt.as_utc(now + datetime.timedelta(seconds=1))])
+            self.assertEqual(observer.DispatchSchedule.build([feed1, feed2]), None)
+            dispatcher = observer.Dispatcher()
+            dispatcher.setDispatchMode(dispatchMode)
+            dispatcher.addSubject(feed1)
+            dispatcher.addSubject(feed2)
+            with self.assertRaises(TypeError):
+                dispatcher.run()
+
+    def testBuildSchedule(self):
+        now = datetime.datetime(2000, 1, 1)
+        feed1 = NonRealtimeFeed([now, now + datetime.timedelta(seconds=2)])
+        feed2 = NonRealtimeFeed([now + datetime.timedelta(seconds=1), now + datetime.timedelta(seconds=2)])
+        self.assertEqual(observer.DispatchSchedule.build([feed1, feed2]).getTickCount(), 3)
+        self.assertEqual(observer.DispatchSchedule.build([feed1, RealtimeFeed([])]), None)
+        self.assertEqual(observer.DispatchSchedule.build([]).getTickCount(), 0)
+
+
+class WakeUpTestCase(unittest.TestCase):
+    def testWait(self):
+        if not observer.WakeUp.isSupported():
+            return
+
+        wakeUp = observer.WakeUp()
+        # Notifications before open are ignored.
+        wakeUp.notify()
+        wakeUp.open()
+        self.assertFalse(wakeUp.wait(0))
+        # Pending notifications get consumed together.
+        wakeUp.notify()
+        wakeUp.notify()
+        self.assertTrue(wakeUp.wait(0))
+        self.assertFalse(wakeUp.wait(0))
+
+        # Notify from another thread.
+        thread = threading.Thread(target=wakeUp.notify)
+        thread.start()
+        self.assertTrue(wakeUp.wait(5))
+        thread.join()
+        wakeUp.close()
+        # Notifications after close are ignored.
+        wakeUp.notify()
+        wakeUp.close()
+
+
+class NotifyingQueueTestCase(unittest.TestCase):
+    def __getAll(self, queue):
+        ret = []
+        while not queue.empty():
+            ret.append(queue.get(False))
+        return ret
+
+    def testUnbounded(self):
+        queue = observer.NotifyingQueue()
+        for i in xrange(10):
+            queue.put(i)
+        self.assertEqual(queue.getHighWaterMark(), 10)
+        self.assertEqual(queue.getDroppedCount(), 0)
+        self.assertEqual(self.__getAll(queue), range(10))
+
+    def testBlock(self):
+        queue = observer.NotifyingQueue(2, observer.NotifyingQueue.BLOCK)
+        queue.put(1)
+        queue.put(2)
+        self.assertRaises(Queue.Full, queue.put, 3, True, 0.01)
+        self.assertEqual(self.__getAll(queue), [1, 2])
+        self.assertEqual(queue.getHighWaterMark(), 2)
+
+    def testDropOldest(self):
+        queue = observer.NotifyingQueue(3, observer.NotifyingQueue.DROP_OLDEST)
+        for i in xrange(5):
+            queue.put(i)
+        self.assertEqual(queue.getHighWaterMark(), 3)
+        self.assertEqual(queue.getDroppedCount(), 2)
+        self.assertEqual(self.__getAll(queue), [2, 3, 4])
+
+    def testDropNewest(self):
+        queue = observer.NotifyingQueue(3, observer.NotifyingQueue.DROP_NEWEST)
+        for i in xrange(5):
+            queue.put(i)
+        self.assertEqual(queue.getHighWaterMark(), 3)
+        self.assertEqual(queue.getDroppedCount(), 2)
+        self.assertEqual(self.__getAll(queue), [0, 1, 2])
+
+    def testCoalesce(self):
+        # Items with the same letter get coalesced. If nothing gets coalesced, the oldest item is dropped.
+        queue = observer.NotifyingQueue(3, observer.NotifyingQueue.COALESCE, lambda item: item[0])
+        for item in [("a", 1), ("b", 1), ("a", 2), ("a", 3), ("b", 2), (None, 1), ("c", 1)]:
+            queue.put(item)
+        self.assertEqual(queue.getDroppedCount(), 4)
+        self.assertEqual(queue.getCoalescedCount(), 2)
+        self.assertEqual(queue.getHighWaterMark(), 3)
+        self.assertEqual(self.__getAll(queue), [("a", 3), (None, 1), ("c", 1)])
+
+    def testJoinAfterDrops(self):
+        for overflowPolicy in [observer.NotifyingQueue.DROP_OLDEST, observer.NotifyingQueue.DROP_NEWEST, observer.NotifyingQueue.COALESCE]:
+            queue = observer.NotifyingQueue(2, overflowPolicy, lambda item: item % 2)
+            for i in xrange(5):
+                queue.put(i)
+            self.assertEqual(queue.qsize(), 2)
+            for item in self.__getAll(queue):
+                queue.task_done()
+            self.assertEqual(queue.unfinished_tasks, 0)
+            # This would block if dropped items were still accounted for.
+            queue.join()
+
+    def testTimestamps(self):
+        queue = observer.NotifyingQueue(2, observer.NotifyingQueue.COALESCE, lambda item: item[0])
+        self.assertEqual(queue.getLastTimestamp(), None)
+        begin = time.time()
+        queue.put(("a", 1))
+        time.sleep(0.05)
+        middle = time.time()
+        queue.put(("b", 1))
+        # Coalesced items take the timestamp of the new item.
+        queue.put(("a", 2))
+        time.sleep(0.05)
+
+        self.assertEqual(queue.get(False), ("a", 2))
+        self.assertGreaterEqual(queue.getLastTimestamp(), middle)
+        self.assertEqual(queue.get(False), ("b", 1))
+        self.assertGreaterEqual(queue.getLastTimestamp(), middle)
+        self.assertLess(queue.getLastTimestamp(), time.time() - 0.04)
+
+        queue.put(("c", 1))
+        queue.get(False)
+        self.assertGreaterEqual(queue.getLastTimestamp(), begin)
+
+    def testInvalidParameters(self):
+        self.assertRaises(Exception, observer.NotifyingQueue, 1, 0)
+        self.assertRaises(Exception, observer.NotifyingQueue, 1, observer.NotifyingQueue.COALESCE)
+
 
 class EventTestCase(unittest.TestCase):
     def testEmitOrder(self):
@@ -277,3 +652,56 @@ class EventTestCase(unittest.TestCase):
         event.unsubscribe(handler2)
         event.emit()
         self.assertTrue(handlersData == [1, 1, 2, 2])
+
+    def testUnsubscribeWhileEmitting(self):
+        handlersData = []
+        event = observer.Event()
+
+        def handler2(value):
+            handlersData.append((2, value))
+
+        def handler1(value):
+            handlersData.append((1, value))
+            if value == "a":
+                event.unsubscribe(handler2)
+
+        event.subscribe(handler1)
+        event.subscribe(handler2)
+        self.assertTrue(event.hasSubscribers())
+        event.emit("a")
+        # handler2 is still called during the emission in progress.
+        self.assertEqual(handlersData, [(1, "a"), (2, "a")])
+        event.emit("b")
+        self.assertEqual(handlersData, [(1, "a"), (2, "a"), (1, "b")])
+        event.unsubscribe(handler1)
+        self.assertFalse(event.hasSubscribers())
+        event.emit("c")
+        self.assertEqual(handlersData, [(1, "a"), (2, "a"), (1, "b")])
+        with self.assertRaises(ValueError):
+            event.unsubscribe(handler1)
+
+    def testInstrumentation(self):
+        handlersData = []
+
+        def handler1(value):
+            handlersData.append(value)
+
+        instrumentation = observer.Instrumentation()
+        event = observer.Event()
+        event.subscribe(handler1)
+        event.setInstrumentation(instrumentation, "test")
+        event.emit(1)
+        event.emit(2)
+        self.assertEqual(handlersData, [1, 2])
+        self.assertEqual(instrumentation.getStats()["test: handler1"].getCount(), 2)
+
+        # Handlers subscribed later get instrumented too.
+        event.subscribe(lambda value: None)
+        event.emit(3)
+        self.assertEqual(instrumentation.getStats()["test: handler1"].getCount(), 3)
+        self.assertEqual(instrumentation.getStats()["test: <lambda>"].getCount(), 1)
+
+        event.setInstrumentation(None, None)
+        event.emit(4)
+        self.assertEqual(handlersData, [1, 2, 3, 4])
+        self.assertEqual(instrumentation.getStats()["test: handler1"].getCount(), 3)
@@ -24,9 +24,15 @@ from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.utils import dt
 from pyalgotrade.technical import ma
 from pyalgotrade.technical import stats
+from pyalgotrade.utils import collections
+from pyalgotrade import observer
 
 import os
+import shutil
+import tempfile
 import datetime
+import timeit
+import numpy as np
 
 import sys
 sys.path.append("samples")
@@ -82,11 +88,195 @@ def run_stddev():
         pass
 
 
+# This is how NumPyDeque used to work before switching to a circular buffer.
+class ShiftNumPyDeque:
+    def __init__(self, maxLen, dtype=float):
+        self.__values = np.empty(maxLen, dtype=dtype)
+        self.__maxLen = maxLen
+        self.__nextPos = 0
+
+    def append(self, value):
+        if self.__nextPos < self.__maxLen:
+            self.__values[self.__nextPos] = value
+            self.__nextPos += 1
+        else:
+            self.__values[0:-1] = self.__values[1:]
+            self.__values[self.__nextPos - 1] = value
+
+
+def benchmark_numpydeque(values=100000):
+    print "Appending %d values" % (values)
+    for windowSize in [20, 200, 500, 5000]:
+        for dequeClass in [ShiftNumPyDeque, collections.NumPyDeque]:
+            d = dequeClass(windowSize)
+            elapsed = timeit.timeit(lambda: d.append(1.5), number=values)
+            print "%s - windowSize %d: %.3f secs" % (dequeClass.__name__, windowSize, elapsed)
+
+
+# This is how observer.Event used to work before caching the handlers in a tuple.
+class LegacyEvent:
+    def __init__(self):
+        self.__handlers = []
+        self.__toSubscribe = []
+        self.__toUnsubscribe = []
+        self.__emitting = False
+
+    def __applyChanges(self):
+        if len(self.__toSubscribe):
+            for handler in self.__toSubscribe:
+                if handler not in self.__handlers:
+                    self.__handlers.append(handler)
+            self.__toSubscribe = []
+
+        if len(self.__toUnsubscribe):
+            for handler in self.__toUnsubscribe:
+                self.__handlers.remove(handler)
+            self.__toUnsubscribe = []
+
+    def subscribe(self, handler):
+        if self.__emitting:
+            self.__toSubscribe.append(handler)
+        elif handler not in self.__handlers:
+            self.__handlers.append(handler)
+
+    def emit(self, *parameters):
+        try:
+            self.__emitting = True
+            for handler in self.__handlers:
+                handler(*parameters)
+        finally:
+            self.__emitting = False
+            self.__applyChanges()
+
+
+def benchmark_event(emits=1000000):
+    def handler(*parameters):
+        pass
+
+    print "Emitting %d times" % (emits)
+    for handlerCount in [0, 1, 3]:
+        for eventClass in [LegacyEvent, observer.Event]:
+            event = eventClass()
+            for i in xrange(handlerCount):
+                event.subscribe(lambda *parameters: handler(*parameters))
+            elapsed = timeit.timeit(lambda: event.emit(1, 2, 3), number=emits)
+            print "%s - %d handlers: %.3f secs" % (eventClass.__name__, handlerCount, elapsed)
+
+
+class BenchmarkSubject(observer.Subject):
+    def __init__(self, dateTimes):
+        self.__dateTimes = dateTimes
+        self.__pos = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__pos >= len(self.__dateTimes)
+
+    def dispatch(self):
+        self.__pos += 1
+
+    def peekDateTime(self):
+        return self.__dateTimes[self.__pos]
+
+    def getDispatchSchedule(self):
+        return [dt.datetime_to_microseconds(dateTime) for dateTime in self.__dateTimes[self.__pos:]]
+
+
+def benchmark_dispatcher(events=100000):
+    print "Dispatching %d events" % (events)
+    begin = datetime.datetime(2000, 1, 1)
+    for subjectCount in [1, 10, 100]:
+        for dispatchMode, modeName in [(observer.Dispatcher.SCAN, "SCAN"), (observer.Dispatcher.HEAP, "HEAP"), (observer.Dispatcher.SCHEDULE, "SCHEDULE")]:
+            dispatcher = observer.Dispatcher()
+            dispatcher.setDispatchMode(dispatchMode)
+            eventsPerSubject = events / subjectCount
+            for i in xrange(subjectCount):
+                # Each subject has events at different datetimes.
+                dateTimes = [begin + datetime.timedelta(seconds=j * subjectCount + i) for j in xrange(eventsPerSubject)]
+                dispatcher.addSubject(BenchmarkSubject(dateTimes))
+            elapsed = timeit.timeit(dispatcher.run, number=1)
+            print "%s - %d subjects: %.3f secs" % (modeName, subjectCount, elapsed)
+
+
+def benchmark_csv_loading(path="data/nt-spy-minute-2011.csv"):
+    print "Loading bars from %s" % (path)
+    for useBulkLoading in [False, True]:
+        def load():
+            feed = ninjatraderfeed.Feed(barfeed.Frequency.MINUTE)
+            feed.setUseBulkLoading(useBulkLoading)
+            feed.setBarFilter(csvfeed.USEquitiesRTH())
+            feed.addBarsFromCSV(instrument, path)
+            return feed
+
+        elapsed = timeit.timeit(load, number=1)
+        print "Bulk loading %s - load: %.3f secs" % (useBulkLoading, elapsed)
+        feed = load()
+        elapsed = timeit.timeit(feed.loadAll, number=1)
+        print "Bulk loading %s - dispatch: %.3f secs" % (useBulkLoading, elapsed)
+
+
+def benchmark_csv_cache(path="data/nt-spy-minute-2011.csv"):
+    print "Loading bars from %s" % (path)
+    cacheDir = tempfile.mkdtemp()
+    for useCache in [False, True, True]:
+        def load():
+            feed = ninjatraderfeed.Feed(barfeed.Frequency.MINUTE)
+            feed.setUseBulkLoading(True)
+            feed.setUseCache(useCache, cacheDir)
+            feed.addBarsFromCSV(instrument, path)
+            return feed
+
+        elapsed = timeit.timeit(load, number=1)
+        print "Cache %s - load: %.3f secs" % (useCache, elapsed)
+    shutil.rmtree(cacheDir)
+
+
+def benchmark_parallel_csv_loading(path="data/nt-spy-minute-2011.csv", instruments=16):
+    # Each instrument gets its own copy of the file, since files listed more than once are parsed only once.
+    tmpDir = tempfile.mkdtemp()
+    paths = {}
+    for i in xrange(instruments):
+        instrument_ = "%s-%d" % (instrument, i)
+        paths[instrument_] = os.path.join(tmpDir, "%s.csv" % (instrument_))
+        shutil.copy(path, paths[instrument_])
+    print "Loading bars for %d instruments from copies of %s" % (instruments, path)
+
+    def loadSerial():
+        feed = ninjatraderfeed.Feed(barfeed.Frequency.MINUTE)
+        feed.setUseBulkLoading(True)
+        for instrument_, path_ in paths.iteritems():
+            feed.addBarsFromCSV(instrument_, path_)
+        return feed
+
+    def loadParallel():
+        feed = ninjatraderfeed.Feed(barfeed.Frequency.MINUTE)
+        feed.addBarsFromCSVs(paths)
+        return feed
+
+    print "Serial - load: %.3f secs" % (timeit.timeit(loadSerial, number=1))
+    print "Parallel - load: %.3f secs" % (timeit.timeit(loadParallel, number=1))
+    shutil.rmtree(tmpDir)
+
+
 def main():
     # Run only one of these.
     # run_smacross_strategy()
     run_sma()
     # run_stddev()
+    # benchmark_numpydeque()
+    # benchmark_dispatcher()
+    # benchmark_event()
+    # benchmark_csv_loading()
+    # benchmark_csv_cache()
+    # benchmark_parallel_csv_loading()
 
 
 def profile(method):
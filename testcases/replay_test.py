@@ -0,0 +1,186 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2013 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import unittest
+import datetime
+import os
+import time
+
+from pyalgotrade import replay
+from pyalgotrade import observer
+from pyalgotrade.mtgox import replay as mtgoxreplay
+from pyalgotrade.mtgox import barfeed
+from pyalgotrade.mtgox import base
+from pyalgotrade.utils import dt
+import common
+
+
+def build_trade(dateTime, price):
+    return base.Trade({
+        "amount_int": 100000000,
+        "tid": dt.datetime_to_microseconds(dateTime),
+        "price_int": price * 100000,
+        "price_currency": "USD",
+        "trade_type": "bid",
+    })
+
+
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        common.init_temp_path()
+        self.__path = os.path.join(common.get_temp_path(), "events.log")
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+    def tearDown(self):
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+    def __record(self, events):
+        recorder = replay.Recorder(self.__path)
+        tickEvent = observer.Event()
+        recorder.record(tickEvent, "tick")
+        tweetHandler = recorder.getHandler("tweet")
+        for name, parameters in events:
+            if name == "tick":
+                tickEvent.emit(*parameters)
+            else:
+                tweetHandler(*parameters)
+        recorder.close()
+
+    def __replay(self, speed=None):
+        subject = replay.ReplaySubject(self.__path, speed)
+        received = []
+        subject.getEvent("tick").subscribe(lambda *parameters: received.append(("tick", parameters)))
+        subject.getEvent("tweet").subscribe(lambda *parameters: received.append(("tweet", parameters)))
+        dispatcher = observer.Dispatcher()
+        dispatcher.addSubject(subject)
+        dispatcher.run()
+        self.assertEqual(subject.getDispatchedCount(), len(received))
+        return received
+
+    def testRecordAndReplay(self):
+        events = [("tick", (1, "a")), ("tweet", ({"text": "hello"},)), ("tick", (2, None))]
+        self.__record(events)
+        self.assertEqual(self.__replay(), events)
+
+    def testReplayAtRecordedPace(self):
+        recorder = replay.Recorder(self.__path)
+        recorder.write("tick", (1,))
+        time.sleep(0.2)
+        recorder.write("tick", (2,))
+        recorder.close()
+
+        begin = time.time()
+        self.assertEqual(self.__replay(2), [("tick", (1,)), ("tick", (2,))])
+        elapsed = time.time() - begin
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.2)
+
+    def testAppend(self):
+        self.__record([("tweet", ("a",))])
+        self.__record([("tick", (1,)), ("tweet", ("b",))])
+        self.assertEqual(self.__replay(), [("tweet", ("a",)), ("tick", (1,)), ("tweet", ("b",))])
+
+    def testTruncatedLog(self):
+        self.__record([("tick", (1,)), ("tick", (2,))])
+        with open(self.__path, "r+b") as f:
+            f.truncate(os.path.getsize(self.__path) - 1)
+        self.assertEqual(self.__replay(), [("tick", (1,))])
+
+    def testRecordEventTimestamp(self):
+        class SubjectStub:
+            def __init__(self):
+                self.timestamp = None
+
+            def getEventTimestamp(self):
+                return self.timestamp
+
+        subject = SubjectStub()
+        recorder = replay.Recorder(self.__path)
+        tickEvent = observer.Event()
+        recorder.record(tickEvent, "tick", subject)
+        tweetHandler = recorder.getHandler("tweet", subject)
+        subject.timestamp = 1000.5
+        tickEvent.emit(1)
+        subject.timestamp = 1001.25
+        tweetHandler("a")
+        recorder.close()
+
+        reader = replay.LogReader(self.__path)
+        self.assertEqual(reader.next(), (1000500000, "tick", (1,)))
+        self.assertEqual(reader.next(), (1001250000, "tweet", ("a",)))
+        self.assertEqual(reader.next(), None)
+        reader.close()
+
+        # Recording a replay keeps the original timestamps.
+        subject = replay.ReplaySubject(self.__path)
+        timestamps = []
+        subject.getEvent("tick").subscribe(lambda *parameters: timestamps.append(subject.getEventTimestamp()))
+        subject.getEvent("tweet").subscribe(lambda *parameters: timestamps.append(subject.getEventTimestamp()))
+        dispatcher = observer.Dispatcher()
+        dispatcher.addSubject(subject)
+        dispatcher.run()
+        self.assertEqual(timestamps, [1000.5, 1001.25])
+
+    def testInvalidLog(self):
+        with open(self.__path, "wb") as f:
+            f.write("something else")
+        with self.assertRaises(Exception):
+            replay.LogReader(self.__path)
+        with self.assertRaises(Exception):
+            replay.ReplaySubject(self.__path, 0)
+
+    def testMtGoxLiveTradeFeed(self):
+        class ClientStub:
+            def __init__(self):
+                self.__tickerEvent = observer.Event()
+                self.__tradeEvent = observer.Event()
+                self.__userOrderEvent = observer.Event()
+
+            def getTickerEvent(self):
+                return self.__tickerEvent
+
+            def getTradeEvent(self):
+                return self.__tradeEvent
+
+            def getUserOrderEvent(self):
+                return self.__userOrderEvent
+
+            def getEventTimestamp(self):
+                return time.time()
+
+        client = ClientStub()
+        recorder = replay.Recorder(self.__path)
+        mtgoxreplay.record_client(client, recorder)
+        begin = datetime.datetime(2013, 1, 1)
+        for i in xrange(3):
+            client.getTradeEvent().emit(build_trade(begin + datetime.timedelta(seconds=i), 10 + i))
+        recorder.close()
+
+        replayClient = mtgoxreplay.ReplayClient(self.__path, "USD")
+        feed = barfeed.LiveTradeFeed(replayClient)
+        closes = []
+        feed.getNewBarsEvent().subscribe(lambda dateTime, bars: closes.append(round(bars["BTC"].getClose(), 2)))
+        dispatcher = observer.Dispatcher()
+        dispatcher.addSubject(replayClient)
+        dispatcher.addSubject(feed)
+        dispatcher.run()
+        self.assertEqual(closes, [10, 11, 12])
@@ -21,6 +21,7 @@
 import unittest
 
 from pyalgotrade import strategy
+from pyalgotrade import observer
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.technical import ma
 from pyalgotrade.technical import cross
@@ -146,10 +147,12 @@ class LimitOrderStrategy(SMACrossOverStrategy):
 
 
 class TestSMACrossOver(unittest.TestCase):
-    def __test(self, strategyClass, finalValue):
+    def __test(self, strategyClass, finalValue, dispatchMode=None):
         feed = yahoofeed.Feed()
         feed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
         myStrategy = strategyClass(feed, 10, 25)
+        if dispatchMode is not None:
+            myStrategy.getDispatcher().setDispatchMode(dispatchMode)
         myStrategy.run()
         myStrategy.printDebug("Final result:", round(myStrategy.getFinalValue(), 2))
         self.assertTrue(round(myStrategy.getFinalValue(), 2) == finalValue)
@@ -161,3 +164,7 @@ class TestSMACrossOver(unittest.TestCase):
     def testWithLimitOrder(self):
         # The result is different than the one we get using NinjaTrader. NinjaTrader processes Limit orders in a different way.
         self.__test(LimitOrderStrategy, 1000 + 32.7)
+
+    def testWithPrecomputedSchedule(self):
+        self.__test(MarketOrderStrategy, 1000 - 22.7, observer.Dispatcher.SCHEDULE)
+        self.__test(LimitOrderStrategy, 1000 + 32.7, observer.Dispatcher.SCHEDULE)
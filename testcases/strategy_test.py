@@ -28,6 +28,7 @@ from pyalgotrade import broker
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.stratanalyzer import drawdown
 from pyalgotrade.utils import dt
 from pyalgotrade import marketsession
 import common
@@ -217,6 +218,41 @@ class StrategyOrderTestCase(StrategyTestCase):
         self.assertTrue(strat.getOrderUpdatedEvents() == 2)
 
 
+class InstrumentationTestCase(StrategyTestCase):
+    def testInstrumentation(self):
+        strat = self.createStrategy()
+        self.assertEqual(strat.getInstrumentation(), None)
+        strat.setUseInstrumentation(True)
+        strat.attachAnalyzer(drawdown.DrawDown())
+        o = strat.order(StrategyTestCase.TestInstrument, 1)
+        strat.run()
+        self.assertTrue(o.isFilled())
+
+        instrumentation = strat.getInstrumentation()
+        stats = instrumentation.getStats()
+        barCount = len(strat.getFeed().getDataSeries())
+        self.assertEqual(stats["strategy: onBars"].getCount(), barCount)
+        self.assertEqual(stats["analyzer: DrawDown"].getCount(), barCount)
+        self.assertEqual(stats["new bars: TestStrategy.__onBars"].getCount(), barCount)
+        self.assertEqual(stats["new bars: Broker.onBars"].getCount(), barCount)
+        self.assertEqual(stats["order updated: TestStrategy.__onOrderUpdated"].getCount(), 2)
+        self.assertEqual(stats["dispatch: Feed"].getCount(), barCount)
+        self.assertTrue(stats["dispatch: Feed"].getTotalTime() >= stats["new bars: TestStrategy.__onBars"].getTotalTime())
+        for callStats in instrumentation.getReport():
+            self.assertTrue(callStats.getMaxTime() <= callStats.getTotalTime())
+            self.assertTrue(callStats.getAverageTime() <= callStats.getMaxTime())
+        report = instrumentation.getReport()
+        self.assertEqual(report, sorted(report, key=lambda callStats: -callStats.getTotalTime()))
+
+    def testDisable(self):
+        strat = self.createStrategy()
+        strat.setUseInstrumentation(True)
+        strat.setUseInstrumentation(False)
+        self.assertEqual(strat.getInstrumentation(), None)
+        self.assertFalse("onBars" in strat.__dict__)
+        strat.run()
+
+
 class LongPosTestCase(StrategyTestCase):
     def testLongPosition(self):
         strat = self.createStrategy()
@@ -207,6 +207,24 @@ class TestCase(unittest.TestCase):
             seconds += 1
         return ret
 
+    def testValueDSToNumpy(self):
+        ds = dataseries.SequenceDataSeries()
+        for value in [1.0, 2.0, 3.0, float("nan")]:
+            ds.append(value)
+        # NaN values are kept.
+        values = indicator.value_ds_to_numpy(ds, 2)
+        self.assertEqual(values[0], 3.0)
+        self.assertTrue(values[1] != values[1])
+        # None values mean that there is not enough data.
+        ds.append(None)
+        self.assertEqual(indicator.value_ds_to_numpy(ds, 2), None)
+
+        numericDS = dataseries.NumericDataSeries()
+        for value in [1.0, None, 3.0]:
+            numericDS.append(value)
+        self.assertEqual(indicator.value_ds_to_numpy(numericDS, 1).tolist(), [3.0])
+        self.assertEqual(indicator.value_ds_to_numpy(numericDS, 2), None)
+
     def testAD(self):
         barDs = self.__loadBarDS()
         self.assertTrue(compare(indicator.AD(barDs, 252)[0], -1631000.00))
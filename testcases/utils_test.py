@@ -244,3 +244,131 @@ class CollectionsTestCase(unittest.TestCase):
         self.assertEqual(len(d), 6)
         self.assertEqual(d[5], 15)
         self.assertEqual(d[-1], 15)
+
+    def testNumPyDequeWrapAround(self):
+        d = collections.NumPyDeque(7)
+        expected = []
+        for i in range(100):
+            d.append(i)
+            expected.append(i)
+            expected = expected[-7:]
+            self.assertEqual(len(d), len(expected))
+            self.assertEqual(d.data().tolist(), expected)
+            self.assertEqual(d[0], expected[0])
+            self.assertEqual(d[-1], expected[-1])
+
+    def testNumPyDequeResizeAfterWrapAround(self):
+        d = collections.NumPyDeque(4)
+        for i in range(10):
+            d.append(i)
+        self.assertEqual(d.data().tolist(), [6, 7, 8, 9])
+
+        d.resize(6)
+        self.assertEqual(d.data().tolist(), [6, 7, 8, 9])
+        for i in range(10, 13):
+            d.append(i)
+        self.assertEqual(d.data().tolist(), [7, 8, 9, 10, 11, 12])
+
+        d.resize(2)
+        self.assertEqual(d.data().tolist(), [7, 8])
+        d.append(13)
+        self.assertEqual(d.data().tolist(), [8, 13])
+
+    def testListDeque(self):
+        d = collections.ListDeque(5)
+        expected = []
+        for i in range(23):
+            d.append(i)
+            expected.append(i)
+            expected = expected[-5:]
+            self.assertEqual(len(d), len(expected))
+            self.assertEqual(d.data(), expected)
+            for j in range(-len(expected), len(expected)):
+                self.assertEqual(d[j], expected[j])
+            self.assertEqual(d[:], expected)
+            self.assertEqual(d[-2:], expected[-2:])
+            self.assertEqual(d[1:3], expected[1:3])
+            self.assertEqual(d[::-1], expected[::-1])
+            self.assertEqual(d[3::-2], expected[3::-2])
+            with self.assertRaises(IndexError):
+                d[len(expected)]
+            with self.assertRaises(IndexError):
+                d[-len(expected)-1]
+
+    def testListDequeResize(self):
+        d = collections.ListDeque(10)
+        for i in range(17):
+            d.append(i)
+        self.assertEqual(d[:], range(7, 17))
+
+        d.resize(3)
+        self.assertEqual(len(d), 3)
+        self.assertEqual(d.data(), [14, 15, 16])
+        d.append(17)
+        self.assertEqual(d[:], [15, 16, 17])
+
+        d.resize(5)
+        d.append(18)
+        d.append(19)
+        self.assertEqual(d[:], [15, 16, 17, 18, 19])
+        d.append(20)
+        self.assertEqual(d[0], 16)
+        self.assertEqual(d[-1], 20)
+
+    def testListDequeDataAfterWrapping(self):
+        d = collections.ListDeque(3)
+        for i in range(5):
+            d.append(i)
+        self.assertEqual(d.data(), [2, 3, 4])
+        # Getting the data doesn't discard items, so appending afterwards still works.
+        self.assertEqual(d.data(), [2, 3, 4])
+        d.append(5)
+        self.assertEqual(d.data(), [3, 4, 5])
+        self.assertEqual(d[0], 3)
+        d.extend([6, 7])
+        self.assertEqual(d.data(), [5, 6, 7])
+        self.assertEqual(len(d), 3)
+
+    def testSpillArray(self):
+        a = collections.SpillArray(4)
+        for i in range(10):
+            a.append(i)
+        self.assertEqual(len(a), 10)
+        self.assertEqual(a.getSpilledCount(), 8)
+        for i in range(-10, 10):
+            self.assertEqual(a[i], range(10)[i])
+        self.assertEqual(a[:].tolist(), range(10))
+        self.assertEqual(a[2:5].tolist(), range(2, 5))
+        self.assertEqual(a[-3:].tolist(), range(7, 10))
+        self.assertEqual(a[7:9].tolist(), range(7, 9))
+        self.assertEqual(a[::-3].tolist(), range(10)[::-3])
+        self.assertEqual(a.slice(5, 2).tolist(), [])
+        with self.assertRaises(IndexError):
+            a[10]
+        a.close()
+
+    def testNumPyDequeExtend(self):
+        for maxLen in (1, 3, 7):
+            for chunkSize in (1, 2, 5, 10):
+                d = collections.NumPyDeque(maxLen)
+                expected = []
+                for i in range(0, 30, chunkSize):
+                    values = range(i, i + chunkSize)
+                    d.extend(values)
+                    expected = (expected + values)[-maxLen:]
+                    self.assertEqual(d.data().tolist(), expected)
+                    d.append(-i)
+                    expected = (expected + [-i])[-maxLen:]
+                    self.assertEqual(d.data().tolist(), expected)
+
+    def testListDequeExtend(self):
+        for maxLen in (1, 3, 7):
+            for chunkSize in (1, 2, 5, 10):
+                d = collections.ListDeque(maxLen)
+                expected = []
+                for i in range(0, 30, chunkSize):
+                    values = range(i, i + chunkSize)
+                    d.extend(values)
+                    expected = (expected + values)[-maxLen:]
+                    self.assertEqual(d[:], expected)
+                    self.assertEqual(d.data(), expected)